@@ -0,0 +1,150 @@
+"""
+bench_orders.py
+
+Порівняння пам'яті та швидкості запитів для замовлень:
+
+- "до": стара модель – @dataclass з __dict__, посилання на CatalogItem,
+  datetime і рядок статусу; ORDERS – простий словник, а /order та /orders
+  сканують і сортують усі замовлення;
+- "після": поточна модель telegram_shop_bot.Order (__slots__, компактні
+  статус і час, знімок назви/ціни) в OrderStore з індексами.
+
+Запуск (результати друкуються в stdout):
+    python bench_orders.py
+    python bench_orders.py --orders 200000 --users 20000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import telegram_shop_bot as shop  # noqa: E402
+
+
+@dataclass
+class LegacyOrder:
+    """Замовлення у вигляді, яким воно було до компактної моделі."""
+    order_id: int
+    user_id: int
+    username: Optional[str]
+    full_name: str
+    item: shop.CatalogItem
+    created_at: datetime
+    status: str = "pending"
+
+
+def build_catalog(size: int) -> Dict[int, shop.CatalogItem]:
+    return {
+        i: shop.CatalogItem(item_id=i, name=f"Товар {i}", price=float(100 + i % 900), description="опис")
+        for i in range(1, size + 1)
+    }
+
+
+def build_legacy(count: int, users: int, catalog: Dict[int, shop.CatalogItem]) -> Dict[int, LegacyOrder]:
+    rnd = random.Random(1)
+    start = datetime(2026, 1, 1)
+    orders: Dict[int, LegacyOrder] = {}
+    for order_id in range(1, count + 1):
+        user_id = rnd.randrange(users)
+        orders[order_id] = LegacyOrder(
+            order_id=order_id,
+            user_id=user_id,
+            username=f"user{user_id}",
+            full_name=f"Ім'я{user_id} Прізвище{user_id}",
+            item=catalog[rnd.randrange(1, len(catalog) + 1)],
+            created_at=start + timedelta(seconds=order_id),
+            status=rnd.choice(shop.ORDER_STATUSES),
+        )
+    return orders
+
+
+def build_compact(count: int, users: int, catalog: Dict[int, shop.CatalogItem]) -> shop.OrderStore:
+    rnd = random.Random(1)
+    start = int(datetime(2026, 1, 1).timestamp())
+    store = shop.OrderStore()
+    for order_id in range(1, count + 1):
+        user_id = rnd.randrange(users)
+        item = catalog[rnd.randrange(1, len(catalog) + 1)]
+        # Так само, як у cb_buy_item
+        order = shop.Order(
+            order_id=order_id,
+            user_id=user_id,
+            username=sys.intern(f"user{user_id}"),
+            full_name=sys.intern(f"Ім'я{user_id} Прізвище{user_id}"),
+            item_id=item.item_id,
+            item_name=item.name,
+            price=item.price,
+            created_ts=start + order_id,
+        )
+        store.add(order)
+        store.set_status(order, rnd.choice(shop.ORDER_STATUSES))
+    return store
+
+
+def measure(build, *args):
+    """Побудувати структуру та повернути (її, байтів виділено, секунд)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    result = build(*args)
+    elapsed = time.perf_counter() - started
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, allocated, elapsed
+
+
+def timeit(func, repeat: int) -> float:
+    """Середній час виклику в мілісекундах."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--items", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5, help="повторів для повільних запитів")
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.items)
+    probe_user = 42
+
+    legacy, legacy_bytes, legacy_build = measure(build_legacy, args.orders, args.users, catalog)
+    legacy_user = timeit(lambda: sorted(
+        (o for o in legacy.values() if o.user_id == probe_user),
+        key=lambda x: x.created_at, reverse=True,
+    )[:10], args.repeat)
+    legacy_all = timeit(lambda: sorted(
+        legacy.values(), key=lambda x: x.created_at, reverse=True,
+    )[:20], args.repeat)
+    del legacy
+    gc.collect()
+
+    store, compact_bytes, compact_build = measure(build_compact, args.orders, args.users, catalog)
+    compact_user = timeit(lambda: store.recent_for_user(probe_user, 10), 1000)
+    compact_all = timeit(lambda: store.recent(20), 1000)
+
+    print(f"Замовлень: {args.orders:,}, користувачів: {args.users:,}, товарів: {args.items:,}")
+    print()
+    print(f"{'':32}{'до':>14}{'після':>14}")
+    print(f"{'байтів на замовлення':32}{legacy_bytes / args.orders:>14.1f}{compact_bytes / args.orders:>14.1f}")
+    print(f"{'побудова, с':32}{legacy_build:>14.2f}{compact_build:>14.2f}")
+    print(f"{'/order (10 своїх), мс':32}{legacy_user:>14.3f}{compact_user:>14.4f}")
+    print(f"{'/orders (20 останніх), мс':32}{legacy_all:>14.3f}{compact_all:>14.4f}")
+
+
+if __name__ == "__main__":
+    main()
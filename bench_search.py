@@ -0,0 +1,139 @@
+"""
+bench_search.py
+
+Час пошуку товарів (/search та inline-режим) на великому каталозі:
+
+- "множини": простий індекс слово -> множина ID; префікс об'єднує множини
+  всіх відповідних слів, перетин рахується повністю, а сторінка
+  вибирається через heapq.nsmallest з усіх збігів;
+- "списки": telegram_shop_bot.SearchIndex – відсортовані списки ID,
+  які перебираються ліниво й лише до кінця потрібної сторінки.
+
+Запит вважається швидким, якщо займає менше 1 мс.
+
+Запуск (результати друкуються в stdout):
+    python bench_search.py
+    python bench_search.py --items 200000 --repeat 200
+"""
+
+import argparse
+import bisect
+import heapq
+import os
+import random
+import time
+from typing import Dict, List, Set, Tuple
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import telegram_shop_bot as shop  # noqa: E402
+
+NOUNS = ("футболка", "худі", "кружка", "сумка", "шапка", "блокнот", "ручка", "наліпка",
+         "чохол", "рюкзак", "світшот", "кепка", "шарф", "термос", "пляшка", "значок")
+COLORS = ("чорний", "білий", "синій", "червоний", "зелений", "жовтий", "сірий", "фіолетовий")
+MATERIALS = ("бавовна", "поліестер", "кераміка", "метал", "папір", "шкіра", "льон", "фліс")
+
+# (назва, запит): короткий поширений префікс, кілька слів, рідкісне слово
+QUERIES = (
+    ("короткий префікс", "фу"),
+    ("префікс багатьох слів", "m4"),
+    ("префікс і слово", "ко футболка"),
+    ("поширене слово", "футболка"),
+    ("два слова", "футболка чорна"),
+    ("три слова", "кружка біла кераміка"),
+    ("рідкісний збіг", "термос фіолетовий льон"),
+    ("модель", "m4242"),
+)
+
+
+class LegacySearchIndex:
+    """Простий індекс на множинах ID – для порівняння швидкості й результатів."""
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Set[int]] = {}
+        self._terms: List[str] = []
+
+    def add(self, item: shop.CatalogItem) -> None:
+        for term in set(shop.normalize_words(f"{item.name} {item.description}")):
+            ids = self._postings.get(term)
+            if ids is None:
+                ids = self._postings[term] = set()
+                bisect.insort(self._terms, term)
+            ids.add(item.item_id)
+
+    def _match(self, word: str) -> Set[int]:
+        exact = self._postings.get(word, set())
+        if len(word) < 2:
+            return exact
+        start = bisect.bisect_left(self._terms, word)
+        end = bisect.bisect_left(self._terms, word + "\uffff", start)
+        if end - start == 1:
+            return self._postings[self._terms[start]]
+        result: Set[int] = set()
+        for term in self._terms[start:end]:
+            result |= self._postings[term]
+        return result
+
+    def search(self, query: str, offset: int = 0, limit: int = 10) -> Tuple[List[int], int]:
+        words = shop.normalize_words(query)
+        if not words:
+            return [], 0
+        matches = sorted((self._match(word) for word in words), key=len)
+        result = matches[0]
+        for other in matches[1:]:
+            result = result & other
+            if not result:
+                break
+        return heapq.nsmallest(offset + limit, result)[offset:], len(result)
+
+
+def build_items(count: int) -> List[shop.CatalogItem]:
+    rnd = random.Random(1)
+    return [
+        shop.CatalogItem(
+            item_id=i,
+            name=f"{rnd.choice(NOUNS).capitalize()} {rnd.choice(COLORS)} M{rnd.randrange(10000)}",
+            price=float(100 + i % 900),
+            description=f"Матеріал: {rnd.choice(MATERIALS)}. Колекція {2020 + i % 7}.",
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def timeit(func, repeat: int) -> float:
+    """Середній час виклику в мілісекундах."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=100, help="повторів кожного запиту")
+    parser.add_argument("--page", type=int, default=shop.SEARCH_PAGE_SIZE, help="результатів на сторінці")
+    args = parser.parse_args()
+
+    items = build_items(args.items)
+    legacy = LegacySearchIndex()
+    current = shop.SearchIndex()
+    for item in items:
+        legacy.add(item)
+        current.add(item)
+
+    print(f"Товарів: {args.items:,}, результатів на сторінці: {args.page}")
+    print()
+    print(f"{'запит, мс':44}{'множини':>10}{'списки':>10}{'збігів':>10}")
+    for title, query in QUERIES:
+        # Результати мають збігатися з простим індексом
+        old_page, total = legacy.search(query, 0, args.page)
+        new_page, has_more = current.search(query, 0, args.page)
+        assert old_page == new_page and has_more == (total > args.page), query
+        before = timeit(lambda: legacy.search(query, 0, args.page), args.repeat)
+        after = timeit(lambda: current.search(query, 0, args.page), args.repeat)
+        print(f"{title + ' «' + query + '»':44}{before:>10.3f}{after:>10.4f}{total:>10,}")
+
+
+if __name__ == "__main__":
+    main()
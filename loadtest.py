@@ -0,0 +1,492 @@
+"""
+loadtest.py
+
+Офлайн-навантажувальний тест бота без мережі та справжнього Telegram.
+
+Скрипт піднімає локальну заглушку Bot API (getUpdates, sendMessage,
+editMessageText, answerCallbackQuery і кілька службових методів), запускає
+telegram_shop_bot.py окремим процесом у режимі polling з telebot,
+спрямованим на заглушку, і відтворює згенерований потік оновлень від
+віртуальних користувачів:
+
+- browse – /catalog, гортання сторінки, перегляд товару;
+- buy    – /catalog, товар, buy:, confirm:, pay_ok: (номер замовлення
+           береться з кнопок, які повернув бот);
+- text   – довільний текст (FAQ та відповідь за замовчуванням).
+
+Кожен крок вважається виконаним, коли бот відповідає на нього
+(sendMessage для повідомлень, editMessageText або answerCallbackQuery для
+кнопок). Час від появи оновлення в getUpdates до відповіді – наскрізна
+затримка. Для кожної швидкості виводяться пропускна здатність, p50/p99
+затримки та пам'ять процесів бота (RSS, лише Linux).
+
+За замовчуванням ліміти черги вихідних повідомлень і вхідних оновлень
+знято, щоб міряти саму обробку; --real-limits залишає налаштовані в боті
+ліміти Telegram, ліміт на користувача та відкидання під перевантаженням.
+Під час прогону метрики бота доступні на http://127.0.0.1:<порт>/metrics.
+
+Запуск:
+    python loadtest.py
+    python loadtest.py --rate 100,200,400 --duration 20 --users 2000
+    python loadtest.py --mix browse=1,buy=1 --storage sqlite --items 5000
+    python loadtest.py --engine asyncio --rate 200,400,800
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Generator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "telegram_shop_bot.py")
+BOT_TOKEN = "123456:LOADTEST"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Shop", "username": "loadtest_shop_bot"}
+
+# Процес бота (адреса заглушки передається через BOT_API_URL): за потреби
+# розширити каталог і стартувати так само, як у блоці __main__ бота
+BOT_BOOT = """
+import os, sys, threading
+sys.path.insert(0, os.path.dirname(sys.argv[1]))
+import telegram_shop_bot as shop
+
+_seed = shop.seed_catalog
+def seed_catalog():
+    _seed()
+    extra = int(sys.argv[2])
+    if extra:
+        shop.add_catalog_items([
+            shop.CatalogItem(item_id=i, name=f"Товар {i}", price=float(100 + i % 900), description="Тестовий товар")
+            for i in (shop.get_next_item_id() for _ in range(extra))
+        ])
+shop.seed_catalog = seed_catalog
+
+if shop.BOT_ENGINE == "asyncio":
+    import asyncio
+    asyncio.run(shop.run_async_bot("127.0.0.1", int(os.environ["PORT"])))
+else:
+    threading.Thread(target=shop.run_bot, daemon=True).start()
+    shop.app.run(host="127.0.0.1", port=int(os.environ["PORT"]))
+"""
+
+TEXTS = (
+    "Привіт",
+    "Як замовити товар?",
+    "Що є в каталозі?",
+    "Котра година?",
+    "Дякую, все супер",
+)
+
+_ITEM_RE = re.compile(r'"item:(\d+)"')
+_CONFIRM_RE = re.compile(r'"confirm:(\d+)"')
+
+Step = Tuple[str, str]  # ("text" | "callback", текст або callback_data)
+Reply = Optional[Dict[str, str]]
+
+
+# ===================== Сценарії користувачів =====================
+
+def _pick(pattern: "re.Pattern[str]", reply: Reply, rnd: random.Random) -> Optional[str]:
+    found = pattern.findall((reply or {}).get("reply_markup", ""))
+    return rnd.choice(found) if found else None
+
+
+def browse_flow(rnd: random.Random) -> Generator[Step, Reply, None]:
+    reply = yield ("text", "/catalog")
+    reply = yield ("callback", f"catalog:{rnd.randrange(2)}")
+    item_id = _pick(_ITEM_RE, reply, rnd)
+    if item_id:
+        yield ("callback", f"item:{item_id}")
+
+
+def buy_flow(rnd: random.Random) -> Generator[Step, Reply, None]:
+    reply = yield ("text", "/catalog")
+    item_id = _pick(_ITEM_RE, reply, rnd)
+    if not item_id:
+        return
+    yield ("callback", f"item:{item_id}")
+    reply = yield ("callback", f"buy:{item_id}")
+    order_id = _pick(_CONFIRM_RE, reply, rnd)
+    if not order_id:
+        return
+    yield ("callback", f"confirm:{order_id}")
+    yield ("callback", f"pay_ok:{order_id}")
+
+
+def text_flow(rnd: random.Random) -> Generator[Step, Reply, None]:
+    yield ("text", rnd.choice(TEXTS))
+
+
+FLOWS = {"browse": browse_flow, "buy": buy_flow, "text": text_flow}
+
+
+class VirtualUser:
+    """Користувач, що проходить сценарії по одному кроку за раз."""
+
+    __slots__ = ("user_id", "flow", "step", "message_id", "pending", "sent_at")
+
+    def __init__(self, user_id: int) -> None:
+        self.user_id = user_id
+        self.flow: Optional[Generator[Step, Reply, None]] = None
+        self.step: Optional[Step] = None
+        self.message_id = 1
+        self.pending: Optional[str] = None  # id оновлення/callback-а, на яке чекаємо
+        self.sent_at = 0.0
+
+
+# ===================== Заглушка Bot API =====================
+
+class FakeTelegram:
+    """Стан заглушки: черга getUpdates, віртуальні користувачі та статистика."""
+
+    def __init__(self, users: int, mix: Dict[str, int], timeout: float, seed: int) -> None:
+        self.rnd = random.Random(seed)
+        self.users = [VirtualUser(100_000 + i) for i in range(users)]
+        self.by_chat = {u.user_id: u for u in self.users}
+        self.ready: Deque[VirtualUser] = deque(self.users)
+        self.flows = [FLOWS[name] for name, weight in mix.items() for _ in range(weight)]
+        self.timeout = timeout
+
+        self.cond = threading.Condition()
+        self.updates: Deque[Dict[str, Any]] = deque()
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(10_000)
+        self.callbacks: Dict[str, VirtualUser] = {}  # callback_query_id → користувач
+        self.polled = threading.Event()
+
+        self.latencies: List[float] = []
+        self.sent = 0
+        self.completed = 0
+        self.lost = 0
+        self.skipped = 0
+        self.api_calls: Dict[str, int] = {}
+
+    # ---- генерація оновлень ----
+
+    def _next_step(self, user: VirtualUser, reply: Reply) -> Step:
+        """Наступний крок сценарію; коли сценарій скінчився – почати новий."""
+        if user.flow is not None:
+            try:
+                return user.flow.send(reply)
+            except StopIteration:
+                pass
+        user.flow = self.rnd.choice(self.flows)(random.Random(self.rnd.random()))
+        return next(user.flow)
+
+    def emit(self) -> bool:
+        """Надіслати крок наступного вільного користувача (False – вільних немає)."""
+        with self.cond:
+            if not self.ready:
+                self.skipped += 1
+                return False
+            user = self.ready.popleft()
+            kind, data = user.step or self._next_step(user, None)
+            user.step = None
+            update_id = next(self.update_ids)
+            sender = {"id": user.user_id, "is_bot": False, "first_name": f"User{user.user_id}",
+                      "username": f"user{user.user_id}"}
+            chat = {"id": user.user_id, "type": "private"}
+            if kind == "text":
+                message = {"message_id": next(self.message_ids), "date": int(time.time()),
+                           "chat": chat, "from": sender, "text": data}
+                if data.startswith("/"):
+                    message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(data.split()[0])}]
+                update = {"update_id": update_id, "message": message}
+                user.pending = f"m{update_id}"
+            else:
+                update = {"update_id": update_id, "callback_query": {
+                    "id": str(update_id), "from": sender, "chat_instance": str(user.user_id), "data": data,
+                    "message": {"message_id": user.message_id, "date": int(time.time()), "chat": chat,
+                                "from": BOT_USER, "text": "..."},
+                }}
+                user.pending = str(update_id)
+                self.callbacks[user.pending] = user
+            user.sent_at = time.perf_counter()
+            self.updates.append(update)
+            self.sent += 1
+            self.cond.notify_all()
+            return True
+
+    def reap(self) -> None:
+        """Кроки без відповіді довше за timeout вважаються втраченими."""
+        deadline = time.perf_counter() - self.timeout
+        with self.cond:
+            for user in self.users:
+                if user.pending and user.sent_at < deadline:
+                    self.callbacks.pop(user.pending, None)
+                    user.pending = None
+                    user.flow = None
+                    self.lost += 1
+                    self.ready.append(user)
+
+    def _complete(self, user: VirtualUser, reply: Reply) -> None:
+        self.latencies.append(time.perf_counter() - user.sent_at)
+        self.completed += 1
+        user.pending = None
+        flow = user.flow
+        user.step = self._next_step(user, reply)
+        if user.flow is flow:
+            self.ready.appendleft(user)  # сценарій продовжується – наступний крок без черги
+        else:
+            self.ready.append(user)
+
+    # ---- методи Bot API ----
+
+    def get_updates(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        self.polled.set()
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        wait = min(float(params.get("timeout") or 0), 1.0)
+        with self.cond:
+            while self.updates and self.updates[0]["update_id"] < offset:
+                self.updates.popleft()
+            if offset < 0 or (not self.updates and wait and not self.cond.wait(wait)):
+                return []
+            while self.updates and self.updates[0]["update_id"] < offset:
+                self.updates.popleft()
+            return list(itertools.islice(self.updates, limit))
+
+    def handle(self, method: str, params: Dict[str, str]) -> Any:
+        with self.cond:
+            self.api_calls[method] = self.api_calls.get(method, 0) + 1
+        if method == "getUpdates":
+            return self.get_updates(params)
+        if method == "getMe":
+            return BOT_USER
+        if method not in ("sendMessage", "editMessageText", "answerCallbackQuery"):
+            return True
+
+        if method == "answerCallbackQuery":
+            with self.cond:
+                user = self.callbacks.pop(params.get("callback_query_id", ""), None)
+                if user and user.pending == params["callback_query_id"]:
+                    self._complete(user, None)
+            return True
+
+        chat_id = int(params.get("chat_id", 0))
+        message_id = int(params.get("message_id") or next(self.message_ids))
+        with self.cond:
+            user = self.by_chat.get(chat_id)
+            if user and user.pending:
+                self.callbacks.pop(user.pending, None)
+                user.message_id = message_id
+                self._complete(user, params)
+        return {"message_id": message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER, "text": params.get("text", "")}
+
+    def snapshot(self) -> Tuple[List[float], int, int, int, int]:
+        """Забрати накопичену статистику й почати новий етап."""
+        with self.cond:
+            result = (self.latencies, self.sent, self.completed, self.lost, self.skipped)
+            self.latencies = []
+            self.sent = self.completed = self.lost = self.skipped = 0
+            return result
+
+
+def make_handler(fake: FakeTelegram) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, як у справжнього API
+        disable_nagle_algorithm = True  # інакше заголовки й тіло чекають delayed ACK (~40 мс)
+
+        def _serve(self) -> None:
+            url = urlsplit(self.path)
+            params = dict(parse_qsl(url.query))
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                body = self.rfile.read(length).decode()
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    params.update({k: v if isinstance(v, str) else json.dumps(v) for k, v in json.loads(body).items()})
+                else:
+                    params.update(parse_qsl(body))
+            method = url.path.rsplit("/", 1)[-1]
+            payload = json.dumps({"ok": True, "result": fake.handle(method, params)}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = _serve
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+# ===================== Прогін =====================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _process_tree(pid: int) -> List[int]:
+    """PID процесу та всіх його нащадків (процеси-обробники бота)."""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, ()))
+    return tree
+
+
+def rss_kb(pid: int) -> Tuple[Optional[int], Optional[int]]:
+    """Поточний і піковий RSS бота з усіма процесами-обробниками в КБ (/proc, лише Linux)."""
+    if not os.path.isdir("/proc"):
+        return None, None
+    rss = peak = 0
+    for member in _process_tree(pid):
+        try:
+            with open(f"/proc/{member}/status") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key == "VmRSS":
+                        rss += int(value.split()[0])
+                    elif key == "VmHWM":
+                        peak += int(value.split()[0])
+        except (OSError, ValueError, IndexError):
+            continue
+    return rss or None, peak or None
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_stage(fake: FakeTelegram, rate: float, duration: float) -> float:
+    """Генерувати оновлення з рівномірною швидкістю протягом duration секунд."""
+    interval = 1.0 / rate
+    started = time.perf_counter()
+    next_at = started
+    next_reap = started + 0.5
+    while True:
+        now = time.perf_counter()
+        if now - started >= duration:
+            return now - started
+        if now < next_at:
+            time.sleep(min(next_at - now, 0.005))
+            continue
+        fake.emit()
+        next_at += interval
+        if now >= next_reap:
+            fake.reap()
+            next_reap = now + 0.5
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in FLOWS:
+            raise argparse.ArgumentTypeError(f"невідомий сценарій: {name}")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", default="50,100,200",
+                        help="швидкості етапів, оновлень/с, через кому")
+    parser.add_argument("--duration", type=float, default=10, help="тривалість кожного етапу, с")
+    parser.add_argument("--users", type=int, default=1000, help="кількість віртуальних користувачів")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("browse=4,buy=3,text=3"),
+                        help="ваги сценаріїв browse/buy/text")
+    parser.add_argument("--items", type=int, default=0, help="скільки товарів додати до тестових")
+    parser.add_argument("--storage", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="процесів-обробників бота (WORKER_PROCESSES, вмикає sqlite)")
+    parser.add_argument("--engine", choices=("threads", "asyncio"), default="threads",
+                        help="рушій бота (BOT_ENGINE)")
+    parser.add_argument("--timeout", type=float, default=5, help="очікування відповіді на крок, с")
+    parser.add_argument("--real-limits", action="store_true",
+                        help="не знімати ліміти вихідних повідомлень і вхідних оновлень")
+    parser.add_argument("--bot-log", default=os.devnull, help="куди писати вивід процесу бота")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rates = [float(r) for r in args.rate.split(",")]
+
+    fake = FakeTelegram(args.users, args.mix, args.timeout, args.seed)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(fake))
+    server.daemon_threads = True
+    server.handle_error = lambda request, client_address: None  # обриви з'єднань при зупинці бота
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_port}/bot{{0}}/{{1}}"
+
+    storage = "sqlite" if args.processes > 1 else args.storage
+    env = dict(os.environ, TELEGRAM_BOT_TOKEN=BOT_TOKEN, BOT_MODE="polling", BOT_API_URL=api_url,
+               BOT_ENGINE=args.engine, STORAGE_BACKEND=storage, WORKER_PROCESSES=str(args.processes), PORT=str(free_port()))
+    tmpdir = tempfile.TemporaryDirectory()
+    env["STORAGE_PATH"] = os.path.join(tmpdir.name, "loadtest.db")
+    if not args.real_limits:
+        env.setdefault("OUTBOX_GLOBAL_RATE", "1000000")
+        env.setdefault("OUTBOX_CHAT_RATE", "1000000")
+        env.setdefault("OUTBOX_CHAT_BURST", "1000000")
+        env.setdefault("USER_UPDATE_RATE", "0")
+        env.setdefault("SHED_BACKLOG", "0")
+
+    with open(args.bot_log, "w") as log:
+        proc = subprocess.Popen(
+            [sys.executable, "-c", BOT_BOOT, BOT_SCRIPT, str(args.items)],
+            env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        try:
+            if not fake.polled.wait(30):
+                sys.exit("Бот не почав опитування getUpdates за 30 с")
+            time.sleep(1)  # skip_pending і перший довгий запит
+            idle_rss, _ = rss_kb(proc.pid)
+
+            print(f"Користувачів: {args.users:,}, сценарії: {args.mix}, сховище: {storage}, "
+                  f"процесів: {args.processes}, рушій: {args.engine}, "
+                  f"ліміти: {'так' if args.real_limits else 'ні'}, /metrics на порту {env['PORT']}")
+            print(f"RSS бота після старту: {idle_rss or 'н/д'} КБ")
+            print()
+            print(f"{'ціль, /с':>10}{'надіслано':>11}{'відповідей/с':>14}{'p50, мс':>10}{'p99, мс':>10}"
+                  f"{'втрачено':>10}{'пропущено':>11}{'RSS, КБ':>10}")
+            for rate in rates:
+                elapsed = run_stage(fake, rate, args.duration)
+                latencies, sent, completed, lost, skipped = fake.snapshot()
+                rss, _ = rss_kb(proc.pid)
+                print(f"{rate:>10.0f}{sent:>11}{completed / elapsed:>14.1f}"
+                      f"{percentile(latencies, 0.5) * 1000:>10.1f}{percentile(latencies, 0.99) * 1000:>10.1f}"
+                      f"{lost:>10}{skipped:>11}{rss or 'н/д':>10}")
+            _, peak = rss_kb(proc.pid)
+            print()
+            print(f"Піковий RSS бота: {peak or 'н/д'} КБ")
+            print("Виклики API: " + ", ".join(f"{k}={v}" for k, v in sorted(fake.api_calls.items())))
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            server.shutdown()
+            tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
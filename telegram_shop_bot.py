@@ -8,7 +8,9 @@ PyTelegramBotAPI (TelebotAPI).
 - /start, /help, /info, /catalog, /order, /feedback
 - інтерактивний каталог товарів (inline-кнопки)
 - оформлення замовлень та сповіщення адміністраторів
-- просте "адмін-меню": /admin, /add_item, /remove_item, /orders
+- просте "адмін-меню": /admin, /add_item, /remove_item, /orders, /stats
+- пошук товарів: /search та inline-режим (@бот запит у будь-якому чаті;
+  увімкніть його через /setinline у @BotFather)
 - reply-клавіатура для основних команд
 - валідація введених даних (ціна товару)
 - імітація платіжної системи: рахунок, попереднє замовлення,
@@ -26,29 +28,254 @@ PyTelegramBotAPI (TelebotAPI).
 
    або впишіть токен прямо в константу TOKEN нижче (не для продакшну).
 
-4. За бажанням вкажіть ID адміністраторів у множині ADMIN_IDS.
+4. За бажанням вкажіть ID адміністраторів у множині ADMIN_IDS. Коли подій
+   багато, сповіщення приходять їм зведеннями (ADMIN_NOTIFY_THRESHOLD тощо).
+
+5. Режим отримання оновлень задається змінною BOT_MODE:
+   - "polling" (за замовчуванням) – бот сам опитує Telegram (infinity_polling);
+   - "webhook" – Telegram надсилає оновлення на Flask-застосунок.
+     Для цього вкажіть публічну HTTPS-адресу сервісу:
+     export BOT_MODE="webhook"
+     export WEBHOOK_URL="https://shop.example.com"
+     і (бажано) секрет WEBHOOK_SECRET, однаковий для всіх процесів.
+
+   BOT_ENGINE="asyncio" запускає ті самі обробники на AsyncTeleBot в одному
+   циклі подій із сервером aiohttp замість потоків і Flask (потрібен
+   pip install aiohttp; лише один процес). Порівняти рушії:
+   python loadtest.py --engine asyncio.
+
+6. Відповіді на часті питання (FAQ) описані у файлі faq_rules.json поруч
+   зі скриптом (або FAQ_RULES_PATH). Файл можна редагувати без перезапуску:
+   бот перечитає його протягом кількох секунд.
+
+7. Каталог, замовлення та стани користувачів зберігаються в SQLite-файлі
+   STORAGE_PATH (за замовчуванням shop_bot.db). Щоб працювати лише в
+   пам'яті, як раніше, вкажіть STORAGE_BACKEND="memory". Поруч у фоні
+   пишеться знімок SNAPSHOT_PATH: з ним бот відповідає одразу після старту,
+   а дані довантажуються паралельно (SNAPSHOT_INTERVAL=0 вимикає знімки).
+
+8. Для кількох процесів-обробників задайте WORKER_PROCESSES (потрібне
+   сховище SQLite): головний процес приймає оновлення і розподіляє їх за
+   chat id, а каталог, замовлення й ID процеси ділять через базу.
+
+9. Метрики у форматі Prometheus доступні на Flask-адресі /metrics: час
+   обробників, час і помилки запитів до Telegram API, довжини черг,
+   кількість замовлень за статусами.
+
+10. Логи пише окремий потік: обробники лише ставлять запис у чергу.
+   LOG_FORMAT="json" дає одну подію з полями (user_id, order_id, час
+   обробника тощо) на рядок, LOG_SAMPLING – вибірку частих подій.
+
+11. Вхідні оновлення обмежуються до обробників: на кожного користувача
+   (USER_UPDATE_RATE, USER_UPDATE_BURST) і під перевантаженням (SHED_BACKLOG,
+   GLOBAL_UPDATE_RATE) – тоді першим відкидається вільний текст (FAQ), а
+   підтвердження й оплата замовлень проходять завжди.
 """
 
+import asyncio
+import atexit
+import bisect
+import csv
+import functools
+import hashlib
+import heapq
+import html
+import io
+import itertools
+import json
 import logging
+import logging.handlers
+import math
+import mmap
+import multiprocessing
 import os
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Dict, List, Optional, Set
-
+import pathlib
+import queue
+import random
+import re
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import requests
 import telebot
 import threading
 from telebot import types
-from flask import Flask
+from flask import Flask, Response, abort, request
 
 # ===================== Налаштування бота =====================
 
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "YOUR_TELEGRAM_BOT_TOKEN_HERE")
 
+# Адреса Bot API у форматі telebot ("https://api.telegram.org/bot{0}/{1}"), якщо
+# потрібен власний сервер Bot API або локальна заглушка для навантажувальних тестів.
+BOT_API_URL = os.getenv("BOT_API_URL", "")
+
 # Список адміністраторів (chat_id).
 ADMIN_IDS: Set[int] = {
     880923657, # @lfmane TELEGRAM
 }
 
+# Режим отримання оновлень: "polling" або "webhook".
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Рушій: "threads" – TeleBot з потоками обробки та Flask; "asyncio" – ті самі
+# обробники в одному циклі подій з AsyncTeleBot і сервером aiohttp
+# (pip install aiohttp). ASYNC_HTTP_CONNECTIONS – розмір спільного пулу
+# keep-alive з'єднань до Bot API.
+BOT_ENGINE = os.getenv("BOT_ENGINE", "threads")
+ASYNC_HTTP_CONNECTIONS = int(os.getenv("ASYNC_HTTP_CONNECTIONS", "100"))
+
+# Публічна адреса сервісу, на яку Telegram надсилатиме оновлення (лише для webhook).
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+
+# Секрет, що входить у шлях webhook-а і перевіряється в заголовку від Telegram.
+# Якщо не задано, виводимо його з токена, щоб усі процеси за балансувальником
+# мали однаковий шлях.
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or hashlib.sha256(TOKEN.encode()).hexdigest()[:32]
+
+# Скільки оновлень передавати в bot.process_new_updates за один раз.
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
+
+# Розмір черги вхідних оновлень; при переповненні відповідаємо 503,
+# і Telegram повторить доставку пізніше.
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000"))
+
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Постійне сховище: "sqlite" або "memory" (нічого не зберігається між запусками).
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+STORAGE_PATH = os.getenv("STORAGE_PATH", "shop_bot.db")
+
+# Записи в SQLite групуються в одну транзакцію: не довше ніж STORAGE_FLUSH_INTERVAL
+# секунд очікування і не більше STORAGE_BATCH_SIZE операцій за раз.
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", "0.05"))
+STORAGE_BATCH_SIZE = int(os.getenv("STORAGE_BATCH_SIZE", "500"))
+
+# Знімки стану для швидкого старту: файл і як часто його переписувати у фоні
+# (секунди; 0 – вимкнено). Лише для SQLite в одному процесі.
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", STORAGE_PATH + ".snap")
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "600"))
+
+# Кількість процесів-обробників. Якщо більше 1, головний процес лише приймає
+# оновлення й розподіляє їх між процесами за chat id, а каталог, замовлення
+# та лічильники ID процеси ділять через SQLite (потрібен STORAGE_BACKEND="sqlite").
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+# Як часто процес забирає зміни каталогу й замовлень від інших процесів (секунди).
+SHARED_POLL_INTERVAL = float(os.getenv("SHARED_POLL_INTERVAL", "0.2"))
+
+# Кількість товарів на одній сторінці каталогу.
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "10"))
+
+# Черга вихідних запитів до Telegram: кількість потоків-відправників,
+# загальний ліміт (повідомлень/с), ліміт на один чат та розмір пачки.
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "30"))
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))
+OUTBOX_CHAT_BURST = int(os.getenv("OUTBOX_CHAT_BURST", "3"))
+
+# Скільки запитів може чекати в одного відправника. Коли черга повна,
+# обробник чекає до OUTBOX_PUT_TIMEOUT секунд, після чого запит відкидається.
+OUTBOX_QUEUE_SIZE = int(os.getenv("OUTBOX_QUEUE_SIZE", "1000"))
+OUTBOX_PUT_TIMEOUT = float(os.getenv("OUTBOX_PUT_TIMEOUT", "5"))
+OUTBOX_MAX_RETRIES = int(os.getenv("OUTBOX_MAX_RETRIES", "5"))
+
+# Сповіщення адміністраторів: якщо адміну за ADMIN_NOTIFY_WINDOW секунд уже
+# пішло ADMIN_NOTIFY_THRESHOLD сповіщень, наступні збираються у зведення, яке
+# надсилається раз на ADMIN_DIGEST_INTERVAL секунд з ADMIN_DIGEST_LATEST
+# найновішими подіями. Підтвердження оплати завжди надсилаються одразу.
+# З WORKER_PROCESSES > 1 поріг і зведення рахуються окремо в кожному процесі.
+ADMIN_NOTIFY_THRESHOLD = int(os.getenv("ADMIN_NOTIFY_THRESHOLD", "10"))
+ADMIN_NOTIFY_WINDOW = float(os.getenv("ADMIN_NOTIFY_WINDOW", "60"))
+ADMIN_DIGEST_INTERVAL = float(os.getenv("ADMIN_DIGEST_INTERVAL", "60"))
+ADMIN_DIGEST_LATEST = int(os.getenv("ADMIN_DIGEST_LATEST", "5"))
+
+# Кількість потоків обробки оновлень. Оновлення одного користувача завжди
+# обробляє той самий потік (по черзі), різні користувачі – паралельно.
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "4"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+
+# Обмеження вхідних оновлень (перевіряються до постановки в чергу обробки).
+# Кожному користувачу – USER_UPDATE_RATE оновлень/с із запасом
+# USER_UPDATE_BURST (0 – без ліміту; адміністраторів і кнопки оплати не
+# обмежуємо), попередження про це – не частіше ніж раз на
+# USER_THROTTLE_NOTICE_INTERVAL секунд. Під перевантаженням – коли в черзі
+# понад SHED_BACKLOG оновлень або вичерпано спільне відро GLOBAL_UPDATE_RATE
+# оновлень/с (0 – без ліміту; у кожному процесі своє) – першими відкидаються
+# вільний текст (FAQ) та inline-запити, за вдвічі довшої черги – решта,
+# крім підтвердження та оплати замовлень.
+USER_UPDATE_RATE = float(os.getenv("USER_UPDATE_RATE", "1"))
+USER_UPDATE_BURST = int(os.getenv("USER_UPDATE_BURST", "10"))
+USER_THROTTLE_NOTICE_INTERVAL = float(os.getenv("USER_THROTTLE_NOTICE_INTERVAL", "10"))
+GLOBAL_UPDATE_RATE = float(os.getenv("GLOBAL_UPDATE_RATE", "0"))
+SHED_BACKLOG = int(os.getenv("SHED_BACKLOG", "1000"))
+
+# Масовий імпорт каталогу: скільки товарів додавати за раз, як часто
+# оновлювати повідомлення про прогрес і скільки помилок показувати.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_PROGRESS_EVERY = int(os.getenv("IMPORT_PROGRESS_EVERY", "5000"))
+IMPORT_MAX_ERRORS_SHOWN = 20
+# Боти не можуть завантажувати з Telegram файли, більші за 20 МБ.
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024
+
+# Кількість результатів пошуку на сторінці (/search та inline-режим).
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "10"))
+INLINE_PAGE_SIZE = int(os.getenv("INLINE_PAGE_SIZE", "20"))
+
+# Скільки готових текстів і клавіатур товарів/замовлень тримати в кеші.
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "10000"))
+
+# Скільки секунд пам'ятати ID оброблених callback-запитів, щоб відкидати
+# їх повторну доставку.
+CALLBACK_DEDUP_TTL = float(os.getenv("CALLBACK_DEDUP_TTL", "300"))
+
+# Перегляд замовлень адміністратором: замовлень на сторінці та скільки
+# замовлень за раз вибирати з індексу під час експорту в CSV.
+ORDERS_PAGE_SIZE = int(os.getenv("ORDERS_PAGE_SIZE", "10"))
+ORDERS_EXPORT_CHUNK = int(os.getenv("ORDERS_EXPORT_CHUNK", "1000"))
+
+# Статистика продажів (/stats): скільки останніх годин і днів тримати
+# погодинні та денні підсумки.
+STATS_HOURS = int(os.getenv("STATS_HOURS", "48"))
+STATS_DAYS = int(os.getenv("STATS_DAYS", "30"))
+
+# Через скільки секунд без підтвердження (pending) та без оплати
+# (waiting_payment) замовлення скасовується автоматично (0 – ніколи), і чи
+# прибирати тоді кнопки з повідомлення замовлення ("1"/"0").
+ORDER_PENDING_TTL = float(os.getenv("ORDER_PENDING_TTL", "1800"))
+ORDER_PAYMENT_TTL = float(os.getenv("ORDER_PAYMENT_TTL", "86400"))
+ORDER_EXPIRY_EDIT = os.getenv("ORDER_EXPIRY_EDIT", "1") == "1"
+
+# Логи пише окремий потік. LOG_FORMAT: "text" або "json" (одна подія з полями
+# на рядок); LOG_QUEUE_SIZE – скільки записів може чекати, решта відкидається
+# з підрахунком; LOG_SAMPLING – яка частка подій кожного типу потрапляє в лог,
+# напр. "handler=0.01,start=0.1" (не вказані типи пишуться всі).
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLING: Dict[str, float] = {
+    name.strip(): float(rate)
+    for name, rate in (pair.split("=") for pair in os.getenv("LOG_SAMPLING", "handler=0.01,update_rejected=0.01").split(",") if pair)
+}
+
+# Файл з FAQ-правилами та як часто перевіряти, чи він змінився (секунди).
+FAQ_RULES_PATH = os.getenv(
+    "FAQ_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "faq_rules.json"),
+)
+FAQ_RELOAD_INTERVAL = float(os.getenv("FAQ_RELOAD_INTERVAL", "2"))
+
+# Стани користувачів (режими діалогів): скільки секунд неактивності
+# зберігати режим і скільки користувачів максимум тримати в пам'яті.
+USER_STATE_TTL = float(os.getenv("USER_STATE_TTL", "3600"))
+USER_STATE_MAX = int(os.getenv("USER_STATE_MAX", "100000"))
+
 app = Flask(__name__)
 
 
@@ -58,20 +285,141 @@ if TOKEN == "YOUR_TELEGRAM_BOT_TOKEN_HERE":
     # Скрипт все одно створиться, але запускати його без реального токена не можна.
 
 
-# Ініціалізуємо бота
-bot = telebot.TeleBot(TOKEN, parse_mode="HTML")
-
 # Налаштування логування
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-)
+class JsonLogFormatter(logging.Formatter):
+    """Запис логу як один JSON-об'єкт: час, рівень, подія, текст і поля події."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event", None),
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", ()))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Передає записи потоку запису логів, не чекаючи на нього.
+
+    Запис форматується вже в потоці запису; якщо черга повна, запис
+    відкидається і враховується в `dropped`, а обробник іде далі.
+    """
+
+    def __init__(self, log_queue: "queue.Queue") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _setup_logging() -> DroppingQueueHandler:
+    stream = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonLogFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+    handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+    listener = logging.handlers.QueueListener(handler.queue, stream)
+    listener.start()
+    atexit.register(listener.stop)  # дописати чергу при виході
+    return handler
+
+
+LOG_HANDLER = _setup_logging()
 logger = logging.getLogger("shop_bot")
 
 
+def log_event(event: str, message: str, **fields: Any) -> None:
+    """Записати подію `event` з полями `fields` (з урахуванням LOG_SAMPLING).
+
+    `message` – текст для людини, поля підставляються в нього як
+    %(name)s; у JSON-форматі вони також ідуть окремими ключами.
+    """
+    rate = LOG_SAMPLING.get(event)
+    if rate is not None and random.random() >= rate:
+        return
+    if fields:
+        logger.info(message, fields, extra={"event": event, "fields": fields})
+    else:
+        logger.info(message, extra={"event": event})
+
+
+def update_sender(update: types.Update) -> Optional[types.User]:
+    """Користувач, від якого прийшло оновлення (None для службових оновлень)."""
+    for event in (update.message, update.edited_message, update.callback_query,
+                  update.inline_query, update.chosen_inline_result):
+        if event is not None and event.from_user is not None:
+            return event.from_user
+    return None
+
+
+class ShardedTeleBot(telebot.TeleBot):
+    """TeleBot, що розподіляє оновлення між потоками за ID користувача.
+
+    Оновлення одного користувача потрапляють в одну чергу й обробляються
+    послідовно, тож його діалог (стан, замовлення) не перемішується, а
+    різні користувачі обслуговуються паралельно.
+    """
+
+    def __init__(self, token: str, workers: int, **kwargs: Any) -> None:
+        # Обробники виконуються прямо в потоці своєї черги
+        super().__init__(token, threaded=False, **kwargs)
+        self._shards: List["queue.Queue[types.Update]"] = []
+        for i in range(workers):
+            shard: "queue.Queue[types.Update]" = queue.Queue(maxsize=UPDATE_QUEUE_SIZE)
+            worker = threading.Thread(target=self._shard_worker, args=(shard,), name=f"updates-{i}")
+            worker.daemon = True
+            worker.start()
+            self._shards.append(shard)
+
+    @staticmethod
+    def _shard_key(update: types.Update) -> int:
+        sender = update_sender(update)
+        return sender.id if sender is not None else update.update_id
+
+    def process_new_updates(self, updates: List[types.Update]) -> None:
+        for update in updates:
+            # infinity_polling бере наступний offset одразу, не чекаючи обробки
+            if update.update_id > self.last_update_id:
+                self.last_update_id = update.update_id
+            if not UPDATE_LIMITER.admit(update, self.backlog()):
+                continue
+            # Повна черга блокує отримання нових оновлень (зворотний тиск)
+            self._shards[self._shard_key(update) % len(self._shards)].put(update)
+
+    def backlog(self) -> int:
+        return sum(shard.qsize() for shard in self._shards)
+
+    def _shard_worker(self, shard: "queue.Queue[types.Update]") -> None:
+        while True:
+            update = shard.get()
+            try:
+                discard_expired_on_command(update)
+                super().process_new_updates([update])
+            except Exception:
+                logger.exception("Помилка обробки оновлення %s", update.update_id)
+
+
+# Ініціалізуємо бота
+bot = ShardedTeleBot(TOKEN, workers=UPDATE_WORKERS, parse_mode="HTML")
+
+
 # ===================== Моделі даних =====================
 
-@dataclass
+@dataclass(slots=True)
 class CatalogItem:
     item_id: int
     name: str
@@ -79,45 +427,2235 @@ class CatalogItem:
     description: str
 
 
-@dataclass
+# pending -> waiting_payment -> paid / cancelled
+ORDER_STATUSES = ("pending", "waiting_payment", "paid", "cancelled")
+_STATUS_CODES = {status: code for code, status in enumerate(ORDER_STATUSES)}
+
+ORDER_STATUS_TITLES = {
+    "pending": "очікує підтвердження",
+    "waiting_payment": "очікує оплати",
+    "paid": "оплачено",
+    "cancelled": "скасовано",
+}
+
+# Дозволені переходи: дія (префікс кнопки) -> (з якого статусу, в який).
+# Дію, що не відповідає поточному статусу, не виконуємо: так подвійне
+# натискання "Підтвердити" чи pay_ok після скасування нічого не змінюють.
+ORDER_TRANSITIONS: Dict[str, Tuple[str, str]] = {
+    "confirm": ("pending", "waiting_payment"),
+    "cancel": ("pending", "cancelled"),
+    "pay_ok": ("waiting_payment", "paid"),
+    "pay_cancel": ("waiting_payment", "cancelled"),
+}
+
+
+@dataclass(slots=True)
 class Order:
+    """Замовлення з незмінним знімком назви й ціни товару.
+
+    Статус зберігається як номер у ORDER_STATUSES, а час створення – як
+    Unix-час у секундах; назва й ціна посилаються на ті самі об'єкти, що й
+    у товарі, тож знімок не займає додаткової пам'яті. version зростає з
+    кожною зміною статусу (лічильник у пам'яті, у сховище не пишеться).
+    confirmed – замовлення доходило до очікування оплати: скасоване після
+    підтвердження інакше не відрізнити від скасованого одразу, і статистика
+    після перезапуску рахувала б його непідтвердженим.
+    """
     order_id: int
     user_id: int
     username: Optional[str]
     full_name: str
-    item: CatalogItem
-    created_at: datetime
-    status: str = "pending"  # pending -> waiting_payment -> paid / cancelled
+    item_id: int
+    item_name: str
+    price: float
+    created_ts: int
+    status_code: int = 0
+    confirmed: bool = False
+    version: int = 0
+
+    @property
+    def status(self) -> str:
+        return ORDER_STATUSES[self.status_code]
+
+    @status.setter
+    def status(self, status: str) -> None:
+        self.status_code = _STATUS_CODES[status]
+        if status in ("waiting_payment", "paid"):
+            self.confirmed = True
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.created_ts)
+
+
+@dataclass(slots=True)
+class OrderFilter:
+    """Умови вибірки замовлень для адмін-перегляду та експорту.
+
+    Межі часу – Unix-час: since_ts включно, until_ts не включно.
+    """
+    status: Optional[str] = None
+    user_id: Optional[int] = None
+    since_ts: Optional[int] = None
+    until_ts: Optional[int] = None
+
+
+class _SalesBucket:
+    """Підсумки продажів за годину або день."""
+    __slots__ = ("created", "confirmed", "paid", "revenue")
+
+    def __init__(self) -> None:
+        self.created = 0
+        self.confirmed = 0
+        self.paid = 0
+        self.revenue = 0.0
+
+
+class SalesStats:
+    """Статистика продажів, що оновлюється разом із замовленнями.
+
+    OrderStore повідомляє про кожне нове замовлення та зміну статусу, і
+    лічильники, виручка за товарами, погодинні (STATS_HOURS) і денні
+    (STATS_DAYS) підсумки змінюються за O(1), тож /stats не переглядає
+    самі замовлення. Виручка товару лише зростає, тож до топу може
+    потрапити тільки щойно оплачений товар, і топ підтримується без
+    сортування всіх товарів. Події старші за STATS_DAYS потрапляють лише в
+    загальні підсумки.
+    """
+
+    TOP_SIZE = 5
+
+    def __init__(self) -> None:
+        self.created = 0
+        self.confirmed = 0
+        self.paid = 0
+        self.revenue = 0.0
+        self.items: Dict[int, List] = {}  # item_id -> [назва, продано, виручка]
+        self.top: List[int] = []
+        self.hourly: Dict[int, _SalesBucket] = {}  # початок години (Unix-час) -> підсумки
+        self.daily: Dict[date, _SalesBucket] = {}
+
+    def order_added(self, order: "Order") -> None:
+        self.created += 1
+        for bucket in self._buckets(order.created_ts):
+            bucket.created += 1
+        # Замовлення зі сховища вже могли пройти далі (зокрема й скасоване після
+        # підтвердження); час переходу невідомий
+        if order.confirmed:
+            self._confirmed(order.created_ts)
+        if order.status == "paid":
+            self._paid(order, order.created_ts)
+
+    def status_changed(self, order: "Order", old: str, new: str) -> None:
+        now = time.time()
+        if old == "pending" and new in ("waiting_payment", "paid"):
+            self._confirmed(now)
+        if new == "paid" and old != "paid":
+            self._paid(order, now)
+
+    def _confirmed(self, ts: float) -> None:
+        self.confirmed += 1
+        for bucket in self._buckets(ts):
+            bucket.confirmed += 1
+
+    def _paid(self, order: "Order", ts: float) -> None:
+        self.paid += 1
+        self.revenue += order.price
+        for bucket in self._buckets(ts):
+            bucket.paid += 1
+            bucket.revenue += order.price
+
+        entry = self.items.get(order.item_id)
+        if entry is None:
+            entry = self.items[order.item_id] = [order.item_name, 0, 0.0]
+        entry[1] += 1
+        entry[2] += order.price
+        if order.item_id not in self.top:
+            if len(self.top) >= self.TOP_SIZE and entry[2] <= self.items[self.top[-1]][2]:
+                return
+            self.top.append(order.item_id)
+        self.top.sort(key=lambda item_id: self.items[item_id][2], reverse=True)
+        del self.top[self.TOP_SIZE:]
+
+    def _buckets(self, ts: float) -> List[_SalesBucket]:
+        """Денний і погодинний підсумки для моменту `ts` (якщо він ще в межах зберігання)."""
+        now = time.time()
+        if ts < now - STATS_DAYS * 86400:
+            return []
+        day = datetime.fromtimestamp(ts).date()
+        day_bucket = self.daily.get(day)
+        if day_bucket is None:
+            day_bucket = self.daily[day] = _SalesBucket()
+            oldest = datetime.fromtimestamp(now).date() - timedelta(days=STATS_DAYS)
+            for key in [key for key in self.daily if key < oldest]:
+                del self.daily[key]
+        if ts < now - STATS_HOURS * 3600:
+            return [day_bucket]
+        hour = int(ts) // 3600 * 3600
+        hour_bucket = self.hourly.get(hour)
+        if hour_bucket is None:
+            hour_bucket = self.hourly[hour] = _SalesBucket()
+            oldest = int(now) // 3600 * 3600 - STATS_HOURS * 3600
+            for key in [key for key in self.hourly if key < oldest]:
+                del self.hourly[key]
+        return [day_bucket, hour_bucket]
+
+    def last_hours(self, hours: int) -> _SalesBucket:
+        """Сума погодинних підсумків за останні `hours` годин (включно з поточною)."""
+        total = _SalesBucket()
+        since = int(time.time()) // 3600 * 3600 - (hours - 1) * 3600
+        for hour, bucket in self.hourly.items():
+            if hour >= since:
+                total.created += bucket.created
+                total.confirmed += bucket.confirmed
+                total.paid += bucket.paid
+                total.revenue += bucket.revenue
+        return total
+
+
+class OrderStore:
+    """Замовлення з індексами за користувачем, статусом і часом створення.
+
+    Номери замовлень видаються за зростанням разом із часом створення, тому
+    кожен індекс – це відсортований список ID, і "останні k" беруться з його
+    кінця за O(k) без сортування всіх замовлень.
+    """
+
+    def __init__(self) -> None:
+        self._orders: Dict[int, Order] = {}
+        self._recent: List[int] = []
+        self._by_user: Dict[int, List[int]] = {}
+        self._by_status: Dict[str, List[int]] = {}
+        self.stats = SalesStats()
+        # Індекси та статистика змінюються з кількох потоків обробки оновлень
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+
+    def get(self, order_id: int) -> Optional[Order]:
+        return self._orders.get(order_id)
+
+    def add(self, order: Order) -> None:
+        """Додати нове замовлення до сховища та всіх індексів."""
+        with self.lock:
+            self._orders[order.order_id] = order
+            bisect.insort(self._recent, order.order_id)
+            bisect.insort(self._by_user.setdefault(order.user_id, []), order.order_id)
+            bisect.insort(self._by_status.setdefault(order.status, []), order.order_id)
+            self.stats.order_added(order)
+
+    def set_status(self, order: Order, status: str) -> None:
+        """Змінити статус замовлення, переносячи його між індексами статусів."""
+        with self.lock:
+            if order.status == status:
+                return
+            old = order.status
+            ids = self._by_status[old]
+            del ids[bisect.bisect_left(ids, order.order_id)]
+            order.status = status
+            order.version += 1
+            bisect.insort(self._by_status.setdefault(status, []), order.order_id)
+            self.stats.status_changed(order, old, status)
+
+    def transition(self, order: Order, action: str) -> bool:
+        """Виконати дію над замовленням, якщо ORDER_TRANSITIONS її дозволяє."""
+        source, target = ORDER_TRANSITIONS[action]
+        with self.lock:
+            if order.status != source:
+                return False
+            self.set_status(order, target)
+            return True
+
+    def all(self) -> List[Order]:
+        """Копія списку всіх замовлень (для знімка стану)."""
+        with self.lock:
+            return list(self._orders.values())
+
+    def recent(self, limit: int) -> List[Order]:
+        """Останні `limit` замовлень, від найновішого."""
+        with self.lock:
+            return [self._orders[i] for i in reversed(self._recent[-limit:])]
+
+    def recent_for_user(self, user_id: int, limit: int) -> List[Order]:
+        """Останні `limit` замовлень користувача, від найновішого."""
+        with self.lock:
+            ids = self._by_user.get(user_id, [])
+            return [self._orders[i] for i in reversed(ids[-limit:])]
+
+    def with_status(self, status: str) -> List[Order]:
+        """Усі замовлення зі статусом `status`, від найстарішого."""
+        with self.lock:
+            return [self._orders[i] for i in self._by_status.get(status, [])]
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self.lock:
+            return {status: len(ids) for status, ids in self._by_status.items() if ids}
+
+    def select(
+        self,
+        flt: OrderFilter,
+        limit: int,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> Tuple[List[Order], bool]:
+        """Сторінка замовлень за фільтром, від найновішого (keyset-пагінація).
+
+        before – старіші за це ID, after – новіші за це ID. Межі дат
+        знаходяться бінарним пошуком по індексу, бо created_ts не спадає зі
+        зростанням ID (гарантує next_order_stamp); перебираються лише замовлення сторінки (і ті, що
+        відсіюються за статусом, коли задано ще й користувача). Повертає
+        замовлення та ознаку, чи є ще записи в тому ж напрямку.
+        """
+        with self.lock:
+            status = None
+            if flt.user_id is not None:
+                ids = self._by_user.get(flt.user_id, [])
+                status = flt.status
+            elif flt.status is not None:
+                ids = self._by_status.get(flt.status, [])
+            else:
+                ids = self._recent
+
+            def created(order_id: int) -> int:
+                return self._orders[order_id].created_ts
+
+            lo, hi = 0, len(ids)
+            if flt.since_ts is not None:
+                lo = bisect.bisect_left(ids, flt.since_ts, key=created)
+            if flt.until_ts is not None:
+                hi = bisect.bisect_left(ids, flt.until_ts, lo, hi, key=created)
+            if before is not None:
+                hi = min(hi, bisect.bisect_left(ids, before))
+            if after is not None:
+                lo = max(lo, bisect.bisect_right(ids, after))
+
+            positions = range(lo, hi) if after is not None else range(hi - 1, lo - 1, -1)
+            found: List[Order] = []
+            for pos in positions:
+                order = self._orders[ids[pos]]
+                if status is None or order.status == status:
+                    found.append(order)
+                    if len(found) > limit:
+                        break
+
+        more = len(found) > limit
+        del found[limit:]
+        if after is not None:
+            found.reverse()
+        return found, more
+
+
+# Поширені закінчення, які відкидаємо, щоб "футболки" знаходило "футболка".
+# Це не повноцінний стемер, а лише спрощення найчастіших відмінкових форм.
+_UA_ENDINGS = (
+    "ами", "ями", "ові", "еві", "єві", "ого", "ому", "ими", "іми",
+    "ах", "ях", "ам", "ям", "ом", "ем", "єм", "ою", "ею", "єю", "ів", "їв", "ий", "ій", "ої",
+    "а", "я", "у", "ю", "и", "і", "ї", "о", "е", "є", "ь", "й",
+)
+
+_APOSTROPHES = str.maketrans({"'": None, "’": None, "ʼ": None, "`": None, "ґ": "г"})
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_words(text: str) -> List[str]:
+    """Слова тексту в нормалізованому вигляді для пошуку.
+
+    Нижній регістр, без апострофів (м'ята = мʼята = мята), ґ = г і без
+    найпоширеніших відмінкових закінчень у довгих словах.
+    """
+    text = unicodedata.normalize("NFKC", text).lower().translate(_APOSTROPHES)
+    words = []
+    for word in _WORD_RE.findall(text):
+        if len(word) > 4:
+            for ending in _UA_ENDINGS:
+                if word.endswith(ending) and len(word) - len(ending) >= 3:
+                    word = word[:-len(ending)]
+                    break
+        words.append(word)
+    return words
+
+
+class SearchIndex:
+    """Інвертований індекс по назві та опису товарів.
+
+    Слово -> відсортований список ID товарів, плюс відсортований список
+    слів для пошуку за префіксом через bisect. Оновлюється по одному товару
+    при додаванні та видаленні, без перебудови всього індексу.
+    """
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, List[int]] = {}
+        self._terms: List[str] = []
+        self._item_terms: Dict[int, Set[str]] = {}
+        self._ids: List[int] = []  # усі проіндексовані товари за зростанням ID
+        self._lock = threading.Lock()
+
+    def add(self, item: CatalogItem) -> None:
+        terms = set(normalize_words(f"{item.name} {item.description}"))
+        with self._lock:
+            self._remove_locked(item.item_id)
+            self._item_terms[item.item_id] = terms
+            bisect.insort(self._ids, item.item_id)
+            for term in terms:
+                ids = self._postings.get(term)
+                if ids is None:
+                    ids = self._postings[term] = []
+                    bisect.insort(self._terms, term)
+                # Нові товари мають найбільший ID, тож зазвичай це додавання в кінець
+                bisect.insort(ids, item.item_id)
+
+    def remove(self, item_id: int) -> None:
+        with self._lock:
+            self._remove_locked(item_id)
+
+    def _remove_locked(self, item_id: int) -> None:
+        terms = self._item_terms.pop(item_id, None)
+        if terms is None:
+            return
+        del self._ids[bisect.bisect_left(self._ids, item_id)]
+        for term in terms:
+            ids = self._postings[term]
+            del ids[bisect.bisect_left(ids, item_id)]
+            if not ids:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+
+    def _terms_for(self, word: str) -> List[str]:
+        """Слова індексу, що починаються з `word`."""
+        if len(word) < 2:
+            # Однолітерний префікс збігся б майже з усім, тож лише точне слово
+            return [word] if word in self._postings else []
+        start = bisect.bisect_left(self._terms, word)
+        end = bisect.bisect_left(self._terms, word + "\uffff", start)
+        return self._terms[start:end]
+
+    def _stream(self, terms: List[str]) -> Iterator[int]:
+        """ID товарів з будь-яким зі слів `terms` за зростанням, ліниво."""
+        lists = [self._postings[term] for term in terms]
+        if len(lists) == 1:
+            return iter(lists[0])
+        # Товар може містити кілька слів з цим префіксом – повтори склеюємо
+        return (item_id for item_id, _ in itertools.groupby(heapq.merge(*lists)))
+
+    def search(self, query: str, offset: int = 0, limit: int = 10) -> Tuple[List[int], bool]:
+        """ID товарів, що містять усі слова запиту (як префікси), і чи є результати далі.
+
+        Перебираємо за зростанням ID найкоротший список, решту слів
+        перевіряємо за словами самого товару і зупиняємося одразу після
+        потрібної сторінки, не збираючи всіх збігів.
+        """
+        words = list(dict.fromkeys(normalize_words(query)))
+        if not words:
+            return [], False
+        page: List[int] = []
+        with self._lock:
+            matches = sorted(
+                ((sum(len(self._postings[term]) for term in terms), terms) for terms in map(self._terms_for, words)),
+                key=lambda match: match[0],
+            )
+            estimate, driver = matches[0]
+            if not estimate:
+                return [], False
+            filters = [set(terms) for _, terms in matches[1:]]
+            # Злиття списків коштує порядку кількості слів з префіксом, а перебір
+            # усіх товарів підряд – очікувано needed * N / estimate; обираємо дешевше
+            needed = offset + limit + 1
+            if len(driver) > 1 and needed * len(self._ids) < estimate * len(driver):
+                filters.append(set(driver))
+                candidates: Iterator[int] = iter(self._ids)
+            else:
+                candidates = self._stream(driver)
+            found = 0
+            for item_id in candidates:
+                item_terms = self._item_terms[item_id]
+                if all(not item_terms.isdisjoint(terms) for terms in filters):
+                    found += 1
+                    if found > offset:
+                        page.append(item_id)
+                        if len(page) > limit:
+                            break
+        return page[:limit], len(page) > limit
+
+
+class UserState:
+    """Стан діалогу одного користувача (компактний запис замість словника)."""
+
+    __slots__ = ("mode", "search", "orders_filter", "expired", "touched")
+
+    def __init__(self, mode: Optional[str] = None) -> None:
+        self.mode = mode                    # поточний multi-step режим або None
+        self.search: Optional[str] = None   # останній запит /search
+        self.orders_filter: Optional[OrderFilter] = None  # фільтр адмін-перегляду /orders
+        self.expired: Optional[str] = None  # режим, скасований через неактивність
+        self.touched = time.monotonic()
+
+
+class UserStateStore:
+    """Стани користувачів з обмеженням за часом простою (TTL) і кількістю (LRU).
+
+    Записи впорядковані за часом останнього звернення, тож прострочені
+    завжди на початку і прибираються по кілька за виклик. Якщо в забутого
+    стану був активний режим, його назва переходить у новий запис
+    користувача (UserState.expired), щоб повідомити його при наступному
+    повідомленні.
+    """
+
+    # Скільки прострочених записів прибирати з початку за один виклик get().
+    PRUNE_STEP = 8
+
+    def __init__(self, ttl: float, max_users: int, on_forget: Callable[[int], None]) -> None:
+        self._ttl = ttl
+        self._max_users = max_users
+        self._on_forget = on_forget
+        self._states: "OrderedDict[int, UserState]" = OrderedDict()
+        self._expired: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, user_id: int) -> UserState:
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is not None and now - state.touched > self._ttl:
+                self._forget(user_id)
+                state = None
+
+            if state is None:
+                state = self._states[user_id] = UserState()
+                if self._expired:
+                    state.expired = self._expired.pop(user_id, None)
+            else:
+                self._states.move_to_end(user_id)
+            state.touched = now
+
+            for _ in range(self.PRUNE_STEP):
+                oldest_id, oldest = next(iter(self._states.items()))
+                if now - oldest.touched <= self._ttl:
+                    break
+                self._forget(oldest_id)
+            self._evict_overflow()
+            return state
+
+    def modes(self) -> List[Tuple[int, str]]:
+        """Користувачі з активним режимом (для знімка стану)."""
+        with self._lock:
+            return [(user_id, state.mode) for user_id, state in self._states.items() if state.mode is not None]
+
+    def discard_expired(self, user_id: int) -> None:
+        """Не нагадувати про скасований режим: користувач уже перейшов до іншої дії."""
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is not None:
+                state.expired = None
+            self._expired.pop(user_id, None)
+
+    def peek_mode(self, user_id: int) -> Optional[str]:
+        """Режим користувача без продовження його неактивності і без блокування."""
+        state = self._states.get(user_id)
+        return state.mode if state is not None else None
+
+    def restore(self, user_id: int, mode: Optional[str]) -> None:
+        """Відновити стан, збережений у постійному сховищі (з тим самим обмеженням кількості)."""
+        with self._lock:
+            self._states[user_id] = UserState(mode)
+            self._states.move_to_end(user_id)
+            self._evict_overflow()
+
+    def _evict_overflow(self) -> None:
+        while len(self._states) > self._max_users:
+            self._forget(next(iter(self._states)))
+
+    def _forget(self, user_id: int) -> None:
+        state = self._states.pop(user_id)
+        if state.mode is not None:
+            self._expired[user_id] = state.mode
+            if len(self._expired) > self._max_users:
+                self._expired.popitem(last=False)
+            self._on_forget(user_id)
+
+
+# ===================== Постійне сховище =====================
+
+class StorageBackend:
+    """Інтерфейс постійного сховища.
+
+    Сама ця реалізація нічого не зберігає (режим "memory"). Усі читання
+    обслуговуються зі словників у пам'яті, а сховище лише отримує копію
+    кожної зміни (write-through), тож методи запису не повинні блокувати.
+    """
+
+    def load(self) -> Tuple[List[CatalogItem], List[Order], Dict[int, Dict], Dict[str, int]]:
+        """Повернути товари, замовлення, стани користувачів (словники) і лічильники ID."""
+        return [], [], {}, {}
+
+    def load_readonly(self) -> Tuple[List[CatalogItem], List[Order], Dict[int, Dict], Dict[str, int]]:
+        """Те саме, що load(), але безпечно під час роботи (не займає з'єднання запису)."""
+        return self.load()
+
+    def save_item(self, item: CatalogItem) -> None:
+        pass
+
+    def delete_item(self, item_id: int) -> None:
+        pass
+
+    def save_order(self, order: Order) -> None:
+        pass
+
+    def save_user_state(self, user_id: int, state: UserState) -> None:
+        pass
+
+    def set_counter(self, name: str, value: int) -> None:
+        pass
+
+    # Спільне сховище для кількох процесів (див. SharedSQLiteStorage)
+    shared = False
+
+    def flush(self) -> None:
+        """Дочекатися запису всіх змін, поставлених у чергу раніше."""
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteStorage(StorageBackend):
+    """SQLite у режимі WAL з груповим комітом.
+
+    Обробники лише ставлять SQL-операції в чергу. Фоновий потік збирає їх
+    у транзакцію (до `batch_size` операцій або `flush_interval` секунд
+    очікування) і комітить одним fsync замість fsync на кожне натискання.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS items (
+            item_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            description TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            username TEXT,
+            full_name TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            item_name TEXT NOT NULL,
+            item_price REAL NOT NULL,
+            created_at INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            confirmed INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS user_state (
+            user_id INTEGER PRIMARY KEY,
+            state TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            key INTEGER NOT NULL,
+            origin INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+    """
+    ORDER_COLUMNS = (
+        "order_id, user_id, username, full_name, item_id, item_name, "
+        "item_price, created_at, status, confirmed"
+    )
+
+    def __init__(self, path: str, flush_interval: float, batch_size: int, log_changes: bool = False) -> None:
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        # Журнал змін (таблиця changes): хвіст після знімка та канал між процесами
+        self._log_changes = log_changes
+        self._origin = os.getpid()
+        self._path = path
+        # З'єднанням після load() користується лише потік запису.
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+        # Окреме з'єднання для синхронних читань з інших потоків
+        self._read_conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._read_conn.execute("PRAGMA busy_timeout=5000")
+        self._read_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer")
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _migrate(self) -> None:
+        """Додати стовпці, яких немає в базі попередньої версії."""
+        # Під блокуванням запису: процеси-обробники відкривають ту саму базу
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(orders)")}
+            if "confirmed" not in columns:
+                self._conn.execute("ALTER TABLE orders ADD COLUMN confirmed INTEGER NOT NULL DEFAULT 0")
+                # Про старі замовлення відомий лише поточний статус
+                self._conn.execute("UPDATE orders SET confirmed = 1 WHERE status IN ('waiting_payment', 'paid')")
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def load(self) -> Tuple[List[CatalogItem], List[Order], Dict[int, Dict], Dict[str, int]]:
+        self.flush()
+        return self._load_from(self._conn)
+
+    def load_readonly(self) -> Tuple[List[CatalogItem], List[Order], Dict[int, Dict], Dict[str, int]]:
+        # Окреме з'єднання лише для читання: з'єднанням запису вже користується його потік
+        self.flush()
+        conn = sqlite3.connect(f"{pathlib.Path(self._path).absolute().as_uri()}?mode=ro", uri=True)
+        try:
+            conn.execute("PRAGMA busy_timeout=5000")
+            return self._load_from(conn)
+        finally:
+            conn.close()
+
+    def _load_from(
+        self, conn: sqlite3.Connection,
+    ) -> Tuple[List[CatalogItem], List[Order], Dict[int, Dict], Dict[str, int]]:
+        items = [
+            CatalogItem(item_id=row[0], name=row[1], price=row[2], description=row[3])
+            for row in conn.execute(
+                "SELECT item_id, name, price, description FROM items ORDER BY item_id"
+            )
+        ]
+        orders = [
+            self._order_from_row(row)
+            for row in conn.execute(
+                f"SELECT {self.ORDER_COLUMNS} FROM orders ORDER BY order_id"
+            )
+        ]
+        states = {
+            row[0]: json.loads(row[1])
+            for row in conn.execute("SELECT user_id, state FROM user_state")
+        }
+        counters = dict(conn.execute("SELECT name, value FROM counters"))
+        return items, orders, states, counters
+
+    @staticmethod
+    def _order_from_row(row: tuple) -> Order:
+        return Order(
+            order_id=row[0],
+            user_id=row[1],
+            username=row[2],
+            full_name=row[3],
+            item_id=row[4],
+            item_name=row[5],
+            price=row[6],
+            created_ts=row[7],
+            status_code=_STATUS_CODES[row[8]],
+            confirmed=bool(row[9]),
+        )
+
+    def _notify(self, kind: str, key: int) -> None:
+        if self._log_changes:
+            self._queue.put((
+                "INSERT INTO changes (kind, key, origin, created_at) VALUES (?, ?, ?, ?)",
+                (kind, key, self._origin, time.time()),
+            ))
+
+    def save_item(self, item: CatalogItem) -> None:
+        self._queue.put((
+            "INSERT OR REPLACE INTO items (item_id, name, price, description) VALUES (?, ?, ?, ?)",
+            (item.item_id, item.name, item.price, item.description),
+        ))
+        self._notify("item", item.item_id)
+
+    def delete_item(self, item_id: int) -> None:
+        self._queue.put(("DELETE FROM items WHERE item_id = ?", (item_id,)))
+        self._notify("item", item_id)
+
+    def save_order(self, order: Order) -> None:
+        self._queue.put((
+            f"INSERT OR REPLACE INTO orders ({self.ORDER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                order.order_id, order.user_id, order.username, order.full_name,
+                order.item_id, order.item_name, order.price, order.created_ts, order.status,
+                int(order.confirmed),
+            ),
+        ))
+        self._notify("order", order.order_id)
+
+    def save_user_state(self, user_id: int, state: UserState) -> None:
+        self._notify("state", user_id)
+        if state.mode is None:
+            # Стан без режиму не зберігаємо, щоб таблиця не росла з кожним користувачем.
+            self._queue.put(("DELETE FROM user_state WHERE user_id = ?", (user_id,)))
+            return
+        self._queue.put((
+            "INSERT OR REPLACE INTO user_state (user_id, state) VALUES (?, ?)",
+            (user_id, json.dumps({"mode": state.mode}, ensure_ascii=False)),
+        ))
+
+    def set_counter(self, name: str, value: int) -> None:
+        self._queue.put((
+            "INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)",
+            (name, value),
+        ))
+
+    def flush(self) -> None:
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def change_seq(self) -> int:
+        """Номер останнього закоміченого запису в журналі змін."""
+        with self._read_lock:
+            return self._read_conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def load_tail(
+        self, after_seq: int,
+    ) -> Tuple[Dict[int, Optional[CatalogItem]], Dict[int, Order], Dict[int, Optional[Dict]], Dict[str, int]]:
+        """Поточний стан усього, що змінилося після запису журналу `after_seq`.
+
+        Повертає товари (None – видалено), замовлення, стани користувачів
+        (None – без режиму) та всі лічильники.
+        """
+        self.flush()
+        items: Dict[int, Optional[CatalogItem]] = {}
+        orders: Dict[int, Order] = {}
+        states: Dict[int, Optional[Dict]] = {}
+        with self._read_lock:
+            conn = self._read_conn
+            changed = conn.execute(
+                "SELECT DISTINCT kind, key FROM changes WHERE seq > ?", (after_seq,)
+            ).fetchall()
+            for kind, key in changed:
+                if kind == "item":
+                    row = conn.execute(
+                        "SELECT item_id, name, price, description FROM items WHERE item_id = ?", (key,)
+                    ).fetchone()
+                    items[key] = CatalogItem(*row) if row else None
+                elif kind == "order":
+                    row = conn.execute(
+                        f"SELECT {self.ORDER_COLUMNS} FROM orders WHERE order_id = ?", (key,)
+                    ).fetchone()
+                    if row:
+                        orders[key] = self._order_from_row(row)
+                else:
+                    row = conn.execute("SELECT state FROM user_state WHERE user_id = ?", (key,)).fetchone()
+                    states[key] = json.loads(row[0]) if row else None
+            counters = dict(conn.execute("SELECT name, value FROM counters"))
+        return items, orders, states, counters
+
+    def snapshot_written(self, seq: int) -> None:
+        """Знімок до запису `seq` збережено: позначити його чинним і обрізати журнал."""
+        self._queue.put(("INSERT OR REPLACE INTO counters (name, value) VALUES ('snapshot_seq', ?)", (seq,)))
+        self._queue.put(("DELETE FROM changes WHERE seq <= ?", (seq,)))
+
+    def forget_snapshot(self) -> None:
+        """Журнал змін не ведеться, тож наявний файл знімка більше не можна доповнити."""
+        self._queue.put(("DELETE FROM counters WHERE name = 'snapshot_seq'", ()))
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+        self._read_conn.close()
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._flush_interval
+            # Маркер flush() комітить те, що вже зібрано, без очікування.
+            while len(batch) < self._batch_size and not isinstance(batch[-1], threading.Event):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch: List) -> None:
+        ops = [op for op in batch if not isinstance(op, threading.Event)]
+        if ops:
+            try:
+                self._conn.execute("BEGIN")
+                for sql, params in ops:
+                    self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                logger.exception("Не вдалося записати в SQLite пачку з %s операцій", len(ops))
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+        for op in batch:
+            if isinstance(op, threading.Event):
+                op.set()
+
+
+class SharedSQLiteStorage(SQLiteStorage):
+    """SQLite, спільний для кількох процесів бота.
+
+    Кожен запис товару чи замовлення супроводжується рядком у таблиці
+    changes у тій самій транзакції – це канал інвалідації: інші процеси
+    періодично забирають нові рядки (poll_changes) і перечитують змінені
+    товари й замовлення у свої кеші. ID видаються атомарним UPDATE у
+    базі, а не лічильником у пам'яті процесу.
+
+    Видача ID – окрема транзакція на кожне замовлення, тому її з'єднання
+    комітить з synchronous=NORMAL, без fsync. Блоки ID на процес не
+    підходять: номери замовлень мають зростати разом із часом створення
+    по всіх процесах (на цьому тримається пошук за датою). Незбережений
+    коміт лічильника при збої живлення губиться лише разом з усіма
+    пізнішими записами WAL, зокрема й замовленнями з цими ID, тож повторно
+    виданий номер не збігається з жодним збереженим – ті самі гарантії, що
+    й у групового коміту.
+    """
+
+    shared = True
+
+    # Скільки секунд зберігати рядки changes (процеси читають їх частіше).
+    CHANGES_RETENTION = 3600
+
+    def __init__(self, path: str, flush_interval: float, batch_size: int) -> None:
+        super().__init__(path, flush_interval, batch_size, log_changes=True)
+        # Лічильники ID комітяться через з'єднання читання (див. докстрінг класу)
+        self._read_conn.execute("PRAGMA synchronous=NORMAL")
+        self._last_seq = 0
+        self._last_prune = 0.0
+
+    def load(self) -> Tuple[List[CatalogItem], List[Order], Dict[int, Dict], Dict[str, int]]:
+        # Позицію в каналі беремо до читання: зміни, що з'являться під час
+        # завантаження, застосуються ще раз, але не загубляться.
+        self._last_seq = self.change_seq()
+        return super().load()
+
+    def set_counter(self, name: str, value: int) -> None:
+        pass  # лічильники змінюють лише next_id() і next_order_stamp()
+
+    def next_id(self, name: str) -> int:
+        """Атомарно видати наступний ID з лічильника в базі."""
+        with self._read_lock:
+            return self._read_conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 2) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + 1 RETURNING value - 1",
+                (name,),
+            ).fetchone()[0]
+
+    def next_order_stamp(self, now: int) -> Tuple[int, int]:
+        """Атомарно видати ID замовлення і час створення, не менший за час попереднього."""
+        with self._read_lock:
+            conn = self._read_conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                order_id = conn.execute(
+                    "INSERT INTO counters (name, value) VALUES ('next_order_id', 2) "
+                    "ON CONFLICT (name) DO UPDATE SET value = value + 1 RETURNING value - 1",
+                ).fetchone()[0]
+                created_ts = conn.execute(
+                    "INSERT INTO counters (name, value) VALUES ('last_order_ts', ?) "
+                    "ON CONFLICT (name) DO UPDATE SET value = max(value, excluded.value) RETURNING value",
+                    (now,),
+                ).fetchone()[0]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return order_id, created_ts
+
+    def poll_changes(self) -> List[Tuple[str, int, Any]]:
+        """Зміни від інших процесів з останнього виклику.
+
+        Повертає (тип, ID, актуальний CatalogItem/Order або None, якщо видалено).
+        """
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                "SELECT seq, kind, key FROM changes "
+                "WHERE seq > ? AND origin != ? AND kind != 'state' ORDER BY seq",
+                (self._last_seq, self._origin),
+            ).fetchall()
+            if not rows:
+                return []
+            self._last_seq = rows[-1][0]
+            result = []
+            for _, kind, key in rows:
+                if kind == "item":
+                    row = self._read_conn.execute(
+                        "SELECT item_id, name, price, description FROM items WHERE item_id = ?", (key,)
+                    ).fetchone()
+                    obj = CatalogItem(*row) if row else None
+                else:
+                    row = self._read_conn.execute(
+                        f"SELECT {self.ORDER_COLUMNS} FROM orders WHERE order_id = ?", (key,)
+                    ).fetchone()
+                    obj = self._order_from_row(row) if row else None
+                result.append((kind, key, obj))
+
+        now = time.time()
+        if now - self._last_prune > 60:
+            self._last_prune = now
+            self._queue.put(("DELETE FROM changes WHERE created_at < ?", (now - self.CHANGES_RETENTION,)))
+        return result
+
+
+class Snapshot:
+    """Компактний бінарний знімок каталогу, замовлень і станів користувачів.
+
+    Файл: заголовок, масиви записів фіксованої довжини (товари й замовлення
+    відсортовані за ID, стани) і блок UTF-8 рядків, на які записи
+    посилаються зсувом і довжиною; однакові рядки (імена покупців, назви
+    товарів у замовленнях) зберігаються один раз. Читається через mmap:
+    відкриття не залежить від розміру, а запис за ID знаходиться бінарним
+    пошуком без розбору решти файлу.
+    """
+
+    MAGIC = b"SHOPSNAP"
+    VERSION = 2
+    # magic, версія, резерв, seq журналу змін, кількість товарів, замовлень, станів
+    HEADER = struct.Struct("<8sIIqqqq")
+    # item_id, ціна, назва (зсув, довжина), опис (зсув, довжина) – 4 слова по 8 байтів
+    ITEM = struct.Struct("<qdIIII")
+    # order_id, user_id, item_id, ціна, час, статус і ознака підтвердження,
+    # username, full_name, item_name – 9 слів
+    ORDER = struct.Struct("<qqqdqBB6xIIIIII")
+    # user_id, режим (зсув, довжина)
+    STATE = struct.Struct("<qII")
+    NO_STRING = 0xFFFFFFFF
+    WRITE_CHUNK = 4096
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, self.change_seq, self.item_count, self.order_count, self.state_count = (
+                self.HEADER.unpack_from(self._mm, 0)
+            )
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError("невідомий формат знімка")
+            self._items_off = self.HEADER.size
+            self._orders_off = self._items_off + self.ITEM.size * self.item_count
+            self._states_off = self._orders_off + self.ORDER.size * self.order_count
+            self._strings_off = self._states_off + self.STATE.size * self.state_count
+            if self._strings_off > len(self._mm):
+                raise ValueError("файл знімка обрізаний")
+            view = memoryview(self._mm)
+            # ID – перше слово кожного запису: кроковий зріз дає відсортований масив для bisect
+            self._item_ids = view[self._items_off:self._orders_off].cast("q")[::self.ITEM.size // 8]
+            self._order_ids = view[self._orders_off:self._states_off].cast("q")[::self.ORDER.size // 8]
+            view.release()
+        except Exception:
+            self._mm.close()
+            raise
+        # Рядки за зсувом: однакові імена й назви стають одним об'єктом у пам'яті
+        self._strings: Dict[int, str] = {}
+
+    def close(self) -> None:
+        self._item_ids.release()
+        self._order_ids.release()
+        self._mm.close()
+        self._strings = {}
+
+    def _string(self, off: int, length: int) -> Optional[str]:
+        if off == self.NO_STRING:
+            return None
+        if not length:
+            # Порожній рядок має той самий зсув, що й наступний за ним
+            return ""
+        text = self._strings.get(off)
+        if text is None:
+            start = self._strings_off + off
+            text = self._strings[off] = self._mm[start:start + length].decode("utf-8")
+        return text
+
+    def item(self, index: int) -> CatalogItem:
+        item_id, price, name_off, name_len, desc_off, desc_len = self.ITEM.unpack_from(
+            self._mm, self._items_off + index * self.ITEM.size
+        )
+        return CatalogItem(item_id, self._string(name_off, name_len), price, self._string(desc_off, desc_len))
 
+    def order(self, index: int) -> Order:
+        (order_id, user_id, item_id, price, created_ts, status_code, confirmed,
+         username_off, username_len, name_off, name_len, item_off, item_len) = self.ORDER.unpack_from(
+            self._mm, self._orders_off + index * self.ORDER.size
+        )
+        return Order(
+            order_id=order_id,
+            user_id=user_id,
+            username=self._string(username_off, username_len),
+            full_name=self._string(name_off, name_len),
+            item_id=item_id,
+            item_name=self._string(item_off, item_len),
+            price=price,
+            created_ts=created_ts,
+            status_code=status_code,
+            confirmed=bool(confirmed),
+        )
+
+    def find_item(self, item_id: int) -> Optional[CatalogItem]:
+        index = bisect.bisect_left(self._item_ids, item_id)
+        if index < self.item_count and self._item_ids[index] == item_id:
+            return self.item(index)
+        return None
 
-# Пам'ять у процесі (для навчального проєкту цього достатньо)
+    def find_order(self, order_id: int) -> Optional[Order]:
+        index = bisect.bisect_left(self._order_ids, order_id)
+        if index < self.order_count and self._order_ids[index] == order_id:
+            return self.order(index)
+        return None
+
+    def states(self) -> Iterator[Tuple[int, str]]:
+        for index in range(self.state_count):
+            user_id, mode_off, mode_len = self.STATE.unpack_from(
+                self._mm, self._states_off + index * self.STATE.size
+            )
+            yield user_id, self._string(mode_off, mode_len)
+
+    @classmethod
+    def write(
+        cls,
+        path: str,
+        change_seq: int,
+        items: List[CatalogItem],
+        orders: List[Order],
+        states: List[Tuple[int, str]],
+    ) -> None:
+        """Записати знімок у тимчасовий файл і атомарно замінити ним `path`."""
+        items.sort(key=lambda item: item.item_id)
+        orders.sort(key=lambda order: order.order_id)  # майже відсортовано – Timsort лінійний
+        blob = bytearray()
+        refs: Dict[str, Tuple[int, int]] = {}
+
+        def ref(text: Optional[str]) -> Tuple[int, int]:
+            if text is None:
+                return cls.NO_STRING, 0
+            found = refs.get(text)
+            if found is None:
+                data = text.encode("utf-8")
+                found = refs[text] = (len(blob), len(data))
+                blob.extend(data)
+            return found
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, 0, change_seq, len(items), len(orders), len(states)))
+            for start in range(0, len(items), cls.WRITE_CHUNK):
+                f.write(b"".join(
+                    cls.ITEM.pack(item.item_id, item.price, *ref(item.name), *ref(item.description))
+                    for item in items[start:start + cls.WRITE_CHUNK]
+                ))
+            for start in range(0, len(orders), cls.WRITE_CHUNK):
+                f.write(b"".join(
+                    cls.ORDER.pack(
+                        o.order_id, o.user_id, o.item_id, o.price, o.created_ts, o.status_code, o.confirmed,
+                        *ref(o.username), *ref(o.full_name), *ref(o.item_name),
+                    )
+                    for o in orders[start:start + cls.WRITE_CHUNK]
+                ))
+            f.write(b"".join(cls.STATE.pack(user_id, *ref(mode)) for user_id, mode in states))
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+# Пам'ять у процесі служить кешем; STORAGE отримує копію кожної зміни.
 CATALOG: Dict[int, CatalogItem] = {}
-ORDERS: Dict[int, Order] = {}
-USER_STATE: Dict[int, Dict] = {}  # стан користувачів для multi-step діалогів
+# ID товарів CATALOG за зростанням – порядок сторінок каталогу, inline-видачі й експорту.
+# Не залежить від порядку, в якому товари потрапили в пам'ять (знімок довантажується
+# у фоні, а окремі товари беруться з нього раніше). Змінюється під _catalog_lock.
+_catalog_ids: List[int] = []
+# Версія кожного товару для ключів RENDER_CACHE; зростає з кожною зміною
+_item_versions: Dict[int, int] = {}
+ORDERS = OrderStore()
+# Стан користувачів для multi-step діалогів; забуті режими стираються і зі сховища
+USER_STATE = UserStateStore(
+    USER_STATE_TTL,
+    USER_STATE_MAX,
+    on_forget=lambda user_id: STORAGE.save_user_state(user_id, UserState()),
+)
+SEARCH_INDEX = SearchIndex()
+STORAGE = StorageBackend()
 
 _next_item_id = 1
 _next_order_id = 1
+_last_order_ts = 0  # час створення останнього виданого замовлення
+
+# Номер цього процесу-обробника (None – головний процес або єдиний процес)
+WORKER_INDEX: Optional[int] = None
+
+# Видача ID та зміни каталогу мають бути атомарними між потоками обробки
+_id_lock = threading.Lock()
+_catalog_lock = threading.RLock()
+
+# Знімок, з якого каталог і замовлення ще довантажуються у фоні (None – усе в пам'яті),
+# і товари, яких не можна брати зі знімка (видалені після нього)
+_loading_snapshot: Optional[Snapshot] = None
+_snapshot_skip_items: Set[int] = set()
+DATA_LOADED = threading.Event()
+# Запис знімка не має перериватися закриттям сховища при виході
+_snapshot_lock = threading.Lock()
+_snapshot_stop = threading.Event()
+# Скільки записів знімка переносити в пам'ять за одне захоплення блокування.
+SNAPSHOT_LOAD_CHUNK = 2000
+
+
+def init_storage() -> None:
+    """Відкрити постійне сховище та завантажити з нього стан у пам'ять.
+
+    Якщо є чинний знімок, у пам'ять одразу потрапляють лише зміни після
+    нього та стани користувачів, а каталог і замовлення довантажуються у
+    фоні (load_snapshot_async), тож час старту не залежить від обсягу даних.
+    """
+    global STORAGE, _next_item_id, _next_order_id, _last_order_ts
+    use_snapshots = STORAGE_BACKEND == "sqlite" and SNAPSHOT_INTERVAL > 0 and WORKER_PROCESSES <= 1
+    if STORAGE_BACKEND == "sqlite":
+        if WORKER_PROCESSES > 1:
+            STORAGE = SharedSQLiteStorage(STORAGE_PATH, STORAGE_FLUSH_INTERVAL, STORAGE_BATCH_SIZE)
+        else:
+            STORAGE = SQLiteStorage(
+                STORAGE_PATH, STORAGE_FLUSH_INTERVAL, STORAGE_BATCH_SIZE, log_changes=use_snapshots
+            )
+            if not use_snapshots:
+                STORAGE.forget_snapshot()
+        atexit.register(STORAGE.close)
+
+    counters = load_snapshot_async() if use_snapshots else None
+    from_snapshot = counters is not None
+    if not from_snapshot:
+        items, orders, states, counters = STORAGE.load()
+        with _catalog_lock:
+            _put_loaded_items(items)
+        for order in orders:
+            ORDERS.add(order)
+        for user_id, state in states.items():
+            if owns_user(user_id):
+                USER_STATE.restore(user_id, state.get("mode"))
+        invalidate_catalog_pages()
+        DATA_LOADED.set()
+        logger.info(
+            "Завантажено зі сховища: %s товарів, %s замовлень, %s станів користувачів",
+            len(items), len(orders), len(states),
+        )
+    _next_item_id = counters.get("next_item_id", _next_item_id)
+    _next_order_id = counters.get("next_order_id", _next_order_id)
+    # У базах, створених до появи лічильника, беремо час найновішого замовлення
+    newest = ORDERS.recent(1)
+    _last_order_ts = counters.get("last_order_ts", newest[0].created_ts if newest else _last_order_ts)
+
+    if use_snapshots:
+        # Після повного завантаження знімок записується одразу, щоб наступний старт був швидким
+        writer = threading.Thread(target=_snapshot_loop, args=(not from_snapshot,), name="snapshot-writer")
+        writer.daemon = True
+        writer.start()
+        atexit.register(stop_snapshots)  # atexit викликає у зворотному порядку: до STORAGE.close
+
+
+def owns_user(user_id: int) -> bool:
+    """Чи обробляє цей процес оновлення користувача (у приватному чаті chat id = user id)."""
+    if WORKER_PROCESSES <= 1:
+        return True
+    return WORKER_INDEX is not None and user_id % WORKER_PROCESSES == WORKER_INDEX
 
 
 def get_next_item_id() -> int:
     global _next_item_id
-    item_id = _next_item_id
-    _next_item_id += 1
+    if STORAGE.shared:
+        item_id = STORAGE.next_id("next_item_id")
+        _next_item_id = item_id + 1
+        return item_id
+    with _id_lock:
+        item_id = _next_item_id
+        _next_item_id += 1
+        STORAGE.set_counter("next_item_id", _next_item_id)
     return item_id
 
 
-def get_next_order_id() -> int:
-    global _next_order_id
-    order_id = _next_order_id
-    _next_order_id += 1
-    return order_id
+def next_order_stamp() -> Tuple[int, int]:
+    """ID нового замовлення та його час створення (Unix-секунди).
+
+    Обидва видаються в одній критичній секції (у кількох процесах – в одній
+    транзакції SQLite), і час не менший за час попереднього замовлення, навіть
+    якщо годинник відступив назад. Тож created_ts не спадає зі зростанням ID –
+    на цьому тримається бінарний пошук меж дат в OrderStore.select.
+    """
+    global _next_order_id, _last_order_ts
+    now = int(time.time())
+    if STORAGE.shared:
+        order_id, created_ts = STORAGE.next_order_stamp(now)
+        _next_order_id = order_id + 1
+        return order_id, created_ts
+    with _id_lock:
+        order_id = _next_order_id
+        _next_order_id += 1
+        _last_order_ts = max(now, _last_order_ts)
+        STORAGE.set_counter("next_order_id", _next_order_id)
+        STORAGE.set_counter("last_order_ts", _last_order_ts)
+        return order_id, _last_order_ts
+
+
+def find_item(item_id: int) -> Optional[CatalogItem]:
+    """Товар за ID; поки знімок довантажується, відсутній товар береться з нього."""
+    item = CATALOG.get(item_id)
+    if item is None and _loading_snapshot is not None:
+        with _catalog_lock:
+            item = CATALOG.get(item_id)
+            if item is None and _loading_snapshot is not None and item_id not in _snapshot_skip_items:
+                item = _loading_snapshot.find_item(item_id)
+                if item is not None:
+                    _put_item_locally(item)
+    return item
+
+
+def find_order(order_id: int) -> Optional[Order]:
+    """Замовлення за ID; поки знімок довантажується, відсутнє береться з нього."""
+    order = ORDERS.get(order_id)
+    if order is None and _loading_snapshot is not None:
+        with ORDERS.lock:
+            order = ORDERS.get(order_id)
+            if order is None and _loading_snapshot is not None:
+                order = _loading_snapshot.find_order(order_id)
+                if order is not None:
+                    ORDERS.add(order)
+    return order
+
+
+def load_snapshot_async() -> Optional[Dict[str, int]]:
+    """Почати старт зі знімка SNAPSHOT_PATH.
+
+    Одразу застосовуються зміни після знімка (з журналу changes) і стани
+    користувачів; каталог і замовлення переносяться в пам'ять фоновим
+    потоком, а до його завершення find_item/find_order читають відсутні
+    записи прямо зі знімка. Повертає лічильники або None, якщо знімка
+    немає або він не відповідає сховищу.
+    """
+    global _loading_snapshot
+    if not os.path.exists(SNAPSHOT_PATH):
+        return None
+    started = time.perf_counter()
+    try:
+        snapshot = Snapshot(SNAPSHOT_PATH)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning("Знімок %s не прочитано (%s), повне завантаження зі сховища", SNAPSHOT_PATH, e)
+        return None
+    items, orders, states, counters = STORAGE.load_tail(snapshot.change_seq)
+    if counters.get("snapshot_seq") != snapshot.change_seq:
+        snapshot.close()
+        logger.warning("Знімок %s застарів, повне завантаження зі сховища", SNAPSHOT_PATH)
+        return None
 
+    with _catalog_lock:
+        for item_id, item in items.items():
+            if item is None:
+                _snapshot_skip_items.add(item_id)
+            else:
+                _put_item_locally(item)
+        invalidate_catalog_pages()
+    for order in orders.values():
+        ORDERS.add(order)
+    modes = dict(snapshot.states())
+    for user_id, state in states.items():
+        modes[user_id] = state.get("mode") if state else None
+    for user_id, mode in modes.items():
+        if mode is not None:
+            USER_STATE.restore(user_id, mode)
+
+    logger.info(
+        "Старт зі знімка за %.3f с: %s товарів, %s замовлень довантажуються у фоні; змін після знімка: %s",
+        time.perf_counter() - started, snapshot.item_count, snapshot.order_count,
+        len(items) + len(orders) + len(states),
+    )
+    _loading_snapshot = snapshot
+    loader = threading.Thread(target=_hydrate_from_snapshot, args=(snapshot,), name="snapshot-loader")
+    loader.daemon = True
+    loader.start()
+    return counters
+
+
+def _hydrate_from_snapshot(snapshot: Snapshot) -> None:
+    """Перенести каталог і замовлення зі знімка в пам'ять невеликими порціями.
+
+    Записи, які вже є в пам'яті (зміни після знімка, точкові звернення),
+    новіші за знімок і не перезаписуються. Між порціями блокування
+    відпускаються, тож обробка оновлень не чекає на все завантаження.
+    """
+    global _loading_snapshot
+    started = time.perf_counter()
+    try:
+        for start in range(0, snapshot.item_count, SNAPSHOT_LOAD_CHUNK):
+            with _catalog_lock:
+                _put_loaded_items(
+                    snapshot.item(index) for index in range(start, min(start + SNAPSHOT_LOAD_CHUNK, snapshot.item_count))
+                )
+                invalidate_catalog_pages()
+        for start in range(0, snapshot.order_count, SNAPSHOT_LOAD_CHUNK):
+            with ORDERS.lock:
+                for index in range(start, min(start + SNAPSHOT_LOAD_CHUNK, snapshot.order_count)):
+                    order = snapshot.order(index)
+                    if order.order_id not in ORDERS:
+                        ORDERS.add(order)
+        logger.info("Знімок довантажено за %.2f с", time.perf_counter() - started)
+    except Exception:
+        logger.exception("Не вдалося довантажити знімок, повне завантаження зі сховища")
+        items, orders, _, _ = STORAGE.load_readonly()
+        with _catalog_lock:
+            _put_loaded_items(items)
+            invalidate_catalog_pages()
+        with ORDERS.lock:
+            for order in orders:
+                if order.order_id not in ORDERS:
+                    ORDERS.add(order)
+    finally:
+        with _catalog_lock, ORDERS.lock:
+            _loading_snapshot = None
+            _snapshot_skip_items.clear()
+        snapshot.close()
+        DATA_LOADED.set()
+
+
+def write_snapshot() -> None:
+    """Записати знімок поточного стану та обрізати журнал змін до нього.
+
+    Номер журналу береться до копіювання: зміни, що встигнуть потрапити і
+    в знімок, і в журнал після цього номера, при старті просто застосуються
+    ще раз.
+    """
+    started = time.perf_counter()
+    seq = STORAGE.change_seq()
+    with _catalog_lock:
+        items = list(CATALOG.values())
+    orders = ORDERS.all()
+    Snapshot.write(SNAPSHOT_PATH, seq, items, orders, USER_STATE.modes())
+    STORAGE.snapshot_written(seq)
+    logger.info(
+        "Знімок стану записано: %s товарів, %s замовлень за %.2f с",
+        len(items), len(orders), time.perf_counter() - started,
+    )
 
-def get_user_state(user_id: int) -> Dict:
+
+def _snapshot_loop(write_now: bool) -> None:
+    DATA_LOADED.wait()
+    if not write_now and _snapshot_stop.wait(SNAPSHOT_INTERVAL):
+        return
+    while True:
+        with _snapshot_lock:
+            if _snapshot_stop.is_set():
+                return
+            try:
+                write_snapshot()
+            except Exception:
+                logger.exception("Не вдалося записати знімок стану")
+        if _snapshot_stop.wait(SNAPSHOT_INTERVAL):
+            return
+
+
+def stop_snapshots() -> None:
+    """Зупинити фоновий запис знімків, дочекавшись поточного запису."""
+    _snapshot_stop.set()
+    with _snapshot_lock:
+        pass
+
+
+def get_user_state(user_id: int) -> UserState:
     """Отримати стан користувача, при необхідності створити."""
-    if user_id not in USER_STATE:
-        USER_STATE[user_id] = {"mode": None}
-    return USER_STATE[user_id]
+    # Стан користувача змінює лише потік, до якого прив'язаний цей користувач
+    return USER_STATE.get(user_id)
+
+
+def _bump_item_version(item_id: int) -> None:
+    """Нова версія товару: його закешовані тексти більше не використовуються."""
+    _item_versions[item_id] = _item_versions.get(item_id, 0) + 1
+
+
+def _insert_catalog_ids(item_ids: List[int]) -> None:
+    """Додати нові ID (за зростанням) у відсортований _catalog_ids."""
+    if not item_ids:
+        return
+    pos = bisect.bisect_left(_catalog_ids, item_ids[0])
+    if pos == len(_catalog_ids) or item_ids[-1] < _catalog_ids[pos]:
+        _catalog_ids[pos:pos] = item_ids
+    else:
+        _catalog_ids.extend(item_ids)
+        _catalog_ids.sort()  # два відсортовані відрізки – Timsort лінійний
+
+
+def _put_item_locally(item: CatalogItem) -> None:
+    if item.item_id not in CATALOG:
+        _insert_catalog_ids([item.item_id])
+    CATALOG[item.item_id] = item
+    _bump_item_version(item.item_id)
+    SEARCH_INDEX.add(item)
+
+
+def _put_loaded_items(items: Iterable[CatalogItem]) -> None:
+    """Товари зі сховища чи знімка; ті, що вже в пам'яті (новіші) або видалені, пропускаються."""
+    new_ids = []
+    for item in items:
+        if item.item_id not in CATALOG and item.item_id not in _snapshot_skip_items:
+            CATALOG[item.item_id] = item
+            SEARCH_INDEX.add(item)
+            new_ids.append(item.item_id)
+    new_ids.sort()
+    _insert_catalog_ids(new_ids)
+
+
+def _drop_item_locally(item_id: int) -> Optional[CatalogItem]:
+    item = CATALOG.pop(item_id, None)
+    if _loading_snapshot is not None:
+        _snapshot_skip_items.add(item_id)  # щоб фонове завантаження не повернуло товар
+    if item:
+        del _catalog_ids[bisect.bisect_left(_catalog_ids, item_id)]
+        _bump_item_version(item_id)
+        SEARCH_INDEX.remove(item_id)
+    return item
+
+
+def add_catalog_item(item: CatalogItem) -> None:
+    with _catalog_lock:
+        _put_item_locally(item)
+        STORAGE.save_item(item)
+        invalidate_catalog_pages()
+
+
+def add_catalog_items(items: List[CatalogItem]) -> None:
+    """Додати пачку товарів з одним скиданням кешу сторінок."""
+    with _catalog_lock:
+        for item in items:
+            _put_item_locally(item)
+            STORAGE.save_item(item)
+        invalidate_catalog_pages()
+
+
+def remove_catalog_item(item_id: int) -> Optional[CatalogItem]:
+    with _catalog_lock:
+        find_item(item_id)  # товар може бути ще лише у знімку
+        item = _drop_item_locally(item_id)
+        if item:
+            STORAGE.delete_item(item_id)
+            invalidate_catalog_pages()
+    return item
+
+
+def add_order(order: Order) -> None:
+    # Під тим самим замком, щоб записи в STORAGE йшли в порядку змін
+    with ORDERS.lock:
+        ORDERS.add(order)
+        STORAGE.save_order(order)
+
+
+def apply_order_action(order: Order, action: str) -> bool:
+    """Змінити статус замовлення за таблицею переходів і зберегти його.
+
+    False – дія недійсна для поточного статусу (повторне натискання або
+    застаріла кнопка), нічого не змінено.
+    """
+    with ORDERS.lock:
+        if not ORDERS.transition(order, action):
+            return False
+        STORAGE.save_order(order)
+    return True
+
+
+# ===================== Черга вихідних повідомлень =====================
+
+class TokenBucket:
+    """Відро токенів: `rate` токенів за секунду, не більше `capacity` у запасі."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        # `now` могли виміряти ще до створення відра – тоді доливати нічого
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Скільки секунд чекати до появи токена (0 – можна вже зараз)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> float:
+        """Забрати токен, якщо він є; інакше повернути час очікування."""
+        wait = self.delay(now)
+        if wait == 0.0:
+            self.tokens -= 1
+        return wait
+
+
+class _OutboxJob:
+    __slots__ = ("func", "args", "kwargs", "limited", "attempts", "callback")
+
+    def __init__(self, func: Callable, args: tuple, kwargs: dict, limited: bool,
+                 callback: Optional[Callable[[Any], None]] = None) -> None:
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.limited = limited
+        self.attempts = 0
+        self.callback = callback
+
+
+class _OutboxWorker(threading.Thread):
+    """Відправник для своєї частини чатів.
+
+    Запити одного чату завжди потрапляють до одного відправника й виконуються
+    в порядку надходження. Чати, що впираються в ліміт або отримали 429,
+    чекають у купі за часом готовності й не затримують інші чати.
+    """
+
+    # Скільки відер окремих чатів тримати в пам'яті.
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(self, outbox: "Outbox", index: int) -> None:
+        super().__init__(name=f"outbox-{index}", daemon=True)
+        self.outbox = outbox
+        self.inbox: "queue.Queue[Tuple[int, _OutboxJob]]" = queue.Queue(maxsize=OUTBOX_QUEUE_SIZE)
+        self.pending: Dict[int, Deque[_OutboxJob]] = {}
+        self.pending_count = 0
+        self.ready: List[Tuple[float, int, int]] = []  # (коли можна надсилати, seq, chat_id)
+        self.buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._seq = 0
+
+    def _schedule(self, chat_id: int, at: float) -> None:
+        self._seq += 1
+        heapq.heappush(self.ready, (at, self._seq, chat_id))
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.buckets[chat_id] = TokenBucket(OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST)
+            if len(self.buckets) > self.MAX_CHAT_BUCKETS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(chat_id)
+        return bucket
+
+    def _accept(self, chat_id: int, job: _OutboxJob) -> None:
+        jobs = self.pending.get(chat_id)
+        if jobs is None:
+            jobs = self.pending[chat_id] = deque()
+            self._schedule(chat_id, time.monotonic())
+        jobs.append(job)
+        self.pending_count += 1
+
+    def run(self) -> None:
+        while True:
+            timeout = None
+            if self.ready:
+                timeout = max(0.0, self.ready[0][0] - time.monotonic())
+
+            # Поки не розіслано вже прийняте, нові запити лишаються в inbox,
+            # і обробники відчувають зворотний тиск.
+            if self.pending_count < OUTBOX_QUEUE_SIZE:
+                try:
+                    self._accept(*self.inbox.get(timeout=timeout))
+                    while self.pending_count < OUTBOX_QUEUE_SIZE:
+                        self._accept(*self.inbox.get_nowait())
+                except queue.Empty:
+                    pass
+            elif timeout:
+                time.sleep(timeout)
+
+            now = time.monotonic()
+            while self.ready and self.ready[0][0] <= now:
+                _, _, chat_id = heapq.heappop(self.ready)
+                self._send_next(chat_id, now)
+                now = time.monotonic()
+
+    def _send_next(self, chat_id: int, now: float) -> None:
+        jobs = self.pending[chat_id]
+        job = jobs[0]
+        if job.limited:
+            bucket = self._bucket(chat_id)
+            # Спільний токен беремо, лише коли чат готовий, інакше він згорить даремно
+            wait = bucket.delay(now) or self.outbox.take_global(now)
+            if wait > 0:
+                self._schedule(chat_id, now + wait)
+                return
+            bucket.take(now)
+
+        retry_after = self.outbox.execute(job)
+        if retry_after is not None and job.attempts < OUTBOX_MAX_RETRIES:
+            self._schedule(chat_id, time.monotonic() + retry_after)
+            return
+
+        jobs.popleft()
+        self.pending_count -= 1
+        if jobs:
+            self._schedule(chat_id, time.monotonic())
+        else:
+            del self.pending[chat_id]
+
+
+class Outbox:
+    """Черга всіх вихідних запитів до Telegram з обмеженням швидкості.
+
+    Обробники лише ставлять запит у чергу. Пул відправників дотримується
+    загального ліміту та ліміту на чат (відра токенів), а на відповідь 429
+    повторює запит після `retry_after`.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self._global = TokenBucket(OUTBOX_GLOBAL_RATE, OUTBOX_GLOBAL_RATE)
+        self._global_lock = threading.Lock()
+        self._workers = [_OutboxWorker(self, i) for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, chat_id: int, func: Callable, args: tuple = (), kwargs: Optional[dict] = None,
+               limited: bool = True, callback: Optional[Callable[[Any], None]] = None,
+               block: bool = True) -> None:
+        """Поставити виклик `func(*args, **kwargs)` у чергу чату `chat_id`.
+
+        `callback` викликається з результатом запиту (наприклад, надісланим
+        повідомленням), якщо запит вдався. З `block=False` при повній черзі
+        запит одразу відкидається замість очікування до OUTBOX_PUT_TIMEOUT.
+        """
+        worker = self._workers[chat_id % len(self._workers)]
+        job = _OutboxJob(func, args, kwargs or {}, limited, callback)
+        try:
+            worker.inbox.put((chat_id, job), block=block, timeout=OUTBOX_PUT_TIMEOUT)
+        except queue.Full:
+            if block:
+                logger.warning("Черга вихідних повідомлень переповнена, запит до чату %s відкинуто", chat_id)
+            else:
+                logger.debug("Черга вихідних повідомлень переповнена, необов'язковий запит до чату %s пропущено", chat_id)
+
+    def depth(self) -> int:
+        return sum(w.inbox.qsize() + w.pending_count for w in self._workers)
+
+    def take_global(self, now: float) -> float:
+        with self._global_lock:
+            return self._global.take(now)
+
+    def execute(self, job: _OutboxJob) -> Optional[float]:
+        """Виконати запит; повернути затримку, якщо Telegram просить повторити."""
+        job.attempts += 1
+        try:
+            result = job.func(*job.args, **job.kwargs)
+        except Exception as e:
+            return _failed_job_delay(job, e)
+        if job.callback is not None:
+            job.callback(result)
+        return None
+
+
+def _failed_job_delay(job: _OutboxJob, error: Exception) -> Optional[float]:
+    """Затримка до повтору, якщо Telegram відповів 429, інакше None (запит відкидається).
+
+    Підходить для винятків і синхронного, і asyncio-клієнта telebot: класи в
+    них різні, але поля error_code і result_json однакові.
+    """
+    if getattr(error, "error_code", None) == 429:
+        retry_after = (error.result_json.get("parameters") or {}).get("retry_after", 1)
+        logger.warning("Telegram обмежив %s, повтор через %s с", job.func.__name__, retry_after)
+        return float(retry_after)
+    logger.warning("Запит %s не виконано: %s", job.func.__name__, error)
+    return None
+
+
+class AsyncOutbox:
+    """Черга вихідних запитів для asyncio-рушія з тими ж правилами, що й Outbox.
+
+    Замість пулу потоків кожен чат із запитами в черзі має власну задачу в
+    циклі подій: запити чату йдуть по черзі, з лімітом на чат і загальним
+    лімітом, а різні чати (наприклад, розсилка кільком адмінам) чекають
+    відповіді Telegram одночасно через спільний пул з'єднань aiohttp.
+    submit() можна викликати з будь-якого потоку; виклик методу синхронного
+    бота (bot.send_message тощо) виконується однойменним методом AsyncTeleBot.
+    """
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_bot: Any = None
+        self._global = TokenBucket(OUTBOX_GLOBAL_RATE, OUTBOX_GLOBAL_RATE)
+        self._chats: Dict[int, Deque[_OutboxJob]] = {}
+        self._buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._early: List[Tuple[int, _OutboxJob]] = []
+        self._pending = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop, async_bot: Any) -> None:
+        """Почати відправку в циклі `loop` (викликається з цього циклу)."""
+        self._loop = loop
+        self._async_bot = async_bot
+        early, self._early = self._early, []
+        for chat_id, job in early:
+            self._accept(chat_id, job)
+
+    def submit(self, chat_id: int, func: Callable, args: tuple = (), kwargs: Optional[dict] = None,
+               limited: bool = True, callback: Optional[Callable[[Any], None]] = None,
+               block: bool = True) -> None:
+        # Не блокує ніколи: переповнення перевіряється вже в циклі подій (_accept)
+        job = _OutboxJob(func, args, kwargs or {}, limited, callback)
+        loop = self._loop
+        if loop is None:
+            self._early.append((chat_id, job))
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._accept(chat_id, job)
+        else:
+            loop.call_soon_threadsafe(self._accept, chat_id, job)
+
+    def depth(self) -> int:
+        return self._pending
+
+    def _accept(self, chat_id: int, job: _OutboxJob) -> None:
+        if self._pending >= OUTBOX_QUEUE_SIZE * OUTBOX_WORKERS:
+            logger.warning("Черга вихідних повідомлень переповнена, запит до чату %s відкинуто", chat_id)
+            return
+        jobs = self._chats.get(chat_id)
+        if jobs is None:
+            jobs = self._chats[chat_id] = deque()
+            self._loop.create_task(self._drain(chat_id, jobs))
+        jobs.append(job)
+        self._pending += 1
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST)
+            if len(self._buckets) > _OutboxWorker.MAX_CHAT_BUCKETS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(chat_id)
+        return bucket
+
+    async def _drain(self, chat_id: int, jobs: Deque[_OutboxJob]) -> None:
+        while jobs:
+            job = jobs[0]
+            if job.limited:
+                bucket = self._bucket(chat_id)
+                now = time.monotonic()
+                # Спільний токен беремо, лише коли чат готовий, інакше він згорить даремно
+                wait = bucket.delay(now) or self._global.take(now)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                bucket.take(now)
+
+            job.attempts += 1
+            try:
+                result = await getattr(self._async_bot, job.func.__name__)(*job.args, **job.kwargs)
+            except Exception as e:
+                retry_after = _failed_job_delay(job, e)
+                if retry_after is not None and job.attempts < OUTBOX_MAX_RETRIES:
+                    await asyncio.sleep(retry_after)
+                    continue
+            else:
+                if job.callback is not None:
+                    job.callback(result)
+            jobs.popleft()
+            self._pending -= 1
+        del self._chats[chat_id]
+
+
+OUTBOX = AsyncOutbox() if BOT_ENGINE == "asyncio" else Outbox(OUTBOX_WORKERS)
+
+
+def send_message(chat_id: int, text: str, **kwargs: Any) -> None:
+    OUTBOX.submit(chat_id, bot.send_message, (chat_id, text), kwargs)
+
+
+def edit_message_text(text: str, chat_id: int, message_id: int, **kwargs: Any) -> None:
+    kwargs.update(chat_id=chat_id, message_id=message_id)
+    OUTBOX.submit(chat_id, bot.edit_message_text, (text,), kwargs)
+
+
+def answer_callback_query(call: telebot.types.CallbackQuery, text: Optional[str] = None,
+                          block: bool = True) -> None:
+    # Відповіді на натискання не рахуються як повідомлення в чат, тому без ліміту,
+    # але в черзі того ж чату, щоб не випереджати редагування повідомлення.
+    chat_id = call.message.chat.id if call.message else call.from_user.id
+    OUTBOX.submit(chat_id, bot.answer_callback_query, (call.id, text), limited=False, block=block)
+
+
+def send_document(chat_id: int, data: bytes, file_name: str, caption: str) -> None:
+    # Байти, а не відкритий файл: запит виконається пізніше і може повторитися після 429
+    OUTBOX.submit(chat_id, bot.send_document, (chat_id, data), {"visible_file_name": file_name, "caption": caption})
+
+
+# ===================== Сповіщення адміністраторів =====================
+
+# Події для адміністраторів: значок і заголовок у зведенні. Події з
+# ADMIN_URGENT_EVENTS ніколи не чекають на зведення.
+ADMIN_EVENTS = {
+    "order": ("📩", "Нові замовлення"),
+    "paid": ("💸", "Оплати"),
+    "pay_cancel": ("🚫", "Скасовані оплати"),
+    "feedback": ("📝", "Відгуки"),
+}
+ADMIN_URGENT_EVENTS = {"paid"}
+
+
+class _AdminDigest:
+    """Сповіщення одного адміністратора: останні відправки та незібране зведення."""
+    __slots__ = ("sent", "counts", "totals", "latest", "started", "due")
+
+    def __init__(self) -> None:
+        # Час останніх ADMIN_NOTIFY_THRESHOLD сповіщень: якщо найстаріше з них
+        # молодше за вікно, адміна вже завалено і нові події йдуть у зведення
+        self.sent: Deque[float] = deque(maxlen=max(1, ADMIN_NOTIFY_THRESHOLD))
+        self.counts: Dict[str, int] = {}
+        self.totals: Dict[str, float] = {}
+        self.latest: Deque[str] = deque(maxlen=ADMIN_DIGEST_LATEST)
+        self.started = 0.0
+        self.due = 0.0
+
+    def busy(self, now: float) -> bool:
+        if self.counts:
+            return True  # поки є незібране зведення, порядок подій зберігається
+        return len(self.sent) == self.sent.maxlen and now - self.sent[0] < ADMIN_NOTIFY_WINDOW
+
+    def add(self, kind: str, summary: str, amount: Optional[float], now: float) -> None:
+        if not self.counts:
+            self.started = now
+            self.due = now + ADMIN_DIGEST_INTERVAL
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if amount is not None:
+            self.totals[kind] = self.totals.get(kind, 0.0) + amount
+        self.latest.append(f"{ADMIN_EVENTS[kind][0]} {html.escape(summary)}")
+
+    def render(self, now: float) -> str:
+        """Текст зведення; після нього зведення починається заново."""
+        lines = [f"📊 <b>Зведення за {now - self.started:.0f} с</b>", ""]
+        for kind, (icon, title) in ADMIN_EVENTS.items():
+            count = self.counts.get(kind)
+            if count:
+                total = self.totals.get(kind)
+                lines.append(f"{icon} {title}: {count}" + (f" на {total:.2f} грн" if total is not None else ""))
+        lines.append("")
+        lines.append("Останні:")
+        lines.extend(f"• {line}" for line in reversed(self.latest))
+        self.counts = {}
+        self.totals = {}
+        self.latest.clear()
+        return "\n".join(lines)
+
+
+class AdminNotifier:
+    """Сповіщення адміністраторів, що не заповнюють їхні чати під навантаженням.
+
+    Поки подій мало, кожна надсилається окремим повідомленням. Коли адміну
+    за ADMIN_NOTIFY_WINDOW секунд уже пішло ADMIN_NOTIFY_THRESHOLD
+    сповіщень, нові події накопичуються у зведенні (кількість і сума за
+    типами плюс найновіші події), яке фоновий потік надсилає раз на
+    ADMIN_DIGEST_INTERVAL секунд. Термінові події (ADMIN_URGENT_EVENTS)
+    надсилаються одразу завжди.
+
+    У режимі кількох процесів кожен процес-обробник має власний
+    AdminNotifier, тож за вікно адмін може отримати до WORKER_PROCESSES ×
+    ADMIN_NOTIFY_THRESHOLD окремих сповіщень і зведення від кожного процесу.
+    """
+
+    def __init__(self) -> None:
+        self._digests: Dict[int, _AdminDigest] = {}
+        self._cond = threading.Condition()
+        self.immediate = 0
+        self.digested = 0
+        self.digests_sent = 0
+        thread = threading.Thread(target=self._run, name="admin-digests")
+        thread.daemon = True
+        thread.start()
+
+    def notify(self, kind: str, text: str, summary: str, amount: Optional[float] = None) -> None:
+        """Повідомити всіх адміністраторів про подію.
+
+        `text` – повне окреме повідомлення (HTML), `summary` – рядок для
+        зведення (звичайний текст, екранується тут), `amount` – сума, що
+        додається до підсумку за типом події.
+        """
+        urgent = kind in ADMIN_URGENT_EVENTS
+        now = time.monotonic()
+        recipients = []
+        with self._cond:
+            for admin_id in ADMIN_IDS:
+                digest = self._digests.get(admin_id)
+                if digest is None:
+                    digest = self._digests[admin_id] = _AdminDigest()
+                if urgent or not digest.busy(now):
+                    recipients.append(admin_id)
+                else:
+                    if not digest.counts:
+                        self._cond.notify()
+                    digest.add(kind, summary, amount, now)
+                    self.digested += 1
+                digest.sent.append(now)
+            self.immediate += len(recipients)
+        for admin_id in recipients:
+            send_message(admin_id, text)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                ready = [
+                    (admin_id, digest.render(now))
+                    for admin_id, digest in self._digests.items()
+                    if digest.counts and digest.due <= now
+                ]
+                if not ready:
+                    waiting = [digest.due for digest in self._digests.values() if digest.counts]
+                    self._cond.wait(min(waiting) - now if waiting else None)
+                    continue
+                self.digests_sent += len(ready)
+            for admin_id, text in ready:
+                send_message(admin_id, text)
+
+
+ADMIN_NOTIFIER = AdminNotifier()
+
+
+def notify_admins(kind: str, text: str, summary: str, amount: Optional[float] = None) -> None:
+    ADMIN_NOTIFIER.notify(kind, text, summary, amount)
+
+
+def user_label(username: Optional[str], fallback: str) -> str:
+    """@username для сповіщень, а якщо його немає – `fallback` (ім'я чи ID)."""
+    return f"@{username}" if username else fallback
+
+
+def notify_admins_order(kind: str, title: str, order: Order) -> None:
+    """Сповіщення про замовлення: повна картка окремо або рядок у зведенні."""
+    notify_admins(
+        kind,
+        f"{title}\n" + format_order(order),
+        f"#{order.order_id} {order.item_name} – {order.price:.2f} грн – "
+        f"{user_label(order.username, order.full_name)}",
+        order.price,
+    )
+
+
+# ===================== Обмеження вхідних оновлень =====================
+
+# Пріоритети оновлень: під перевантаженням першими відкидаються "low", потім "normal"
+PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW = "high", "normal", "low"
+
+THROTTLE_TEXT = "⏳ Забагато запитів. Зачекайте кілька секунд і спробуйте знову."
+OVERLOAD_TEXT = "😓 Бот зараз перевантажений, спробуйте за хвилину."
+
+
+def update_priority(update: types.Update) -> str:
+    """Пріоритет оновлення для відкидання під навантаженням.
+
+    Кнопки підтвердження й оплати замовлення – високий; команди, інші
+    кнопки, файли й текст у режимі діалогу (відгук, додавання товару) –
+    звичайний; вільний текст (FAQ) та inline-запити – низький.
+    """
+    if update.callback_query is not None:
+        prefix = (update.callback_query.data or "").partition(":")[0]
+        return PRIORITY_HIGH if prefix in ORDER_TRANSITIONS else PRIORITY_NORMAL
+    message = update.message
+    if message is not None:
+        if message.content_type != "text" or message.text.startswith("/"):
+            return PRIORITY_NORMAL
+        if message.from_user is not None and USER_STATE.peek_mode(message.from_user.id) is not None:
+            return PRIORITY_NORMAL
+    return PRIORITY_LOW
+
+
+class _UserBucket(TokenBucket):
+    """Відро користувача з часом останнього попередження про ліміт."""
+
+    def __init__(self) -> None:
+        super().__init__(USER_UPDATE_RATE, USER_UPDATE_BURST)
+        self.noticed = float("-inf")
+
+
+class UpdateLimiter:
+    """Фільтр перед усіма обробниками оновлень.
+
+    Викликається там, де оновлення стає в чергу обробки (потоковий і
+    asyncio-рушії, webhook, процеси-обробники), тож відкинуте оновлення
+    не займає черги й не доходить до обробників: не створює замовлень і
+    не проходить FAQ. На відкинуту кнопку відповідаємо коротким текстом
+    (інакше в клієнта крутиться годинник), на текст – лише про ліміт
+    користувача і не частіше ніж раз на USER_THROTTLE_NOTICE_INTERVAL.
+    """
+
+    MAX_USERS = 10000
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # Відра останніх активних користувачів (LRU); витіснений отримує повне відро
+        self._users: "OrderedDict[int, _UserBucket]" = OrderedDict()
+        self._global = TokenBucket(GLOBAL_UPDATE_RATE, max(GLOBAL_UPDATE_RATE, 1)) if GLOBAL_UPDATE_RATE > 0 else None
+        # (причина, пріоритет) -> скільки оновлень відкинуто
+        self.rejected: Dict[Tuple[str, str], int] = {}
+
+    def _user_bucket(self, user_id: int) -> _UserBucket:
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = self._users[user_id] = _UserBucket()
+            if len(self._users) > self.MAX_USERS:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return bucket
+
+    def _overloaded(self, now: float, priority: str, backlog: int) -> bool:
+        if priority == PRIORITY_HIGH:
+            # Враховуємо у спільному відрі, але не відкидаємо
+            if self._global is not None:
+                self._global.take(now)
+            return False
+        if SHED_BACKLOG and backlog >= (SHED_BACKLOG if priority == PRIORITY_LOW else 2 * SHED_BACKLOG):
+            return True
+        bucket = self._global
+        if bucket is None:
+            return False
+        bucket.delay(now)  # долити токени
+        # Низькому пріоритету дістається лише верхня половина запасу
+        floor = 1 if priority == PRIORITY_NORMAL else 1 + bucket.capacity / 2
+        if bucket.tokens < floor:
+            return True
+        bucket.tokens -= 1
+        return False
+
+    def admit(self, update: types.Update, backlog: int) -> bool:
+        """Чи пропустити оновлення до обробників (`backlog` – довжина черги обробки)."""
+        priority = update_priority(update)
+        sender = update_sender(update)
+        now = time.monotonic()
+        notify_user = False
+        with self._lock:
+            reason = None
+            if (USER_UPDATE_RATE > 0 and priority != PRIORITY_HIGH
+                    and sender is not None and not is_admin(sender.id)):
+                bucket = self._user_bucket(sender.id)
+                if bucket.take(now):
+                    reason = "user_limit"
+                    if now - bucket.noticed >= USER_THROTTLE_NOTICE_INTERVAL:
+                        bucket.noticed = now
+                        notify_user = True
+            if reason is None and self._overloaded(now, priority, backlog):
+                reason = "overload"
+            if reason is None:
+                return True
+            key = (reason, priority)
+            self.rejected[key] = self.rejected.get(key, 0) + 1
+
+        log_event(
+            "update_rejected", "Оновлення %(update_id)s від %(user_id)s відкинуто: %(reason)s",
+            update_id=update.update_id, user_id=sender.id if sender else None, reason=reason, priority=priority,
+        )
+        text = THROTTLE_TEXT if reason == "user_limit" else OVERLOAD_TEXT
+        # admit() викликає потік, що приймає оновлення: якщо черга відправки повна
+        # (а під перевантаженням так і буває), повідомлення пропускаємо, а не чекаємо
+        if update.callback_query is not None:
+            answer_callback_query(update.callback_query, text, block=False)
+        elif notify_user and update.message is not None:
+            chat_id = update.message.chat.id
+            OUTBOX.submit(chat_id, bot.send_message, (chat_id, text), block=False)
+        return False
+
+
+UPDATE_LIMITER = UpdateLimiter()
+
+
+# ===================== Метрики =====================
+
+class Histogram:
+    """Гістограма з фіксованими межами кошиків (формат Prometheus)."""
+
+    __slots__ = ("bounds", "counts", "total", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # останній кошик – +Inf
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+
+
+class Metrics:
+    """Лічильники для /metrics: час обробників і запитів до Telegram API."""
+
+    HANDLER_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+    API_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self) -> None:
+        self.handler_latency: Dict[str, Histogram] = {}
+        self.api_latency: Dict[str, Histogram] = {}
+        self.api_errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, family: Dict[str, Histogram], label: str, bounds: Tuple[float, ...]) -> Histogram:
+        hist = family.get(label)
+        if hist is None:
+            with self._lock:
+                hist = family.setdefault(label, Histogram(bounds))
+        return hist
+
+    def timed(self, func: Callable) -> Callable:
+        """Обгорнути обробник заміром часу виконання."""
+        hist = self._histogram(self.handler_latency, func.__name__, self.HANDLER_BUCKETS)
+        perf_counter = time.perf_counter
+
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - started
+                hist.observe(elapsed)
+                user = getattr(args[0], "from_user", None) if args else None
+                log_event(
+                    "handler", "Обробник %(handler)s: %(latency_ms)s мс",
+                    handler=name, user_id=user.id if user else None, latency_ms=round(elapsed * 1000, 3),
+                )
+        return wrapper
+
+    def observe_api(self, method: str, seconds: float, failed: bool) -> None:
+        self._histogram(self.api_latency, method, self.API_BUCKETS).observe(seconds)
+        if failed:
+            with self._lock:
+                self.api_errors[method] = self.api_errors.get(method, 0) + 1
+
+
+METRICS = Metrics()
+
+# Власна сесія requests на кожен потік: з'єднання з Telegram перевикористовуються
+_api_sessions = threading.local()
+
+
+def _instrumented_request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """Відправник запитів для telebot, що рахує час і помилки за методом API."""
+    session = getattr(_api_sessions, "session", None)
+    if session is None:
+        session = _api_sessions.session = requests.Session()
+    api_method = url.rsplit("/", 1)[-1]
+    started = time.perf_counter()
+    failed = True
+    try:
+        response = session.request(method, url, **kwargs)
+        failed = response.status_code != 200
+        return response
+    finally:
+        METRICS.observe_api(api_method, time.perf_counter() - started, failed)
+
+
+telebot.apihelper.CUSTOM_REQUEST_SENDER = _instrumented_request
+if BOT_API_URL:
+    telebot.apihelper.API_URL = BOT_API_URL
 
 
 # ===================== Допоміжні функції =====================
@@ -126,35 +2664,98 @@ def is_admin(user_id: int) -> bool:
     return user_id in ADMIN_IDS
 
 
+def report_catalog_loading(chat_id: int) -> bool:
+    """Сказати адміну, що каталог ще довантажується зі знімка (True – ще не весь)."""
+    if DATA_LOADED.is_set():
+        return False
+    send_message(chat_id, "⏳ Каталог ще завантажується після перезапуску. Спробуйте за хвилину.")
+    return True
+
+
+def report_orders_loading(chat_id: int) -> bool:
+    """Сказати адміну, що замовлення ще довантажуються зі знімка (True – ще не всі)."""
+    if DATA_LOADED.is_set():
+        return False
+    send_message(chat_id, "⏳ Замовлення ще завантажуються після перезапуску. Спробуйте за хвилину.")
+    return True
+
+
+def parse_price(price_str: str) -> float:
+    """Розібрати ціну товару; ValueError, якщо це не додатне число."""
+    price = float(str(price_str).replace(",", "."))
+    if not math.isfinite(price) or price <= 0:
+        raise ValueError(price_str)
+    return price
+
+
+class RenderCache:
+    """Обмежений LRU-кеш готових HTML-текстів і JSON клавіатур.
+
+    Ключ містить ID товару чи замовлення та його версію, тож після зміни
+    старий запис просто перестає запитуватися і з часом витісняється.
+    Читання йде без блокування (операції OrderedDict атомарні під GIL),
+    блокування потрібне лише для вставки з витісненням.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Any, ...], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[str]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            self._entries.move_to_end(key)
+        except KeyError:
+            pass  # саме зараз витіснено іншим потоком
+        return value
+
+    def put(self, key: Tuple[Any, ...], value: str) -> str:
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+RENDER_CACHE = RenderCache(RENDER_CACHE_SIZE)
+
+
 def format_item(item: CatalogItem) -> str:
-    return (
+    key = ("item", item.item_id, _item_versions.get(item.item_id, 0))
+    return RENDER_CACHE.get(key) or RENDER_CACHE.put(key, (
         f"<b>{item.name}</b>\n"
         f"Ціна: <b>{item.price:.2f} грн</b>\n\n"
         f"{item.description}"
-    )
+    ))
 
 
 def format_order(order: Order) -> str:
+    key = ("order", order.order_id, order.version)
+    return RENDER_CACHE.get(key) or RENDER_CACHE.put(key, _render_order(order))
+
+
+def _render_order(order: Order) -> str:
     return (
         f"🧾 <b>Замовлення #{order.order_id}</b>\n"
         f"Користувач: {order.full_name} (@{order.username})\n"
         f"ID: <code>{order.user_id}</code>\n\n"
-        f"Товар: <b>{order.item.name}</b>\n"
-        f"Ціна: <b>{order.item.price:.2f} грн</b>\n"
+        f"Товар: <b>{order.item_name}</b>\n"
+        f"Ціна: <b>{order.price:.2f} грн</b>\n"
         f"Статус: <b>{order.status}</b>\n"
         f"Створено: {order.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
     )
 
 
-def send_to_admins(text: str) -> None:
-    """Надіслати службове повідомлення всім адміністраторам."""
-    for admin_id in ADMIN_IDS:
-        try:
-            bot.send_message(admin_id, text)
-        except Exception as e:
-            logger.warning("Не вдалося надіслати повідомлення адміну %s: %s", admin_id, e)
-
-
 def build_main_menu() -> types.ReplyKeyboardMarkup:
     """Reply-клавіатура для основних команд."""
     kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
@@ -163,21 +2764,87 @@ def build_main_menu() -> types.ReplyKeyboardMarkup:
     return kb
 
 
-def build_catalog_keyboard() -> Optional[types.InlineKeyboardMarkup]:
-    """Inline-клавіатура для списку товарів."""
-    if not CATALOG:
-        return None
+# Готові (серіалізовані в JSON) клавіатури сторінок каталогу: номер сторінки -> markup.
+# Скидаються лише при зміні CATALOG, тож перегляд каталогу – це пошук у словнику.
+_catalog_pages: Dict[int, str] = {}
+
+
+def invalidate_catalog_pages() -> None:
+    """Скинути кеш сторінок каталогу після зміни CATALOG."""
+    _catalog_pages.clear()
+
+
+def catalog_page_count() -> int:
+    return (len(CATALOG) + CATALOG_PAGE_SIZE - 1) // CATALOG_PAGE_SIZE
+
+
+def build_catalog_keyboard(page: int = 0) -> Optional[str]:
+    """Inline-клавіатура для однієї сторінки каталогу (JSON для reply_markup)."""
+    markup = _catalog_pages.get(page)
+    if markup is not None:
+        return markup
+
+    with _catalog_lock:
+        if not CATALOG:
+            return None
+
+        pages = catalog_page_count()
+        start = page * CATALOG_PAGE_SIZE
+        kb = types.InlineKeyboardMarkup()
+        for item_id in _catalog_ids[start:start + CATALOG_PAGE_SIZE]:
+            item = CATALOG[item_id]
+            btn = types.InlineKeyboardButton(
+                text=f"{item.name} – {item.price:.0f} грн",
+                callback_data=f"item:{item.item_id}",
+            )
+            kb.add(btn)
+
+        nav = []
+        if page > 0:
+            nav.append(types.InlineKeyboardButton("⬅️", callback_data=f"catalog:{page - 1}"))
+        if page < pages - 1:
+            nav.append(types.InlineKeyboardButton("➡️", callback_data=f"catalog:{page + 1}"))
+        if nav:
+            kb.row(*nav)
+
+        markup = kb.to_json()
+        _catalog_pages[page] = markup
+        return markup
+
+
+def catalog_page_title(page: int) -> str:
+    pages = catalog_page_count()
+    if pages > 1:
+        return f"🛍 <b>Каталог товарів</b> (сторінка {page + 1} з {pages})"
+    return "🛍 <b>Каталог товарів</b>"
+
+
+def build_search_keyboard(item_ids: List[int], page: int, has_more: bool) -> types.InlineKeyboardMarkup:
+    """Inline-клавіатура для сторінки результатів пошуку."""
     kb = types.InlineKeyboardMarkup()
-    for item in CATALOG.values():
-        btn = types.InlineKeyboardButton(
-            text=f"{item.name} – {item.price:.0f} грн",
-            callback_data=f"item:{item.item_id}",
-        )
-        kb.add(btn)
+    for item_id in item_ids:
+        item = CATALOG.get(item_id)
+        if item:
+            kb.add(types.InlineKeyboardButton(
+                text=f"{item.name} – {item.price:.0f} грн",
+                callback_data=f"item:{item.item_id}",
+            ))
+    nav = []
+    if page > 0:
+        nav.append(types.InlineKeyboardButton("⬅️", callback_data=f"search:{page - 1}"))
+    if has_more:
+        nav.append(types.InlineKeyboardButton("➡️", callback_data=f"search:{page + 1}"))
+    if nav:
+        kb.row(*nav)
     return kb
 
 
-def build_item_keyboard(item_id: int) -> types.InlineKeyboardMarkup:
+def build_item_keyboard(item_id: int) -> str:
+    key = ("item_kb", item_id)
+    return RENDER_CACHE.get(key) or RENDER_CACHE.put(key, _render_item_keyboard(item_id))
+
+
+def _render_item_keyboard(item_id: int) -> str:
     kb = types.InlineKeyboardMarkup()
     kb.add(
         types.InlineKeyboardButton("🛒 Замовити", callback_data=f"buy:{item_id}"),
@@ -185,10 +2852,15 @@ def build_item_keyboard(item_id: int) -> types.InlineKeyboardMarkup:
     kb.add(
         types.InlineKeyboardButton("⬅️ Назад до каталогу", callback_data="catalog")
     )
-    return kb
+    return kb.to_json()
+
+
+def build_order_confirm_keyboard(order_id: int) -> str:
+    key = ("confirm_kb", order_id)
+    return RENDER_CACHE.get(key) or RENDER_CACHE.put(key, _render_order_confirm_keyboard(order_id))
 
 
-def build_order_confirm_keyboard(order_id: int) -> types.InlineKeyboardMarkup:
+def _render_order_confirm_keyboard(order_id: int) -> str:
     kb = types.InlineKeyboardMarkup()
     kb.add(
         types.InlineKeyboardButton("✅ Підтвердити замовлення", callback_data=f"confirm:{order_id}")
@@ -196,10 +2868,15 @@ def build_order_confirm_keyboard(order_id: int) -> types.InlineKeyboardMarkup:
     kb.add(
         types.InlineKeyboardButton("❌ Скасувати", callback_data=f"cancel:{order_id}")
     )
-    return kb
+    return kb.to_json()
+
+
+def build_payment_keyboard(order_id: int) -> str:
+    key = ("payment_kb", order_id)
+    return RENDER_CACHE.get(key) or RENDER_CACHE.put(key, _render_payment_keyboard(order_id))
 
 
-def build_payment_keyboard(order_id: int) -> types.InlineKeyboardMarkup:
+def _render_payment_keyboard(order_id: int) -> str:
     kb = types.InlineKeyboardMarkup()
     kb.add(
         types.InlineKeyboardButton("💸 Підтвердити оплату", callback_data=f"pay_ok:{order_id}")
@@ -207,7 +2884,7 @@ def build_payment_keyboard(order_id: int) -> types.InlineKeyboardMarkup:
     kb.add(
         types.InlineKeyboardButton("🚫 Відмінити оплату", callback_data=f"pay_cancel:{order_id}")
     )
-    return kb
+    return kb.to_json()
 
 
 # ===================== Команди користувачів =====================
@@ -216,7 +2893,18 @@ def build_payment_keyboard(order_id: int) -> types.InlineKeyboardMarkup:
 def cmd_start(message: telebot.types.Message) -> None:
     chat_id = message.chat.id
     user = message.from_user
-    logger.info("Користувач %s (%s) виконав /start", user.id, user.username)
+    log_event(
+        "start", "Користувач %(user_id)s (%(username)s) виконав /start",
+        user_id=user.id, username=user.username,
+    )
+
+    # Посилання з inline-результату пошуку: /start item_<id>
+    payload = message.text.split(maxsplit=1)[1] if " " in message.text.strip() else ""
+    if payload.startswith("item_"):
+        item = find_item(int(payload[5:])) if payload[5:].isdigit() else None
+        if item:
+            send_message(chat_id, format_item(item), reply_markup=build_item_keyboard(item.item_id))
+            return
 
     welcome = (
         "Вітаю! 👋\n"
@@ -228,7 +2916,7 @@ def cmd_start(message: telebot.types.Message) -> None:
         "• приймати відгуки від користувачів\n\n"
         "Скористайтесь кнопками нижче або командами /help та /catalog."
     )
-    bot.send_message(chat_id, welcome, reply_markup=build_main_menu())
+    send_message(chat_id, welcome, reply_markup=build_main_menu())
 
 
 @bot.message_handler(commands=["help"])
@@ -239,15 +2927,20 @@ def cmd_help(message: telebot.types.Message) -> None:
         "/help – список команд\n"
         "/info – інформація про бота\n"
         "/catalog – каталог товарів\n"
+        "/search – пошук товарів\n"
         "/order – показати ваші замовлення\n"
         "/feedback – залишити відгук\n\n"
         "Адміністраторам доступні:\n"
         "/admin – меню адміністратора\n"
         "/add_item – додати товар\n"
         "/remove_item – видалити товар\n"
-        "/orders – список усіх замовлень"
+        "/orders – перегляд замовлень з фільтрами\n"
+        "/export_orders – експорт замовлень у CSV\n"
+        "/stats – статистика продажів\n"
+        "/import_items – імпорт товарів з CSV/JSONL\n"
+        "/export_items – експорт каталогу у файл"
     )
-    bot.send_message(message.chat.id, text)
+    send_message(message.chat.id, text)
 
 
 @bot.message_handler(commands=["info"])
@@ -259,14 +2952,14 @@ def cmd_info(message: telebot.types.Message) -> None:
         "Функціонал: каталог товарів, оформлення замовлень, "
         "адмін-меню, відгуки, імітація оплати."
     )
-    bot.send_message(message.chat.id, text)
+    send_message(message.chat.id, text)
 
 
 @bot.message_handler(commands=["catalog"])
 def cmd_catalog(message: telebot.types.Message) -> None:
     chat_id = message.chat.id
     if not CATALOG:
-        bot.send_message(
+        send_message(
             chat_id,
             "Каталог поки що порожній 🕳\n"
             "Адміністратор може додати товари командою /add_item.",
@@ -274,27 +2967,65 @@ def cmd_catalog(message: telebot.types.Message) -> None:
         return
 
     kb = build_catalog_keyboard()
-    text = "🛍 <b>Каталог товарів</b>\nОберіть товар, щоб переглянути деталі:"
-    bot.send_message(chat_id, text, reply_markup=kb)
+    text = catalog_page_title(0) + "\nОберіть товар, щоб переглянути деталі:"
+    send_message(chat_id, text, reply_markup=kb)
+
+
+@bot.message_handler(commands=["search"])
+def cmd_search(message: telebot.types.Message) -> None:
+    """Пошук товарів: /search запит, або запит наступним повідомленням."""
+    user_id = message.from_user.id
+    state = get_user_state(user_id)
+    query = message.text.split(maxsplit=1)[1] if " " in message.text.strip() else ""
+    if query:
+        show_search_results(message.chat.id, state, query)
+        return
+
+    state.mode = "search"
+    STORAGE.save_user_state(user_id, state)
+    send_message(message.chat.id, "🔎 Що шукаємо? Напишіть назву або частину назви товару.")
+
+
+def show_search_results(chat_id: int, state: UserState, query: str, page: int = 0,
+                        message_id: Optional[int] = None) -> None:
+    """Надіслати (або оновити) сторінку результатів пошуку."""
+    # Запит зберігаємо в стані, бо callback_data обмежене 64 байтами
+    state.search = query
+    item_ids, has_more = SEARCH_INDEX.search(query, page * SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE)
+    shown = html.escape(query)  # повідомлення йдуть у режимі HTML
+    if not item_ids:
+        send_message(chat_id, f"Нічого не знайдено за запитом «{shown}» 🤷\nСпробуйте інше слово або /catalog.")
+        return
+
+    # Загальну кількість не рахуємо: індекс зупиняється після потрібної сторінки
+    if page == 0 and not has_more:
+        text = f"🔎 Знайдено {len(item_ids)} за запитом «{shown}»"
+    else:
+        text = f"🔎 Результати за запитом «{shown}» (сторінка {page + 1})"
+    kb = build_search_keyboard(item_ids, page, has_more)
+    if message_id is None:
+        send_message(chat_id, text, reply_markup=kb)
+    else:
+        edit_message_text(text, chat_id=chat_id, message_id=message_id, reply_markup=kb)
 
 
 @bot.message_handler(commands=["order"])
 def cmd_order(message: telebot.types.Message) -> None:
     """Показати користувачу його замовлення."""
     user_id = message.from_user.id
-    user_orders = [o for o in ORDERS.values() if o.user_id == user_id]
+    user_orders = ORDERS.recent_for_user(user_id, 10)
 
     if not user_orders:
-        bot.send_message(message.chat.id, "У вас поки що немає замовлень 🧾")
+        send_message(message.chat.id, "У вас поки що немає замовлень 🧾")
         return
 
     lines = ["Ваші замовлення:"]
-    for o in sorted(user_orders, key=lambda x: x.created_at, reverse=True)[:10]:
+    for o in user_orders:
         lines.append(
-            f"#{o.order_id} – {o.item.name} ({o.item.price:.0f} грн) – статус: {o.status}"
+            f"#{o.order_id} – {o.item_name} ({o.price:.0f} грн) – статус: {o.status}"
         )
 
-    bot.send_message(message.chat.id, "\n".join(lines))
+    send_message(message.chat.id, "\n".join(lines))
 
 
 @bot.message_handler(commands=["feedback"])
@@ -302,8 +3033,9 @@ def cmd_feedback(message: telebot.types.Message) -> None:
     """Попросити користувача надіслати відгук наступним повідомленням."""
     user_id = message.from_user.id
     state = get_user_state(user_id)
-    state["mode"] = "feedback"
-    bot.send_message(
+    state.mode = "feedback"
+    STORAGE.save_user_state(user_id, state)
+    send_message(
         message.chat.id,
         "✉️ Напишіть, будь ласка, свій відгук одним або кількома повідомленнями.\n"
         "Щоб скасувати, надішліть /cancel.",
@@ -315,14 +3047,14 @@ def cmd_cancel(message: telebot.types.Message) -> None:
     """Скинення будь-якого режиму користувача."""
     user_id = message.from_user.id
     state = get_user_state(user_id)
-    prev_mode = state.get("mode")
-    state["mode"] = None
-    state.pop("data", None)
+    prev_mode = state.mode
+    state.mode = None
+    STORAGE.save_user_state(user_id, state)
 
     if prev_mode:
-        bot.send_message(message.chat.id, "Поточну дію скасовано ✅")
+        send_message(message.chat.id, "Поточну дію скасовано ✅")
     else:
-        bot.send_message(message.chat.id, "Немає активних дій для скасування.")
+        send_message(message.chat.id, "Немає активних дій для скасування.")
 
 
 # ===================== Адмінські команди =====================
@@ -331,28 +3063,33 @@ def cmd_cancel(message: telebot.types.Message) -> None:
 def cmd_admin(message: telebot.types.Message) -> None:
     user_id = message.from_user.id
     if not is_admin(user_id):
-        bot.send_message(message.chat.id, "⛔ У вас немає прав адміністратора.")
+        send_message(message.chat.id, "⛔ У вас немає прав адміністратора.")
         return
 
     text = (
         "🔐 <b>Адмін-меню</b>\n\n"
         "/add_item – додати товар до каталогу\n"
         "/remove_item – видалити товар з каталогу\n"
-        "/orders – переглянути всі замовлення"
+        "/orders [статус] [user=ID] [from=РРРР-ММ-ДД] [to=РРРР-ММ-ДД] – переглянути замовлення\n"
+        "/export_orders [ті самі фільтри] – вивантажити замовлення у CSV\n"
+        "/stats – виручка, конверсія та топ товарів\n"
+        "/import_items – завантажити товари з файлу CSV або JSONL\n"
+        "/export_items [csv|jsonl] – вивантажити каталог у файл"
     )
-    bot.send_message(message.chat.id, text)
+    send_message(message.chat.id, text)
 
 
 @bot.message_handler(commands=["add_item"])
 def cmd_add_item(message: telebot.types.Message) -> None:
     user_id = message.from_user.id
     if not is_admin(user_id):
-        bot.send_message(message.chat.id, "⛔ Лише адміністратор може додавати товари.")
+        send_message(message.chat.id, "⛔ Лише адміністратор може додавати товари.")
         return
 
     state = get_user_state(user_id)
-    state["mode"] = "add_item"
-    bot.send_message(
+    state.mode = "add_item"
+    STORAGE.save_user_state(user_id, state)
+    send_message(
         message.chat.id,
         "➕ Додавання товару.\n\n"
         "Надішліть дані у форматі:\n"
@@ -366,118 +3103,238 @@ def cmd_add_item(message: telebot.types.Message) -> None:
 def cmd_remove_item(message: telebot.types.Message) -> None:
     user_id = message.from_user.id
     if not is_admin(user_id):
-        bot.send_message(message.chat.id, "⛔ Лише адміністратор може видаляти товари.")
+        send_message(message.chat.id, "⛔ Лише адміністратор може видаляти товари.")
         return
 
     if not CATALOG:
-        bot.send_message(message.chat.id, "Каталог порожній, немає що видаляти.")
+        send_message(message.chat.id, "Каталог порожній, немає що видаляти.")
         return
 
     state = get_user_state(user_id)
-    state["mode"] = "remove_item"
+    state.mode = "remove_item"
+    STORAGE.save_user_state(user_id, state)
     # Показуємо список товарів з ID
     lines = ["🔻 Вкажіть ID товару для видалення:", ""]
-    for item in CATALOG.values():
+    for item in list(CATALOG.values()):
         lines.append(f"{item.item_id}: {item.name} ({item.price:.0f} грн)")
-    bot.send_message(message.chat.id, "\n".join(lines))
+    send_message(message.chat.id, "\n".join(lines))
 
 
-@bot.message_handler(commands=["orders"])
-def cmd_admin_orders(message: telebot.types.Message) -> None:
+@bot.message_handler(commands=["import_items"])
+def cmd_import_items(message: telebot.types.Message) -> None:
     user_id = message.from_user.id
     if not is_admin(user_id):
-        bot.send_message(message.chat.id, "⛔ Лише адміністратор може переглядати замовлення.")
+        send_message(message.chat.id, "⛔ Лише адміністратор може імпортувати товари.")
         return
 
-    if not ORDERS:
-        bot.send_message(message.chat.id, "Замовлень поки що немає 🧾")
+    state = get_user_state(user_id)
+    state.mode = "import_items"
+    STORAGE.save_user_state(user_id, state)
+    send_message(
+        message.chat.id,
+        "📥 Імпорт товарів.\n\n"
+        "Надішліть файл-документ:\n"
+        "• <b>.csv</b> – рядки <code>Назва;ціна;опис</code> (роздільник ; або ,)\n"
+        "• <b>.jsonl</b> – по одному об'єкту на рядок: "
+        "<code>{\"name\": \"…\", \"price\": 499, \"description\": \"…\"}</code>\n\n"
+        "Щоб скасувати, надішліть /cancel.",
+    )
+
+
+@bot.message_handler(commands=["export_items"])
+def cmd_export_items(message: telebot.types.Message) -> None:
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        send_message(message.chat.id, "⛔ Лише адміністратор може експортувати каталог.")
         return
 
-    lines: List[str] = ["📋 <b>Останні замовлення</b>\n"]
-    for o in sorted(ORDERS.values(), key=lambda x: x.created_at, reverse=True)[:20]:
-        lines.append(
-            f"#{o.order_id}: {o.item.name} – {o.item.price:.0f} грн – "
-            f"{o.full_name} (@{o.username}) – статус: {o.status}"
-        )
+    args = message.text.split()[1:]
+    fmt = args[0].lower() if args else "csv"
+    if fmt not in ("csv", "jsonl"):
+        send_message(message.chat.id, "⚠️ Формат має бути csv або jsonl.")
+        return
+    if report_catalog_loading(message.chat.id):
+        return
 
-    bot.send_message(message.chat.id, "\n".join(lines))
+    worker = threading.Thread(target=export_catalog, args=(message.chat.id, fmt), name="catalog-export")
+    worker.daemon = True
+    worker.start()
 
 
 # ===================== Inline-кнопки (catalog / order / payment) =====================
 
-@bot.callback_query_handler(func=lambda call: call.data == "catalog")
-def cb_show_catalog(call: telebot.types.CallbackQuery) -> None:
-    """Повернення до каталогу."""
-    kb = build_catalog_keyboard()
+# Префікс callback_data -> (обробник, тип об'єкта, який треба знайти за ID).
+# Тип None означає, що обробник отримує решту callback_data як рядок.
+CALLBACK_ROUTES: Dict[str, Tuple[Callable, Optional[str]]] = {}
+
+# Тип об'єкта -> (пошук за ID, помилка розбору ID, "не знайдено")
+_CALLBACK_RESOLVERS: Dict[str, Tuple[Callable[[int], Any], str, str]] = {
+    "item": (find_item, "Помилка ID товару", "Товар не знайдено"),
+    "order": (find_order, "Помилка ID замовлення", "Замовлення не знайдено"),
+}
+
+
+class SeenCallbacks:
+    """ID нещодавно оброблених callback-запитів (множина з TTL).
+
+    Telegram може доставити той самий callback повторно (повтор webhook-а,
+    перезапуск polling), і його треба відкинути без жодних викликів API.
+    Записи впорядковані за часом, тож прострочені прибираються з початку.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self._ttl = ttl
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check_and_add(self, call_id: str) -> bool:
+        """True, якщо цей ID уже був протягом TTL; інакше запам'ятати його."""
+        now = time.monotonic()
+        with self._lock:
+            while self._seen:
+                oldest_id, seen_at = next(iter(self._seen.items()))
+                if now - seen_at <= self._ttl:
+                    break
+                del self._seen[oldest_id]
+            if call_id in self._seen:
+                return True
+            self._seen[call_id] = now
+            return False
+
+
+SEEN_CALLBACKS = SeenCallbacks(CALLBACK_DEDUP_TTL)
+
+
+def answer_stale_order(call: telebot.types.CallbackQuery, order: Order) -> None:
+    """Відповідь на недійсну дію із замовленням: без редагування і сповіщень адмінам."""
+    answer_callback_query(
+        call, f"Замовлення #{order.order_id} вже має статус: {ORDER_STATUS_TITLES[order.status]}"
+    )
+
+
+def callback_route(prefix: str, resolve: Optional[str] = None) -> Callable:
+    """Зареєструвати обробник inline-кнопок з callback_data "<prefix>:<arg>"."""
+    def decorator(func: Callable) -> Callable:
+        CALLBACK_ROUTES[prefix] = (func, resolve)
+        return func
+    return decorator
+
+
+@bot.callback_query_handler(func=lambda call: True)
+def route_callback(call: telebot.types.CallbackQuery) -> None:
+    """Єдиний вхід для inline-кнопок: розбір callback_data і вибір обробника за префіксом."""
+    if SEEN_CALLBACKS.check_and_add(call.id):
+        logger.debug("Повторний callback %s відкинуто", call.id)
+        return
+
+    # Кнопки ігор (game_short_name) приходять без callback_data
+    prefix, _, arg = (call.data or "").partition(":")
+    route = CALLBACK_ROUTES.get(prefix)
+    if route is None:
+        answer_callback_query(call, "Невідома дія")
+        return
+
+    handler, resolve = route
+    if resolve is None:
+        handler(call, arg)
+        return
+
+    lookup, bad_id_text, not_found_text = _CALLBACK_RESOLVERS[resolve]
+    try:
+        obj = lookup(int(arg))
+    except ValueError:
+        answer_callback_query(call, bad_id_text)
+        return
+    if not obj:
+        answer_callback_query(call, not_found_text)
+        return
+    handler(call, obj)
+
+
+@callback_route("catalog")
+def cb_show_catalog(call: telebot.types.CallbackQuery, page_str: str) -> None:
+    """Повернення до каталогу або перехід між його сторінками."""
+    try:
+        page = int(page_str) if page_str else 0
+    except ValueError:
+        answer_callback_query(call, "Помилка номера сторінки")
+        return
+    # Каталог міг зменшитися з моменту показу кнопки
+    page = max(0, min(page, catalog_page_count() - 1))
+
+    kb = build_catalog_keyboard(page)
     if not kb:
-        bot.answer_callback_query(call.id, "Каталог порожній")
-        bot.edit_message_text(
+        answer_callback_query(call, "Каталог порожній")
+        edit_message_text(
             "Каталог поки що порожній 🕳",
             chat_id=call.message.chat.id,
             message_id=call.message.message_id,
         )
         return
 
-    bot.edit_message_text(
-        "🛍 <b>Каталог товарів</b>\nОберіть товар:",
+    edit_message_text(
+        catalog_page_title(page) + "\nОберіть товар:",
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         reply_markup=kb,
     )
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("item:"))
-def cb_view_item(call: telebot.types.CallbackQuery) -> None:
-    """Перегляд деталей товару."""
-    try:
-        item_id = int(call.data.split(":", 1)[1])
-    except ValueError:
-        bot.answer_callback_query(call.id, "Помилка ID товару")
+@callback_route("search")
+def cb_search_page(call: telebot.types.CallbackQuery, page_str: str) -> None:
+    """Перехід між сторінками результатів пошуку."""
+    state = get_user_state(call.from_user.id)
+    query = state.search
+    if not query or not page_str.isdigit():
+        answer_callback_query(call, "Пошук застарів, повторіть /search")
         return
+    show_search_results(
+        call.message.chat.id,
+        state,
+        query,
+        page=int(page_str),
+        message_id=call.message.message_id,
+    )
+    answer_callback_query(call)
 
-    item = CATALOG.get(item_id)
-    if not item:
-        bot.answer_callback_query(call.id, "Товар не знайдено")
-        return
 
-    bot.edit_message_text(
+@callback_route("item", resolve="item")
+def cb_view_item(call: telebot.types.CallbackQuery, item: CatalogItem) -> None:
+    """Перегляд деталей товару."""
+    edit_message_text(
         format_item(item),
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
-        reply_markup=build_item_keyboard(item_id),
+        reply_markup=build_item_keyboard(item.item_id),
     )
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("buy:"))
-def cb_buy_item(call: telebot.types.CallbackQuery) -> None:
+@callback_route("buy", resolve="item")
+def cb_buy_item(call: telebot.types.CallbackQuery, item: CatalogItem) -> None:
     """Створення попереднього замовлення та запит підтвердження."""
     user = call.from_user
-    try:
-        item_id = int(call.data.split(":", 1)[1])
-    except ValueError:
-        bot.answer_callback_query(call.id, "Помилка ID товару")
-        return
-
-    item = CATALOG.get(item_id)
-    if not item:
-        bot.answer_callback_query(call.id, "Товар не знайдено")
-        return
-
-    order_id = get_next_order_id()
+    order_id, created_ts = next_order_stamp()
+    # Імена користувача інтернуються: усі його замовлення ділять ті самі рядки
+    full_name = f"{user.first_name or ''} {user.last_name or ''}".strip() or "Без імені"
     order = Order(
         order_id=order_id,
         user_id=user.id,
-        username=user.username,
-        full_name=f"{user.first_name or ''} {user.last_name or ''}".strip() or "Без імені",
-        item=item,
-        created_at=datetime.now(),
-        status="pending",
+        username=sys.intern(user.username) if user.username else None,
+        full_name=sys.intern(full_name),
+        item_id=item.item_id,
+        item_name=item.name,
+        price=item.price,
+        created_ts=created_ts,
     )
-    ORDERS[order_id] = order
+    add_order(order)
+    ORDER_REAPER.schedule(order, call.message.chat.id, call.message.message_id)
 
-    logger.info("Створено попереднє замовлення #%s від користувача %s", order_id, user.id)
+    log_event(
+        "order_created", "Створено попереднє замовлення #%(order_id)s від користувача %(user_id)s",
+        order_id=order_id, user_id=user.id, item_id=item.item_id,
+    )
 
-    bot.edit_message_text(
+    edit_message_text(
         format_item(item)
         + "\n\nПідтвердити замовлення цього товару?",
         chat_id=call.message.chat.id,
@@ -486,32 +3343,24 @@ def cb_buy_item(call: telebot.types.CallbackQuery) -> None:
     )
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("confirm:"))
-def cb_confirm_order(call: telebot.types.CallbackQuery) -> None:
+@callback_route("confirm", resolve="order")
+def cb_confirm_order(call: telebot.types.CallbackQuery, order: Order) -> None:
     """Підтвердження попереднього замовлення (створення рахунку)."""
-    try:
-        order_id = int(call.data.split(":", 1)[1])
-    except ValueError:
-        bot.answer_callback_query(call.id, "Помилка ID замовлення")
-        return
-
-    order = ORDERS.get(order_id)
-    if not order:
-        bot.answer_callback_query(call.id, "Замовлення не знайдено")
+    if not apply_order_action(order, "confirm"):
+        answer_stale_order(call, order)
         return
-
-    order.status = "waiting_payment"
+    ORDER_REAPER.schedule(order, call.message.chat.id, call.message.message_id)
 
     invoice_text = (
         f"✅ Замовлення #{order.order_id} підтверджено.\n\n"
-        f"Товар: <b>{order.item.name}</b>\n"
-        f"Сума до оплати: <b>{order.item.price:.2f} грн</b>\n\n"
+        f"Товар: <b>{order.item_name}</b>\n"
+        f"Сума до оплати: <b>{order.price:.2f} грн</b>\n\n"
         f"Номер рахунку: <code>{order.order_id:06d}</code>\n\n"
         "Після здійснення оплати натисніть кнопку нижче, щоб підтвердити оплату "
         "або скасувати замовлення."
     )
 
-    bot.edit_message_text(
+    edit_message_text(
         invoice_text,
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
@@ -519,91 +3368,650 @@ def cb_confirm_order(call: telebot.types.CallbackQuery) -> None:
     )
 
     # Надсилаємо замовлення адміністраторам
-    send_to_admins("📩 <b>Нове замовлення</b>\n" + format_order(order))
-    bot.answer_callback_query(call.id, "Замовлення підтверджено, рахунок створено.")
+    notify_admins_order("order", "📩 <b>Нове замовлення</b>", order)
+    answer_callback_query(call, "Замовлення підтверджено, рахунок створено.")
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("cancel:"))
-def cb_cancel_order(call: telebot.types.CallbackQuery) -> None:
+@callback_route("cancel", resolve="order")
+def cb_cancel_order(call: telebot.types.CallbackQuery, order: Order) -> None:
     """Скасування попереднього замовлення."""
-    try:
-        order_id = int(call.data.split(":", 1)[1])
-    except ValueError:
-        bot.answer_callback_query(call.id, "Помилка ID замовлення")
+    if not apply_order_action(order, "cancel"):
+        answer_stale_order(call, order)
         return
-
-    order = ORDERS.get(order_id)
-    if not order:
-        bot.answer_callback_query(call.id, "Замовлення не знайдено")
-        return
-
-    order.status = "cancelled"
-    bot.edit_message_text(
+    edit_message_text(
         f"Замовлення #{order.order_id} скасовано.",
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
     )
-    bot.answer_callback_query(call.id, "Замовлення скасовано.")
+    answer_callback_query(call, "Замовлення скасовано.")
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("pay_ok:"))
-def cb_pay_ok(call: telebot.types.CallbackQuery) -> None:
+@callback_route("pay_ok", resolve="order")
+def cb_pay_ok(call: telebot.types.CallbackQuery, order: Order) -> None:
     """Підтвердження оплати (імітація)."""
-    try:
-        order_id = int(call.data.split(":", 1)[1])
-    except ValueError:
-        bot.answer_callback_query(call.id, "Помилка ID замовлення")
+    if not apply_order_action(order, "pay_ok"):
+        answer_stale_order(call, order)
         return
-
-    order = ORDERS.get(order_id)
-    if not order:
-        bot.answer_callback_query(call.id, "Замовлення не знайдено")
-        return
-
-    order.status = "paid"
-    bot.edit_message_text(
+    edit_message_text(
         f"🎉 Дякуємо за оплату! Замовлення #{order.order_id} має статус <b>оплачено</b>.\n"
         "Наш менеджер зв'яжеться з вами для уточнення деталей.",
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
     )
 
-    send_to_admins("💸 <b>Оплата підтверджена</b>\n" + format_order(order))
-    bot.answer_callback_query(call.id, "Оплату підтверджено.")
+    notify_admins_order("paid", "💸 <b>Оплата підтверджена</b>", order)
+    answer_callback_query(call, "Оплату підтверджено.")
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("pay_cancel:"))
-def cb_pay_cancel(call: telebot.types.CallbackQuery) -> None:
+@callback_route("pay_cancel", resolve="order")
+def cb_pay_cancel(call: telebot.types.CallbackQuery, order: Order) -> None:
     """Відміна оплати (по суті скасування замовлення)."""
-    try:
-        order_id = int(call.data.split(":", 1)[1])
-    except ValueError:
-        bot.answer_callback_query(call.id, "Помилка ID замовлення")
+    if not apply_order_action(order, "pay_cancel"):
+        answer_stale_order(call, order)
         return
-
-    order = ORDERS.get(order_id)
-    if not order:
-        bot.answer_callback_query(call.id, "Замовлення не знайдено")
-        return
-
-    order.status = "cancelled"
-    bot.edit_message_text(
+    edit_message_text(
         f"Оплату для замовлення #{order.order_id} скасовано.\n"
         "Якщо ви передумаєте, можете зробити нове замовлення через /catalog.",
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
     )
-    send_to_admins("🚫 <b>Оплату скасовано</b>\n" + format_order(order))
-    bot.answer_callback_query(call.id, "Оплату скасовано.")
+    notify_admins_order("pay_cancel", "🚫 <b>Оплату скасовано</b>", order)
+    answer_callback_query(call, "Оплату скасовано.")
+
+
+# ===================== Прострочені замовлення =====================
+
+# Статус, що може простроїтися -> (дія скасування, термін у секундах, що саме минуло)
+ORDER_EXPIRY = {
+    status: (action, ttl, reason)
+    for status, action, ttl, reason in (
+        ("pending", "cancel", ORDER_PENDING_TTL, "час на підтвердження"),
+        ("waiting_payment", "pay_cancel", ORDER_PAYMENT_TTL, "час на оплату"),
+    )
+    if ttl > 0
+}
+
+
+class OrderReaper:
+    """Скасування замовлень, що надто довго чекають підтвердження або оплати.
+
+    Термін для статусу сталий, тож замовлення потрапляють у чергу свого
+    статусу вже в порядку спливання термінів: кожна черга – звичайний FIFO,
+    постановка та перевірка коштують O(1), без купи й окремих таймерів.
+    Запис пам'ятає версію замовлення; якщо статус відтоді змінився, запис
+    просто відкидається, а сама зміна йде через apply_order_action, тож
+    одночасне натискання кнопки користувачем не конфліктує зі скасуванням.
+    """
+
+    def __init__(self) -> None:
+        # статус -> черга (термін, order_id, версія, chat_id, message_id)
+        self._queues: Dict[str, Deque[tuple]] = {status: deque() for status in ORDER_EXPIRY}
+        self._cond = threading.Condition()
+        self.expired = 0
+        if self._queues:
+            thread = threading.Thread(target=self._run, name="order-reaper")
+            thread.daemon = True
+            thread.start()
+
+    def schedule(self, order: Order, chat_id: Optional[int] = None, message_id: Optional[int] = None) -> None:
+        """Почати відлік для поточного статусу замовлення (повідомлення – щоб прибрати кнопки)."""
+        fifo = self._queues.get(order.status)
+        if fifo is None:
+            return
+        entry = (time.time() + ORDER_EXPIRY[order.status][1], order.order_id, order.version, chat_id, message_id)
+        with self._cond:
+            fifo.append(entry)
+            if len(fifo) == 1:
+                self._cond.notify()
+
+    def _schedule_existing(self) -> None:
+        """Поставити в черги замовлення, завантажені зі сховища (від часу створення)."""
+        for status, fifo in self._queues.items():
+            ttl = ORDER_EXPIRY[status][1]
+            entries = [
+                (order.created_ts + ttl, order.order_id, order.version, None, None)
+                for order in ORDERS.with_status(status)
+                if owns_user(order.user_id)
+            ]
+            # Ці замовлення створені раніше за будь-яке нове, тож ідуть на початок черги
+            with self._cond:
+                fifo.extendleft(reversed(entries))
+                self._cond.notify()
+
+    def _run(self) -> None:
+        DATA_LOADED.wait()
+        self._schedule_existing()
+        while True:
+            with self._cond:
+                now = time.time()
+                due = []
+                for status, fifo in self._queues.items():
+                    while fifo and fifo[0][0] <= now:
+                        due.append((status, fifo.popleft()))
+                if not due:
+                    heads = [fifo[0][0] for fifo in self._queues.values() if fifo]
+                    self._cond.wait(min(heads) - now if heads else None)
+                    continue
+            for status, entry in due:
+                try:
+                    self._expire(status, *entry)
+                except Exception:
+                    logger.exception("Не вдалося скасувати прострочене замовлення #%s", entry[1])
+
+    def _expire(self, status: str, deadline: float, order_id: int, version: int,
+                chat_id: Optional[int], message_id: Optional[int]) -> None:
+        order = ORDERS.get(order_id)
+        if order is None or order.version != version:
+            return
+        action, _, reason = ORDER_EXPIRY[status]
+        if not apply_order_action(order, action):
+            return
+        self.expired += 1
+        log_event(
+            "order_expired", "Замовлення #%(order_id)s скасовано автоматично: минув %(reason)s",
+            order_id=order_id, user_id=order.user_id, reason=reason,
+        )
+        if ORDER_EXPIRY_EDIT and chat_id is not None:
+            edit_message_text(
+                f"⌛ Замовлення #{order_id} скасовано: минув {reason}.\n"
+                "Якщо товар ще потрібен, оформіть нове замовлення через /catalog.",
+                chat_id=chat_id,
+                message_id=message_id,
+            )
+
+
+ORDER_REAPER = OrderReaper()
+
+
+# ===================== Адмін: перегляд і експорт замовлень =====================
+
+ORDERS_FILTER_HINT = "Приклад: /orders paid user=123456 from=2026-01-01 to=2026-01-31"
+
+
+def parse_order_filter(args: List[str]) -> OrderFilter:
+    """Розібрати аргументи /orders та /export_orders.
+
+    Формат: [статус] [user=ID] [from=РРРР-ММ-ДД] [to=РРРР-ММ-ДД], дата "to"
+    включно. Кидає ValueError з текстом для адміністратора.
+    """
+    flt = OrderFilter()
+    for arg in args:
+        key, sep, value = arg.partition("=")
+        key = key.lower()
+        if not sep and key in _STATUS_CODES:
+            flt.status = key
+        elif key == "user" and value.isdigit():
+            flt.user_id = int(value)
+        elif key in ("from", "to"):
+            try:
+                day = datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"Дата має бути у форматі РРРР-ММ-ДД: {value}") from None
+            if key == "from":
+                flt.since_ts = int(day.timestamp())
+            else:
+                flt.until_ts = int((day + timedelta(days=1)).timestamp())
+        else:
+            raise ValueError(f"Невідомий фільтр: {arg}")
+    return flt
+
+
+def describe_order_filter(flt: OrderFilter) -> str:
+    parts = []
+    if flt.status:
+        parts.append(ORDER_STATUS_TITLES[flt.status])
+    if flt.user_id is not None:
+        parts.append(f"користувач {flt.user_id}")
+    if flt.since_ts is not None:
+        parts.append(f"з {datetime.fromtimestamp(flt.since_ts):%d.%m.%Y}")
+    if flt.until_ts is not None:
+        parts.append(f"по {datetime.fromtimestamp(flt.until_ts - 1):%d.%m.%Y}")
+    return ", ".join(parts) or "усі"
+
+
+def build_orders_browser(
+    flt: OrderFilter,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+) -> Tuple[str, types.InlineKeyboardMarkup]:
+    """Текст і клавіатура однієї сторінки адмін-перегляду замовлень.
+
+    Курсор (ID крайнього замовлення сторінки) передається в callback_data,
+    тож сторінка будується з індексу без підрахунку зсуву.
+    """
+    orders, more = ORDERS.select(flt, ORDERS_PAGE_SIZE, before=before, after=after)
+
+    lines: List[str] = [f"📋 <b>Замовлення</b> ({describe_order_filter(flt)})\n"]
+    if not orders:
+        lines.append("Нічого не знайдено 🧾")
+    for o in orders:
+        lines.append(
+            f"#{o.order_id}: {o.item_name} – {o.price:.0f} грн – "
+            f"{o.full_name} (@{o.username}) – {o.created_at:%d.%m %H:%M} – статус: {o.status}"
+        )
+
+    kb = types.InlineKeyboardMarkup()
+    has_newer = more if after is not None else before is not None
+    has_older = more if after is None else True
+    nav = []
+    if orders and has_newer:
+        nav.append(types.InlineKeyboardButton("⬅️ Новіші", callback_data=f"orders:a{orders[0].order_id}"))
+    if orders and has_older:
+        nav.append(types.InlineKeyboardButton("Старіші ➡️", callback_data=f"orders:b{orders[-1].order_id}"))
+    if not orders and (before is not None or after is not None):
+        nav.append(types.InlineKeyboardButton("⏮ До найновіших", callback_data="orders:"))
+    if nav:
+        kb.row(*nav)
+
+    def mark(selected: bool, title: str) -> str:
+        return f"• {title}" if selected else title
+
+    kb.row(
+        types.InlineKeyboardButton(mark(flt.status is None, "Усі"), callback_data="ofilter:status:"),
+        *(
+            types.InlineKeyboardButton(mark(flt.status == status, status), callback_data=f"ofilter:status:{status}")
+            for status in ORDER_STATUSES
+        ),
+    )
+    kb.row(
+        types.InlineKeyboardButton("Сьогодні", callback_data="ofilter:days:1"),
+        types.InlineKeyboardButton("7 днів", callback_data="ofilter:days:7"),
+        types.InlineKeyboardButton("30 днів", callback_data="ofilter:days:30"),
+        types.InlineKeyboardButton(mark(flt.since_ts is None and flt.until_ts is None, "Усі дати"),
+                                   callback_data="ofilter:days:0"),
+    )
+    kb.add(types.InlineKeyboardButton("📤 Експорт у CSV", callback_data="ofilter:export:"))
+    return "\n".join(lines), kb
+
+
+@bot.message_handler(commands=["orders"])
+def cmd_admin_orders(message: telebot.types.Message) -> None:
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        send_message(message.chat.id, "⛔ Лише адміністратор може переглядати замовлення.")
+        return
+
+    if report_orders_loading(message.chat.id):
+        return
+    if not ORDERS:
+        send_message(message.chat.id, "Замовлень поки що немає 🧾")
+        return
+
+    try:
+        flt = parse_order_filter(message.text.split()[1:])
+    except ValueError as e:
+        send_message(message.chat.id, f"⚠️ {e}\n\n{ORDERS_FILTER_HINT}")
+        return
+
+    get_user_state(user_id).orders_filter = flt
+    text, kb = build_orders_browser(flt)
+    send_message(message.chat.id, text, reply_markup=kb)
+
+
+@bot.message_handler(commands=["export_orders"])
+def cmd_export_orders(message: telebot.types.Message) -> None:
+    """Експорт замовлень: з аргументами – за ними, без – за поточним фільтром /orders."""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        send_message(message.chat.id, "⛔ Лише адміністратор може експортувати замовлення.")
+        return
+    if report_orders_loading(message.chat.id):
+        return
+
+    args = message.text.split()[1:]
+    try:
+        flt = parse_order_filter(args) if args else get_user_state(user_id).orders_filter or OrderFilter()
+    except ValueError as e:
+        send_message(message.chat.id, f"⚠️ {e}\n\n{ORDERS_FILTER_HINT}")
+        return
+    start_orders_export(message.chat.id, flt)
+
+
+def _percent(part: int, whole: int) -> str:
+    return f"{part * 100 / whole:.1f}%" if whole else "–"
+
+
+def format_sales_stats() -> str:
+    """Текст /stats з готових підсумків ORDERS.stats (без перегляду замовлень)."""
+    with ORDERS.lock:
+        stats = ORDERS.stats
+        counts = ORDERS.count_by_status()
+        day = stats.last_hours(24)
+        today = datetime.now().date()
+        days = [(d, stats.daily.get(d)) for d in (today - timedelta(days=i) for i in range(7))]
+        top = [stats.items[item_id] for item_id in stats.top]
+        created, confirmed, paid, revenue = stats.created, stats.confirmed, stats.paid, stats.revenue
+
+    lines = [
+        "📊 <b>Статистика продажів</b>",
+        "",
+        f"Замовлень: <b>{created}</b>",
+    ]
+    lines.extend(f"  • {ORDER_STATUS_TITLES[status]}: {counts.get(status, 0)}" for status in ORDER_STATUSES)
+    lines.append(f"Виручка: <b>{revenue:.2f} грн</b>"
+                 + (f" (середній чек {revenue / paid:.2f} грн)" if paid else ""))
+    lines.append(f"Конверсія: підтверджено {_percent(confirmed, created)} створених, "
+                 f"оплачено {_percent(paid, confirmed)} підтверджених ({_percent(paid, created)} створених)")
+    lines.append("")
+    lines.append(f"За 24 год: створено {day.created}, підтверджено {day.confirmed}, "
+                 f"оплачено {day.paid} на {day.revenue:.2f} грн")
+    lines.append("")
+    lines.append("За 7 днів (оплачено / виручка):")
+    for d, bucket in days:
+        lines.append(f"  {d:%d.%m}: {bucket.paid if bucket else 0} / {bucket.revenue if bucket else 0.0:.2f} грн")
+    if top:
+        lines.append("")
+        lines.append("Топ товарів за виручкою:")
+        for place, (name, sold, item_revenue) in enumerate(top, start=1):
+            lines.append(f"  {place}. {name} – {sold} шт., {item_revenue:.2f} грн")
+    return "\n".join(lines)
+
+
+@bot.message_handler(commands=["stats"])
+def cmd_stats(message: telebot.types.Message) -> None:
+    if not is_admin(message.from_user.id):
+        send_message(message.chat.id, "⛔ Лише адміністратор може переглядати статистику.")
+        return
+    if report_orders_loading(message.chat.id):
+        return
+    send_message(message.chat.id, format_sales_stats())
+
+
+@callback_route("orders")
+def cb_orders_page(call: telebot.types.CallbackQuery, cursor: str) -> None:
+    """Перехід між сторінками адмін-перегляду: a<ID> – новіші, b<ID> – старіші."""
+    if not is_admin(call.from_user.id):
+        answer_callback_query(call, "⛔ Лише для адміністратора")
+        return
+
+    before = after = None
+    if cursor[1:].isdigit():
+        if cursor[0] == "b":
+            before = int(cursor[1:])
+        elif cursor[0] == "a":
+            after = int(cursor[1:])
+
+    flt = get_user_state(call.from_user.id).orders_filter or OrderFilter()
+    text, kb = build_orders_browser(flt, before=before, after=after)
+    edit_message_text(text, chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=kb)
+    answer_callback_query(call)
+
+
+@callback_route("ofilter")
+def cb_orders_filter(call: telebot.types.CallbackQuery, arg: str) -> None:
+    """Зміна фільтра адмін-перегляду кнопками (статус, період) та експорт."""
+    if not is_admin(call.from_user.id):
+        answer_callback_query(call, "⛔ Лише для адміністратора")
+        return
+
+    state = get_user_state(call.from_user.id)
+    flt = state.orders_filter or OrderFilter()
+    field, _, value = arg.partition(":")
+    if field == "status" and (not value or value in _STATUS_CODES):
+        flt = replace(flt, status=value or None)
+    elif field == "days" and value.isdigit():
+        days = int(value)
+        if days:
+            midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            flt = replace(flt, since_ts=int((midnight - timedelta(days=days - 1)).timestamp()), until_ts=None)
+        else:
+            flt = replace(flt, since_ts=None, until_ts=None)
+    elif field == "export":
+        start_orders_export(call.message.chat.id, flt)
+        answer_callback_query(call, "Готую файл…")
+        return
+    else:
+        answer_callback_query(call, "Невідома дія")
+        return
+
+    state.orders_filter = flt
+    text, kb = build_orders_browser(flt)
+    edit_message_text(text, chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=kb)
+    answer_callback_query(call)
+
+
+def start_orders_export(chat_id: int, flt: OrderFilter) -> None:
+    worker = threading.Thread(target=export_orders, args=(chat_id, flt), name="orders-export")
+    worker.daemon = True
+    worker.start()
+
+
+def export_orders(chat_id: int, flt: OrderFilter) -> None:
+    """Записати замовлення за фільтром у CSV і надіслати документом.
+
+    Замовлення вибираються з індексу частинами по ORDERS_EXPORT_CHUNK, від
+    найстаріших, тож блокування сховища тримається недовго, а повного
+    списку в пам'яті немає – у пам'ять читається лише готовий файл.
+    """
+    count = 0
+    with tempfile.TemporaryFile() as tmp:
+        out = io.TextIOWrapper(tmp, encoding="utf-8", newline="")
+        writer = csv.writer(out, delimiter=";")
+        writer.writerow([
+            "order_id", "created_at", "status", "user_id", "username",
+            "full_name", "item_id", "item_name", "price",
+        ])
+
+        cursor = 0
+        while True:
+            chunk, more = ORDERS.select(flt, ORDERS_EXPORT_CHUNK, after=cursor)
+            for o in reversed(chunk):
+                writer.writerow([
+                    o.order_id, f"{o.created_at:%Y-%m-%d %H:%M:%S}", o.status, o.user_id, o.username or "",
+                    o.full_name, o.item_id, o.item_name, f"{o.price:.2f}",
+                ])
+            count += len(chunk)
+            if not more:
+                break
+            cursor = chunk[0].order_id
+
+        out.flush()
+        out.detach()
+        tmp.seek(0)
+        data = tmp.read()
+    send_document(chat_id, data, "orders.csv", f"📤 Замовлення ({describe_order_filter(flt)}): {count}")
+
+
+# ===================== FAQ: правила та зіставлення =====================
+
+class IntentMatcher:
+    """Скомпільовані FAQ-правила.
+
+    Фрази "contains" зібрані в один автомат Ахо–Корасік, тож текст
+    проглядається один раз незалежно від кількості правил. Фрази "exact"
+    порівнюються з усім повідомленням через словник. Якщо підходить кілька
+    правил, перемагає те, у якого менше значення priority.
+    """
+
+    def __init__(self, rules: List[Dict]) -> None:
+        self.replies: List[str] = []
+        self._exact: Dict[str, Tuple[int, int]] = {}  # фраза -> (priority, правило)
+        # Вузли автомата: переходи, посилання-невдачі та найкраще правило у вузлі
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._best: List[Optional[Tuple[int, int]]] = [None]
+
+        if not isinstance(rules, list):
+            raise ValueError("FAQ-правила мають бути списком")
+        for rule in rules:
+            if not isinstance(rule, dict):
+                raise ValueError(f"Некоректне FAQ-правило: {rule!r}")
+            reply = rule.get("reply")
+            exact = self._phrases(rule, "exact")
+            contains = self._phrases(rule, "contains")
+            if not isinstance(reply, str) or not (contains or exact):
+                raise ValueError(f"Некоректне FAQ-правило: {rule.get('intent')!r}")
+            try:
+                priority = int(rule.get("priority", 100))
+            except (TypeError, ValueError):
+                raise ValueError(f"Некоректний priority у FAQ-правилі {rule.get('intent')!r}") from None
+            key = (priority, len(self.replies))
+            self.replies.append(reply)
+            for phrase in exact:
+                phrase = phrase.strip().lower()
+                if phrase not in self._exact or key < self._exact[phrase]:
+                    self._exact[phrase] = key
+            for phrase in contains:
+                self._add_phrase(phrase.lower(), key)
+        self._build_failure_links()
+
+    @staticmethod
+    def _phrases(rule: Dict, key: str) -> List[str]:
+        """Фрази правила з ключа `key`; рядок замість списку чи порожня фраза – помилка.
+
+        Рядок інакше перебирався б по символах, а порожня фраза підходила б
+        до будь-якого повідомлення.
+        """
+        phrases = rule.get(key, [])
+        if not isinstance(phrases, list) or not all(isinstance(p, str) and p.strip() for p in phrases):
+            raise ValueError(f"{key} у FAQ-правилі {rule.get('intent')!r} має бути списком непорожніх рядків")
+        return phrases
+
+    def _add_phrase(self, phrase: str, key: Tuple[int, int]) -> None:
+        node = 0
+        for ch in phrase:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            node = nxt
+        if self._best[node] is None or key < self._best[node]:
+            self._best[node] = key
+
+    def _build_failure_links(self) -> None:
+        # BFS: найкраще правило вузла враховує всі суфікси (через fail-ланцюжок)
+        queue_: Deque[int] = deque(self._goto[0].values())
+        while queue_:
+            node = queue_.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+                queue_.append(child)
+
+    def match(self, text: str) -> Optional[str]:
+        """Відповідь найпріоритетнішого правила, що підходить до тексту."""
+        best = self._exact.get(text.strip().lower())
+
+        goto, fail, best_at = self._goto, self._fail, self._best
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            found = best_at[node]
+            if found is not None and (best is None or found < best):
+                best = found
+        return self.replies[best[1]] if best is not None else None
+
+
+class FaqRules:
+    """FAQ-правила з файлу з автоматичним перечитуванням при зміні."""
+
+    def __init__(self, path: str, reload_interval: float) -> None:
+        self._path = path
+        self._reload_interval = reload_interval
+        self._mtime: Optional[float] = None
+        self._missing = False
+        self._checked_at = 0.0
+        self._matcher = IntentMatcher([])
+        self._lock = threading.Lock()
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self._reload_interval:
+            return
+        # Перевіряє лише один потік; решта користуються поточними правилами
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self._path).st_mtime
+            except OSError:
+                # Залишаємо попередні правила і пишемо в лог лише раз
+                if not self._missing:
+                    logger.warning("Файл FAQ-правил %s недоступний", self._path)
+                    self._missing = True
+                return
+            self._missing = False
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self._path, encoding="utf-8") as f:
+                    matcher = IntentMatcher(json.load(f))
+            except Exception as e:
+                # Будь-яка помилка у файлі лишає попередні правила до наступної зміни файлу
+                logger.warning("Не вдалося завантажити FAQ-правила з %s: %s", self._path, e)
+            else:
+                self._matcher = matcher
+                logger.info("FAQ-правила завантажено: %s шт.", len(matcher.replies))
+            self._mtime = mtime
+        finally:
+            self._lock.release()
+
+    def match(self, text: str) -> Optional[str]:
+        self._maybe_reload()
+        return self._matcher.match(text)
+
+
+FAQ = FaqRules(FAQ_RULES_PATH, FAQ_RELOAD_INTERVAL)
 
 
 # ===================== Обробка текстових повідомлень (стани + FAQ) =====================
 
+# Назви режимів для повідомлення про їх завершення через неактивність
+MODE_TITLES = {
+    "feedback": "надсилання відгуку",
+    "search": "пошук товару",
+    "add_item": "додавання товару",
+    "remove_item": "видалення товару",
+    "import_items": "імпорт товарів",
+}
+
+
+def report_expired_mode(message: telebot.types.Message, state: UserState) -> bool:
+    """Повідомити, якщо режим користувача скасовано через неактивність."""
+    mode, state.expired = state.expired, None
+    # Якщо користувач уже почав нову дію, про стару не нагадуємо
+    if mode is None or state.mode is not None:
+        return False
+    send_message(
+        message.chat.id,
+        f"⌛ Дію «{MODE_TITLES.get(mode, mode)}» скасовано через тривалу неактивність.\n"
+        "Почніть її знову відповідною командою (див. /help).",
+    )
+    return True
+
+
+def discard_expired_on_command(update: types.Update) -> None:
+    """Після будь-якої команди про скасований раніше режим уже не нагадуємо.
+
+    Викликається перед обробниками в обох рушіях: команди обробляються
+    окремими обробниками, і без цього нагадування прийшло б на якийсь
+    пізніший, не пов'язаний текст.
+    """
+    message = update.message
+    if (message is not None and message.from_user is not None
+            and message.content_type == "text" and message.text.startswith("/")):
+        USER_STATE.discard_expired(message.from_user.id)
+
+
 @bot.message_handler(content_types=["text"])
 def handle_text(message: telebot.types.Message) -> None:
     user_id = message.from_user.id
     state = get_user_state(user_id)
-    mode = state.get("mode")
+    if report_expired_mode(message, state):
+        return
+    mode = state.mode
 
     # 1) Адмінський режим додавання товару
     if mode == "add_item" and is_admin(user_id):
@@ -620,44 +4028,33 @@ def handle_text(message: telebot.types.Message) -> None:
         process_feedback(message, state)
         return
 
-    # 4) Простеньке FAQ за ключовими словами
-    text_lower = message.text.lower()
-
-    if "товар" in text_lower or "каталог" in text_lower:
-        bot.send_message(
-            message.chat.id,
-            "Щоб переглянути доступні товари, скористайтесь командою /catalog.",
-        )
+    # 4) Запит для /search без аргументів
+    if mode == "search":
+        state.mode = None
+        STORAGE.save_user_state(user_id, state)
+        show_search_results(message.chat.id, state, message.text.strip())
         return
 
-    if "як зробити замовлення" in text_lower or "як замовити" in text_lower:
-        bot.send_message(
-            message.chat.id,
-            "Щоб зробити замовлення:\n"
-            "1) Відкрийте /catalog\n"
-            "2) Оберіть товар та натисніть «Замовити»\n"
-            "3) Підтвердіть замовлення та оплату за підказками бота.",
-        )
-        return
-
-    if message.text.strip().lower() in ("привіт", "добрий день", "добрий вечір"):
-        bot.send_message(message.chat.id, "Привіт! 😊 Чим можу допомогти?")
+    # 5) FAQ за ключовими словами (faq_rules.json)
+    reply = FAQ.match(message.text)
+    if reply:
+        send_message(message.chat.id, reply)
         return
 
     # Якщо нічого не підійшло – стандартна відповідь
-    bot.send_message(
+    send_message(
         message.chat.id,
         "Я поки що не розумію це повідомлення 😔\n"
         "Спробуйте скористатися командами /help або /catalog.",
     )
 
 
-def process_add_item(message: telebot.types.Message, state: Dict) -> None:
+def process_add_item(message: telebot.types.Message, state: UserState) -> None:
     """Обробка введення нового товару адміністратором."""
     text = message.text.strip()
     parts = [p.strip() for p in text.split(";", 2)]
     if len(parts) != 3:
-        bot.send_message(
+        send_message(
             message.chat.id,
             "⚠️ Невірний формат.\n"
             "Надішліть у форматі: <code>Назва;ціна;опис</code>",
@@ -666,11 +4063,9 @@ def process_add_item(message: telebot.types.Message, state: Dict) -> None:
 
     name, price_str, description = parts
     try:
-        price = float(price_str.replace(",", "."))
-        if price <= 0:
-            raise ValueError
+        price = parse_price(price_str)
     except ValueError:
-        bot.send_message(
+        send_message(
             message.chat.id,
             "⚠️ Ціна має бути додатним числом. Спробуйте ще раз.",
         )
@@ -678,68 +4073,311 @@ def process_add_item(message: telebot.types.Message, state: Dict) -> None:
 
     item_id = get_next_item_id()
     item = CatalogItem(item_id=item_id, name=name, price=price, description=description)
-    CATALOG[item_id] = item
-    state["mode"] = None
+    add_catalog_item(item)
+    state.mode = None
+    STORAGE.save_user_state(message.from_user.id, state)
 
-    bot.send_message(
+    send_message(
         message.chat.id,
         f"✅ Товар додано до каталогу:\n\n{format_item(item)}",
     )
-    logger.info("Адмін %s додав товар %s (#%s)", message.from_user.id, name, item_id)
+    log_event(
+        "item_added", "Адмін %(user_id)s додав товар %(name)s (#%(item_id)s)",
+        user_id=message.from_user.id, name=name, item_id=item_id,
+    )
 
 
-def process_remove_item(message: telebot.types.Message, state: Dict) -> None:
+def process_remove_item(message: telebot.types.Message, state: UserState) -> None:
     """Видалення товару за ID."""
     text = message.text.strip()
     try:
         item_id = int(text)
     except ValueError:
-        bot.send_message(
+        send_message(
             message.chat.id,
             "⚠️ ID має бути числом. Введіть ID товару ще раз."
         )
         return
 
-    item = CATALOG.pop(item_id, None)
-    state["mode"] = None
+    item = remove_catalog_item(item_id)
+    state.mode = None
+    STORAGE.save_user_state(message.from_user.id, state)
 
     if not item:
-        bot.send_message(message.chat.id, "Товар з таким ID не знайдено.")
+        send_message(message.chat.id, "Товар з таким ID не знайдено.")
         return
 
-    bot.send_message(
+    send_message(
         message.chat.id,
         f"🗑 Товар <b>{item.name}</b> (#{item.item_id}) видалено з каталогу.",
     )
-    logger.info("Адмін %s видалив товар #%s", message.from_user.id, item_id)
+    log_event(
+        "item_removed", "Адмін %(user_id)s видалив товар #%(item_id)s",
+        user_id=message.from_user.id, item_id=item_id,
+    )
 
 
-def process_feedback(message: telebot.types.Message, state: Dict) -> None:
+def process_feedback(message: telebot.types.Message, state: UserState) -> None:
     """Обробка відгуку користувача."""
     user = message.from_user
-    state["mode"] = None
+    state.mode = None
+    STORAGE.save_user_state(user.id, state)
 
+    # Текст і ім'я – від користувача, а повідомлення адміну йде в режимі HTML
+    name = html.escape(f"{user.first_name or ''} {user.last_name or ''}")
     text = (
         "📝 <b>Новий відгук</b>\n\n"
-        f"Від: {user.first_name or ''} {user.last_name or ''} (@{user.username})\n"
+        f"Від: {name} ({user_label(user.username, 'без username')})\n"
         f"ID: <code>{user.id}</code>\n\n"
-        f"Текст:\n{message.text}"
+        f"Текст:\n{html.escape(message.text)}"
     )
-    send_to_admins(text)
+    snippet = message.text if len(message.text) <= 80 else message.text[:79] + "…"
+    author = user_label(user.username, user.first_name or f"ID {user.id}")
+    notify_admins("feedback", text, f"{author}: {snippet}")
 
-    bot.send_message(
+    send_message(
         message.chat.id,
         "Дякуємо за ваш відгук! 💚\n"
         "Ваше повідомлення надіслано адміністраторам.",
     )
 
 
+# ===================== Inline-режим (пошук у будь-якому чаті) =====================
+
+# Ім'я бота для посилань; asyncio-рушій заповнює його під час старту, бо
+# bot.user при першому зверненні синхронно викликає getMe.
+_bot_username: Optional[str] = None
+
+
+def bot_username() -> str:
+    global _bot_username
+    if _bot_username is None:
+        _bot_username = bot.user.username
+    return _bot_username
+
+
+@bot.inline_handler(func=lambda query: True)
+def handle_inline_query(query: telebot.types.InlineQuery) -> None:
+    offset = int(query.offset) if query.offset.isdigit() else 0
+    text = query.query.strip()
+    if text:
+        item_ids, has_more = SEARCH_INDEX.search(text, offset, INLINE_PAGE_SIZE)
+    else:
+        # Порожній запит – просто перші товари каталогу
+        with _catalog_lock:
+            item_ids = _catalog_ids[offset:offset + INLINE_PAGE_SIZE]
+            has_more = offset + INLINE_PAGE_SIZE < len(_catalog_ids)
+
+    results = []
+    for item_id in item_ids:
+        item = CATALOG.get(item_id)
+        if not item:
+            continue
+        # Кнопки з callback_data в inline-повідомленнях не мають чату, тому
+        # ведемо користувача в особистий чат з ботом на сторінку товару.
+        kb = types.InlineKeyboardMarkup()
+        kb.add(types.InlineKeyboardButton(
+            "🛒 Відкрити в боті",
+            url=f"https://t.me/{bot_username()}?start=item_{item.item_id}",
+        ))
+        results.append(types.InlineQueryResultArticle(
+            id=str(item.item_id),
+            title=item.name,
+            description=f"{item.price:.0f} грн · {item.description[:100]}",
+            input_message_content=types.InputTextMessageContent(format_item(item), parse_mode="HTML"),
+            reply_markup=kb,
+        ))
+
+    next_offset = str(offset + INLINE_PAGE_SIZE) if has_more else ""
+    OUTBOX.submit(
+        query.from_user.id,
+        bot.answer_inline_query,
+        (query.id, results),
+        {"cache_time": 30, "next_offset": next_offset},
+        limited=False,
+    )
+
+
+# ===================== Масовий імпорт / експорт каталогу =====================
+
+@bot.message_handler(content_types=["document"])
+def handle_document(message: telebot.types.Message) -> None:
+    user_id = message.from_user.id
+    state = get_user_state(user_id)
+    if report_expired_mode(message, state):
+        return
+    if state.mode != "import_items" or not is_admin(user_id):
+        send_message(message.chat.id, "Я не очікую файлів 📎 Спробуйте /help.")
+        return
+
+    document = message.document
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        send_message(message.chat.id, "⚠️ Файл завеликий: Telegram дозволяє ботам завантажувати до 20 МБ.")
+        return
+
+    state.mode = None
+    STORAGE.save_user_state(user_id, state)
+    # Імпорт може тривати довго, тож не займаємо потік обробки оновлень
+    worker = threading.Thread(
+        target=import_catalog,
+        args=(message.chat.id, user_id, document.file_id, document.file_name or ""),
+        name="catalog-import",
+    )
+    worker.daemon = True
+    worker.start()
+
+
+def _iter_csv_rows(lines: Iterable[str]) -> Iterator[Tuple[int, Optional[List[str]], Optional[str]]]:
+    """Рядки CSV як (номер, [назва, ціна, опис], помилка)."""
+    lines = iter(lines)
+    first = next(lines, "")
+    delimiter = ";" if ";" in first else ","
+    reader = csv.reader(itertools.chain([first], lines), delimiter=delimiter)
+    for row_no, row in enumerate(reader, start=1):
+        if not row or not any(field.strip() for field in row):
+            continue
+        if row_no == 1 and len(row) > 1 and row[1].strip().lower() in ("price", "ціна"):
+            continue  # заголовок
+        if len(row) != 3:
+            yield row_no, None, "очікується 3 поля: назва;ціна;опис"
+            continue
+        yield row_no, [field.strip() for field in row], None
+
+
+def _iter_jsonl_rows(lines: Iterable[str]) -> Iterator[Tuple[int, Optional[List[str]], Optional[str]]]:
+    """Рядки JSONL як (номер, [назва, ціна, опис], помилка)."""
+    for row_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            yield row_no, None, "некоректний JSON"
+            continue
+        if not isinstance(obj, dict) or "name" not in obj or "price" not in obj:
+            yield row_no, None, "потрібні поля name і price"
+            continue
+        yield row_no, [str(obj["name"]).strip(), str(obj["price"]), str(obj.get("description", "")).strip()], None
+
+
+def import_catalog(chat_id: int, admin_id: int, file_id: str, file_name: str) -> None:
+    """Потоково завантажити файл з Telegram і додати товари пачками."""
+    fmt = "jsonl" if file_name.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+    # ID повідомлення про прогрес стає відомим, коли черга його надішле; до
+    # того (або якщо надіслати не вдалося) проміжні оновлення пропускаємо
+    progress: Dict[str, int] = {}
+    OUTBOX.submit(
+        chat_id, bot.send_message, (chat_id, "⏳ Імпорт розпочато…"),
+        callback=lambda message: progress.setdefault("message_id", message.message_id),
+    )
+
+    added = 0
+    errors: List[str] = []
+    error_count = 0
+    batch: List[CatalogItem] = []
+    row_no = 0
+    try:
+        with requests.get(bot.get_file_url(file_id), stream=True, timeout=30) as resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            lines = io.TextIOWrapper(resp.raw, encoding="utf-8-sig", newline="")
+            rows = _iter_jsonl_rows(lines) if fmt == "jsonl" else _iter_csv_rows(lines)
+
+            for row_no, fields, error in rows:
+                if fields is not None:
+                    name, price_str, description = fields
+                    try:
+                        price = parse_price(price_str)
+                    except ValueError:
+                        error = "ціна має бути додатним числом"
+                    else:
+                        batch.append(CatalogItem(
+                            item_id=get_next_item_id(),
+                            name=name,
+                            price=price,
+                            description=description,
+                        ))
+
+                if error is not None:
+                    error_count += 1
+                    if len(errors) < IMPORT_MAX_ERRORS_SHOWN:
+                        errors.append(f"рядок {row_no}: {error}")
+
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    add_catalog_items(batch)
+                    added += len(batch)
+                    batch = []
+
+                if row_no % IMPORT_PROGRESS_EVERY == 0 and "message_id" in progress:
+                    edit_message_text(
+                        f"⏳ Оброблено рядків: {row_no}, додано: {added + len(batch)}, помилок: {error_count}",
+                        chat_id=chat_id,
+                        message_id=progress["message_id"],
+                    )
+    except (requests.RequestException, telebot.apihelper.ApiException, UnicodeDecodeError, csv.Error) as e:
+        logger.warning("Імпорт каталогу перервано на рядку %s: %s", row_no, e)
+        errors.append(f"імпорт перервано на рядку {row_no}: {e}")
+    except Exception as e:
+        # Потік імпорту ніхто не чекає, тож про будь-яку помилку пишемо в лог і адміну
+        logger.exception("Помилка імпорту каталогу (%s) на рядку %s", file_name, row_no)
+        errors.append(f"імпорт перервано на рядку {row_no}: внутрішня помилка ({type(e).__name__})")
+    finally:
+        if batch:
+            add_catalog_items(batch)
+            added += len(batch)
+
+    lines_out = [f"✅ Імпорт завершено. Додано товарів: <b>{added}</b>, помилок: <b>{error_count}</b>."]
+    if errors:
+        lines_out.append("")
+        lines_out.extend(errors)
+        if error_count > IMPORT_MAX_ERRORS_SHOWN:
+            lines_out.append(f"… і ще {error_count - IMPORT_MAX_ERRORS_SHOWN}")
+    if "message_id" in progress:
+        edit_message_text("\n".join(lines_out), chat_id=chat_id, message_id=progress["message_id"])
+    else:
+        send_message(chat_id, "\n".join(lines_out))
+    log_event(
+        "catalog_imported", "Адмін %(user_id)s імпортував %(added)s товарів (%(errors)s помилок)",
+        user_id=admin_id, added=added, errors=error_count,
+    )
+
+
+def export_catalog(chat_id: int, fmt: str) -> None:
+    """Записати каталог у тимчасовий файл і надіслати його документом."""
+    with _catalog_lock:
+        item_ids = list(_catalog_ids)
+
+    with tempfile.TemporaryFile() as tmp:
+        out = io.TextIOWrapper(tmp, encoding="utf-8", newline="")
+        writer = csv.writer(out, delimiter=";") if fmt == "csv" else None
+        if writer:
+            writer.writerow(["name", "price", "description"])
+
+        for item_id in item_ids:
+            item = CATALOG.get(item_id)
+            if item is None:
+                continue  # видалено під час експорту
+            if writer:
+                writer.writerow([item.name, f"{item.price:.2f}", item.description])
+            else:
+                out.write(json.dumps(
+                    {"name": item.name, "price": item.price, "description": item.description},
+                    ensure_ascii=False,
+                ) + "\n")
+
+        out.flush()
+        out.detach()
+        tmp.seek(0)
+        data = tmp.read()
+    send_document(chat_id, data, f"catalog.{fmt}", f"📤 Каталог: {len(item_ids)} товарів")
+
+
 # ===================== Початкове наповнення каталогу =====================
 
 def seed_catalog() -> None:
     """Додати кілька тестових товарів у каталог при старті бота."""
-    if CATALOG:
-        return  # вже ініціалізовано
+    if CATALOG or _next_item_id > 1:
+        return  # вже ініціалізовано (або адміністратор уже змінював каталог)
 
     items = [
         ("Футболка з логотипом", 499, "Чорна футболка з білим логотипом бота."),
@@ -749,30 +4387,505 @@ def seed_catalog() -> None:
 
     for name, price, desc in items:
         item_id = get_next_item_id()
-        CATALOG[item_id] = CatalogItem(
+        add_catalog_item(CatalogItem(
             item_id=item_id,
             name=name,
             price=float(price),
             description=desc,
-        )
+        ))
 
     logger.info("Каталог ініціалізовано тестовими товарами (%s шт.)", len(CATALOG))
 
 
+# ===================== Webhook =====================
+
+# Сирі JSON-тіла оновлень; розбираються вже у фоновому потоці.
+_webhook_queue: "queue.Queue[str]" = queue.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+
+
+@app.route(f"/webhook/{WEBHOOK_SECRET}", methods=["POST"])
+def webhook():
+    """Прийняти оновлення від Telegram і одразу відповісти 200."""
+    if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+        abort(403)
+
+    try:
+        _webhook_queue.put_nowait(request.get_data(as_text=True))
+    except queue.Full:
+        logger.warning("Черга webhook-оновлень переповнена, просимо Telegram повторити")
+        return "", 503
+    return ""
+
+
+def _webhook_worker() -> None:
+    """Забирати оновлення з черги пачками та передавати їх боту."""
+    while True:
+        batch = [_webhook_queue.get()]
+        while len(batch) < WEBHOOK_BATCH_SIZE:
+            try:
+                batch.append(_webhook_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if WORKER_POOL is not None:
+            for raw in batch:
+                try:
+                    WORKER_POOL.dispatch(json.loads(raw))
+                except ValueError as e:
+                    logger.warning("Не вдалося розібрати webhook-оновлення: %s", e)
+            continue
+
+        updates = []
+        for raw in batch:
+            try:
+                updates.append(types.Update.de_json(raw))
+            except Exception as e:
+                logger.warning("Не вдалося розібрати webhook-оновлення: %s", e)
+
+        try:
+            bot.process_new_updates(updates)
+        except Exception:
+            logger.exception("Помилка обробки пачки з %s оновлень", len(updates))
+
+
+def setup_webhook() -> None:
+    """Запустити обробник черги та зареєструвати webhook у Telegram."""
+    worker = threading.Thread(target=_webhook_worker, name="webhook-worker")
+    worker.daemon = True
+    worker.start()
+
+    url = f"{WEBHOOK_URL.rstrip('/')}/webhook/{WEBHOOK_SECRET}"
+    bot.set_webhook(
+        url=url,
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        drop_pending_updates=True,
+    )
+    logger.info("Webhook встановлено на %s/webhook/…", WEBHOOK_URL.rstrip("/"))
+
+
+# ===================== Кілька процесів =====================
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+    """Chat id сирого оновлення (для розподілу між процесами)."""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat") or event.get("from")
+        if chat:
+            return chat["id"]
+    return update["update_id"]
+
+
+class WorkerPool:
+    """Процеси-обробники, кожен зі своїм TeleBot і локальними кешами.
+
+    Оновлення одного чату завжди потрапляють в один процес, тож стан
+    користувача живе лише там, а порядок його повідомлень зберігається.
+    """
+
+    def __init__(self, count: int) -> None:
+        # spawn: дочірні процеси не успадковують потоки й з'єднання батька
+        ctx = multiprocessing.get_context("spawn")
+        self._inboxes = [ctx.Queue(maxsize=UPDATE_QUEUE_SIZE) for _ in range(count)]
+        self._processes = [
+            ctx.Process(target=worker_main, args=(index, inbox), name=f"shop-worker-{index}", daemon=True)
+            for index, inbox in enumerate(self._inboxes)
+        ]
+
+    def start(self) -> None:
+        for process in self._processes:
+            process.start()
+        logger.info("Запущено %s процесів-обробників", len(self._processes))
+
+    def dispatch(self, update: Dict[str, Any]) -> None:
+        # Повна черга процесу блокує прийом нових оновлень (зворотний тиск)
+        self._inboxes[update_chat_id(update) % len(self._inboxes)].put(update)
+
+
+WORKER_POOL: Optional[WorkerPool] = None
+
+
+def apply_shared_changes() -> None:
+    """Застосувати до локальних кешів зміни каталогу й замовлень від інших процесів."""
+    changes = STORAGE.poll_changes()
+    if not changes:
+        return
+    catalog_changed = False
+    for kind, key, obj in changes:
+        if kind == "item":
+            catalog_changed = True
+            with _catalog_lock:
+                if obj is None:
+                    _drop_item_locally(key)
+                else:
+                    _put_item_locally(obj)
+        else:
+            with ORDERS.lock:
+                order = ORDERS.get(key)
+                if order is None:
+                    ORDERS.add(obj)
+                elif order.status != obj.status:
+                    ORDERS.set_status(order, obj.status)
+    if catalog_changed:
+        invalidate_catalog_pages()
+
+
+def _follow_shared_changes() -> None:
+    while True:
+        time.sleep(SHARED_POLL_INTERVAL)
+        try:
+            apply_shared_changes()
+        except Exception:
+            logger.exception("Не вдалося прочитати зміни від інших процесів")
+
+
+def worker_main(index: int, inbox: "multiprocessing.Queue") -> None:
+    """Точка входу процесу-обробника: власний стан, спільне сховище, свої оновлення."""
+    global WORKER_INDEX
+    WORKER_INDEX = index
+    init_storage()
+    follower = threading.Thread(target=_follow_shared_changes, name="shared-changes")
+    follower.daemon = True
+    follower.start()
+    logger.info("Процес-обробник %s готовий", index)
+
+    while True:
+        data = inbox.get()
+        try:
+            bot.process_new_updates([types.Update.de_json(data)])
+        except Exception:
+            logger.exception("Помилка обробки оновлення %s", data.get("update_id"))
+
+
+def poll_to_workers() -> None:
+    """Long polling у головному процесі з передачею оновлень процесам-обробникам."""
+    offset = None
+    started = False
+    while True:
+        # Мережеві помилки на старті теж повторюємо: інакше головний процес
+        # завершився б, а процеси-обробники лишилися б працювати без оновлень
+        try:
+            if not started:
+                bot.remove_webhook()
+                # Як skip_pending=True: підтверджуємо все, що накопичилося до старту
+                pending = telebot.apihelper.get_updates(TOKEN, offset=-1, limit=1, long_polling_timeout=1)
+                offset = pending[-1]["update_id"] + 1 if pending else None
+                started = True
+            updates = telebot.apihelper.get_updates(TOKEN, offset=offset, limit=100, long_polling_timeout=20)
+        except Exception as e:
+            logger.warning("Помилка getUpdates: %s", e)
+            time.sleep(3)
+            continue
+        for update in updates:
+            offset = update["update_id"] + 1
+            WORKER_POOL.dispatch(update)
+
+
+# ===================== Метрики (Prometheus) =====================
+
+def instrument_handlers() -> None:
+    """Обгорнути всі зареєстровані обробники заміром часу для /metrics."""
+    for handlers in (bot.message_handlers, bot.inline_handlers):
+        for handler in handlers:
+            handler["function"] = METRICS.timed(handler["function"])
+    # Кнопки приходять через один route_callback, тож міряємо самі маршрути
+    for prefix, (func, resolve) in list(CALLBACK_ROUTES.items()):
+        CALLBACK_ROUTES[prefix] = (METRICS.timed(func), resolve)
+
+
+instrument_handlers()
+
+
+def _render_histograms(lines: List[str], name: str, help_text: str, label: str,
+                       family: Dict[str, Histogram]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for value, hist in sorted(family.items()):
+        with hist._lock:
+            counts = list(hist.counts)
+            total = hist.total
+        cumulative = 0
+        for bound, count in zip(hist.bounds + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{label}="{value}",le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{label}="{value}"}} {total}')
+        lines.append(f'{name}_count{{{label}="{value}"}} {cumulative}')
+
+
+def _render_gauge(lines: List[str], name: str, help_text: str, value: float) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} gauge")
+    lines.append(f"{name} {value}")
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+def render_metrics() -> str:
+    """Усі метрики в текстовому форматі Prometheus."""
+    lines: List[str] = []
+    _render_histograms(lines, "shop_handler_duration_seconds",
+                       "Час виконання обробників оновлень.", "handler", METRICS.handler_latency)
+    _render_histograms(lines, "shop_telegram_api_duration_seconds",
+                       "Час запитів до Telegram Bot API.", "method", METRICS.api_latency)
+
+    lines.append("# HELP shop_telegram_api_errors_total Невдалі запити до Telegram Bot API.")
+    lines.append("# TYPE shop_telegram_api_errors_total counter")
+    for method, count in sorted(METRICS.api_errors.items()):
+        lines.append(f'shop_telegram_api_errors_total{{method="{method}"}} {count}')
+
+    _render_gauge(lines, "shop_update_backlog", "Оновлення, що очікують обробки.",
+                  bot.backlog() + _webhook_queue.qsize() + (_async_updates.qsize() if _async_updates else 0))
+    _render_gauge(lines, "shop_outbox_depth", "Вихідні запити в черзі на відправку.", OUTBOX.depth())
+    _render_gauge(lines, "shop_user_states", "Активні стани користувачів у пам'яті.", len(USER_STATE))
+    _render_gauge(lines, "shop_catalog_items", "Товарів у каталозі.", len(CATALOG))
+    _render_gauge(lines, "shop_data_loading", "1, поки каталог і замовлення довантажуються зі знімка.",
+                  0 if DATA_LOADED.is_set() else 1)
+
+    lines.append("# HELP shop_render_cache_lookups_total Звернення до кешу готових текстів і клавіатур.")
+    lines.append("# TYPE shop_render_cache_lookups_total counter")
+    lines.append(f'shop_render_cache_lookups_total{{result="hit"}} {RENDER_CACHE.hits}')
+    lines.append(f'shop_render_cache_lookups_total{{result="miss"}} {RENDER_CACHE.misses}')
+
+    lines.append("# HELP shop_admin_notifications_total Події для адміністраторів за способом доставки.")
+    lines.append("# TYPE shop_admin_notifications_total counter")
+    lines.append(f'shop_admin_notifications_total{{delivery="immediate"}} {ADMIN_NOTIFIER.immediate}')
+    lines.append(f'shop_admin_notifications_total{{delivery="digest"}} {ADMIN_NOTIFIER.digested}')
+    lines.append("# HELP shop_admin_digests_total Надіслані адміністраторам зведення.")
+    lines.append("# TYPE shop_admin_digests_total counter")
+    lines.append(f"shop_admin_digests_total {ADMIN_NOTIFIER.digests_sent}")
+
+    lines.append("# HELP shop_orders_expired_total Замовлення, скасовані через сплив терміну.")
+    lines.append("# TYPE shop_orders_expired_total counter")
+    lines.append(f"shop_orders_expired_total {ORDER_REAPER.expired}")
+
+    _render_gauge(lines, "shop_log_queue_depth", "Записи логу, що чекають на потік запису.",
+                  LOG_HANDLER.queue.qsize())
+    lines.append("# HELP shop_log_records_dropped_total Записи логу, відкинуті через переповнену чергу.")
+    lines.append("# TYPE shop_log_records_dropped_total counter")
+    lines.append(f"shop_log_records_dropped_total {LOG_HANDLER.dropped}")
+
+    lines.append("# HELP shop_updates_rejected_total Вхідні оновлення, відкинуті лімітом користувача або під перевантаженням.")
+    lines.append("# TYPE shop_updates_rejected_total counter")
+    for (reason, priority), count in sorted(UPDATE_LIMITER.rejected.items()):
+        lines.append(f'shop_updates_rejected_total{{reason="{reason}",priority="{priority}"}} {count}')
+
+    _render_gauge(lines, "shop_revenue", "Виручка з оплачених замовлень, грн.", ORDERS.stats.revenue)
+
+    lines.append("# HELP shop_orders Замовлення за статусом.")
+    lines.append("# TYPE shop_orders gauge")
+    counts = ORDERS.count_by_status()
+    for status in ORDER_STATUSES:
+        lines.append(f'shop_orders{{status="{status}"}} {counts.get(status, 0)}')
+
+    return "\n".join(lines) + "\n"
+
+
+# ===================== Asyncio-рушій =====================
+
+# Оновлення, що чекають обробки в циклі подій (лише для BOT_ENGINE="asyncio")
+_async_updates: "Optional[asyncio.Queue[types.Update]]" = None
+
+
+def _async_handler(func: Callable) -> Callable:
+    """Обгорнути синхронний обробник у корутину для AsyncTeleBot.
+
+    Обробники не чекають на мережу (відповіді йдуть через OUTBOX, важкі
+    експорти та імпорт – у своїх потоках), тож виконуються прямо в циклі.
+    """
+    @functools.wraps(func)
+    async def handler(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            logger.exception("Помилка в обробнику %s", func.__name__)
+    return handler
+
+
+def build_async_bot() -> Any:
+    """AsyncTeleBot з тими самими обробниками, що зареєстровані на `bot`."""
+    from telebot import asyncio_helper
+    from telebot.async_telebot import AsyncTeleBot
+
+    if BOT_API_URL:
+        asyncio_helper.API_URL = BOT_API_URL
+    asyncio_helper.REQUEST_LIMIT = ASYNC_HTTP_CONNECTIONS
+
+    # Час і помилки запитів до Bot API – у ті самі метрики, що й для потоків
+    process_request = asyncio_helper._process_request
+
+    async def instrumented_request(token, url, method="get", params=None, files=None, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await process_request(token, url, method, params=params, files=files, **kwargs)
+            failed = False
+            return result
+        finally:
+            METRICS.observe_api(url, time.perf_counter() - started, failed)
+
+    asyncio_helper._process_request = instrumented_request
+
+    async_bot = AsyncTeleBot(TOKEN, parse_mode="HTML")
+    for attr in ("message_handlers", "callback_query_handlers", "inline_handlers"):
+        getattr(async_bot, attr).extend(
+            dict(handler, function=_async_handler(handler["function"])) for handler in getattr(bot, attr)
+        )
+    return async_bot
+
+
+async def _dispatch_updates(async_bot: Any) -> None:
+    """Обробляти оновлення по одному в порядку надходження.
+
+    Обробник виконується без перемикань між задачами, тож діалог кожного
+    користувача, як і в потоковому рушії, не перемішується.
+    """
+    while True:
+        update = await _async_updates.get()
+        discard_expired_on_command(update)
+        await async_bot.process_new_updates([update])
+
+
+async def _poll_updates(async_bot: Any) -> None:
+    offset = None
+    started = False
+    while True:
+        # Мережеві помилки на старті теж повторюємо: інакше gather завершився б
+        # разом із процесом
+        try:
+            if not started:
+                # Якщо раніше був встановлений webhook, getUpdates поверне помилку 409.
+                await async_bot.delete_webhook(drop_pending_updates=True)
+                started = True
+            updates = await async_bot.get_updates(offset=offset, timeout=20, request_timeout=30)
+        except Exception as e:
+            logger.warning("Не вдалося отримати оновлення: %s", e)
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            if UPDATE_LIMITER.admit(update, _async_updates.qsize()):
+                await _async_updates.put(update)  # повна черга призупиняє опитування
+        if updates:
+            offset = updates[-1].update_id + 1
+
+
+def build_async_web_app() -> Any:
+    """aiohttp-застосунок з тими ж адресами, що й Flask: /, /metrics і webhook."""
+    from aiohttp import web
+
+    async def async_index(request: web.Request) -> web.Response:
+        return web.Response(text="Bot is running")
+
+    async def async_metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            body=render_metrics().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    async def async_webhook(request: web.Request) -> web.Response:
+        """Прийняти оновлення від Telegram і одразу відповісти 200."""
+        if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            raise web.HTTPForbidden()
+        try:
+            update = types.Update.de_json(await request.text())
+        except Exception as e:
+            logger.warning("Не вдалося розібрати webhook-оновлення: %s", e)
+            return web.Response()
+        if not UPDATE_LIMITER.admit(update, _async_updates.qsize()):
+            return web.Response()
+        try:
+            _async_updates.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning("Черга webhook-оновлень переповнена, просимо Telegram повторити")
+            return web.Response(status=503)
+        return web.Response()
+
+    web_app = web.Application()
+    web_app.router.add_get("/", async_index)
+    web_app.router.add_get("/metrics", async_metrics)
+    web_app.router.add_post(f"/webhook/{WEBHOOK_SECRET}", async_webhook)
+    return web_app
+
+
+async def run_async_bot(host: str, port: int) -> None:
+    """Точка входу asyncio-рушія: сховище, HTTP-сервер і отримання оновлень в одному циклі."""
+    global _async_updates, _bot_username
+    from aiohttp import web
+
+    init_storage()
+    seed_catalog()
+    logger.info("Bot is starting (asyncio)...")
+    if WORKER_PROCESSES > 1:
+        logger.warning("WORKER_PROCESSES > 1 не підтримується asyncio-рушієм, працюємо в одному процесі")
+
+    _async_updates = asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+    async_bot = build_async_bot()
+    OUTBOX.start(asyncio.get_running_loop(), async_bot)
+    # До початку обробки: синхронні обробники не мають чекати на getMe в циклі
+    _bot_username = (await async_bot.get_me()).username
+
+    runner = web.AppRunner(build_async_web_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    tasks = [asyncio.create_task(_dispatch_updates(async_bot))]
+    if BOT_MODE == "webhook":
+        await async_bot.set_webhook(
+            url=f"{WEBHOOK_URL.rstrip('/')}/webhook/{WEBHOOK_SECRET}",
+            secret_token=WEBHOOK_SECRET,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            drop_pending_updates=True,
+        )
+        logger.info("Webhook встановлено на %s/webhook/…", WEBHOOK_URL.rstrip("/"))
+    else:
+        tasks.append(asyncio.create_task(_poll_updates(async_bot)))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await runner.cleanup()
+        await async_bot.close_session()
+
+
 # ===================== Точка входу =====================
 @app.route("/")
 def index():
     return "Bot is running"
 
 def run_bot():
+    global WORKER_POOL
+    init_storage()
     seed_catalog()
     logger.info("Bot is starting...")
+    if WORKER_PROCESSES > 1:
+        if STORAGE.shared:
+            STORAGE.flush()  # тестові товари мають бути в базі до старту процесів
+            WORKER_POOL = WorkerPool(WORKER_PROCESSES)
+            WORKER_POOL.start()
+        else:
+            logger.warning("WORKER_PROCESSES > 1 потребує STORAGE_BACKEND=\"sqlite\", працюємо в одному процесі")
+
+    if BOT_MODE == "webhook":
+        setup_webhook()
+        return
+
+    if WORKER_POOL is not None:
+        poll_to_workers()
+        return
+
+    # Якщо раніше був встановлений webhook, getUpdates поверне помилку 409.
+    bot.remove_webhook()
     bot.infinity_polling(skip_pending=True)
 
 if __name__ == "__main__":
-    t = threading.Thread(target=run_bot)
-    t.daemon = True
-    t.start()
-
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port)
+    if BOT_ENGINE == "asyncio":
+        asyncio.run(run_async_bot("0.0.0.0", port))
+    else:
+        t = threading.Thread(target=run_bot)
+        t.daemon = True
+        t.start()
+        app.run(host="0.0.0.0", port=port)
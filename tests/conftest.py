@@ -0,0 +1,94 @@
+"""Спільне налаштування тестів.
+
+Бот імпортується з фіктивним токеном і сховищем у пам'яті, тож тести не
+звертаються ні до Telegram API, ні до файлів на диску.
+"""
+
+import os
+import sys
+import time
+from typing import Optional
+
+import pytest
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import types  # noqa: E402
+
+import telegram_shop_bot as shop  # noqa: E402
+
+BASE_TS = 1_700_000_000
+
+
+@pytest.fixture
+def make_order():
+    """Фабрика замовлень: created_ts зростає разом з order_id (як у next_order_stamp)."""
+
+    def make(order_id: int, user_id: int = 1, status: str = "pending", created_ts: Optional[int] = None) -> shop.Order:
+        order = shop.Order(
+            order_id=order_id,
+            user_id=user_id,
+            username=f"user{user_id}",
+            full_name=f"Користувач {user_id}",
+            item_id=1,
+            item_name="Футболка",
+            price=500.0,
+            created_ts=BASE_TS + order_id * 60 if created_ts is None else created_ts,
+        )
+        order.status = status
+        return order
+
+    return make
+
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"U{user_id}", "username": f"u{user_id}"}
+
+
+@pytest.fixture
+def message_update():
+    """Фабрика оновлень з текстовим повідомленням (команди отримують entity bot_command)."""
+    counter = iter(range(1, 1_000_000))
+
+    def make(user_id: int, text: str) -> types.Update:
+        update_id = next(counter)
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": _user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return types.Update.de_json({"update_id": update_id, "message": message})
+
+    return make
+
+
+@pytest.fixture
+def callback_update():
+    """Фабрика оновлень з натисканням inline-кнопки."""
+    counter = iter(range(1, 1_000_000))
+
+    def make(user_id: int, data: str, call_id: Optional[str] = None) -> types.Update:
+        update_id = next(counter)
+        return types.Update.de_json({
+            "update_id": update_id,
+            "callback_query": {
+                "id": call_id or f"cb{update_id}",
+                "from": _user(user_id),
+                "chat_instance": "test",
+                "data": data,
+                "message": {
+                    "message_id": 5,
+                    "date": 0,
+                    "chat": {"id": user_id, "type": "private"},
+                    "text": "Замовлення",
+                },
+            },
+        })
+
+    return make
@@ -0,0 +1,85 @@
+"""Сповіщення адміністраторів: окремі повідомлення і перехід на зведення."""
+
+import time
+
+import pytest
+
+import telegram_shop_bot as shop
+
+ADMIN = 1
+
+
+@pytest.fixture
+def notifier(monkeypatch):
+    """AdminNotifier з порогом 3 сповіщення і зведенням раз на 0,1 с."""
+    sent = []
+    monkeypatch.setattr(shop, "ADMIN_IDS", {ADMIN})
+    monkeypatch.setattr(shop, "ADMIN_NOTIFY_THRESHOLD", 3)
+    monkeypatch.setattr(shop, "ADMIN_NOTIFY_WINDOW", 60)
+    monkeypatch.setattr(shop, "ADMIN_DIGEST_INTERVAL", 0.1)
+    monkeypatch.setattr(shop, "send_message", lambda chat_id, text, **kwargs: sent.append((chat_id, text)))
+    notifier = shop.AdminNotifier()
+    monkeypatch.setattr(shop, "ADMIN_NOTIFIER", notifier)
+    yield notifier, sent
+    # Потік зведень живе далі: дочекаємося, поки він надішле незібране
+    deadline = time.monotonic() + 5
+    while any(digest.counts for digest in notifier._digests.values()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+
+def wait_for(sent, count: int) -> None:
+    deadline = time.monotonic() + 5
+    while len(sent) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_switches_to_digest_after_threshold(notifier):
+    notifier, sent = notifier
+    for n in range(6):
+        notifier.notify("order", f"Замовлення {n}", f"#{n}", 100.0)
+
+    assert [text for _, text in sent] == ["Замовлення 0", "Замовлення 1", "Замовлення 2"]
+    assert (notifier.immediate, notifier.digested) == (3, 3)
+
+    wait_for(sent, 4)
+    digest = sent[3][1]
+    assert "Нові замовлення: 3 на 300.00 грн" in digest
+    assert digest.index("#5") < digest.index("#4") < digest.index("#3")
+    assert notifier.digests_sent == 1
+
+
+def test_urgent_events_bypass_digest(notifier):
+    notifier, sent = notifier
+    for n in range(4):
+        notifier.notify("order", f"Замовлення {n}", f"#{n}", 100.0)
+    notifier.notify("paid", "Оплата", "#0", 100.0)
+
+    assert [text for _, text in sent] == ["Замовлення 0", "Замовлення 1", "Замовлення 2", "Оплата"]
+    assert notifier.digested == 1
+
+
+def test_digest_escapes_user_text(notifier):
+    notifier, sent = notifier
+    for n in range(3):
+        notifier.notify("feedback", "Відгук", "ок")
+    notifier.notify("feedback", "Відгук", "@user: <b>1 & 2</b>")
+
+    wait_for(sent, 4)
+    assert "@user: &lt;b&gt;1 &amp; 2&lt;/b&gt;" in sent[3][1]
+    assert "<b>1" not in sent[3][1]
+
+
+def test_missing_username_falls_back_to_name(notifier, message_update):
+    notifier, sent = notifier
+    for n in range(3):
+        notifier.notify("feedback", "Відгук", "ок")
+    message = message_update(5, "Все <добре>").message
+    message.from_user.username = None
+
+    shop.process_feedback(message, shop.UserState("feedback"))
+
+    wait_for(sent, 5)
+    digest = next(text for _, text in sent if text.startswith("📊"))
+    assert "U5: Все &lt;добре&gt;" in digest
+    assert "@None" not in digest
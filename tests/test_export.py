@@ -0,0 +1,62 @@
+"""Експорт каталогу й замовлень документом через чергу вихідних запитів."""
+
+import pytest
+
+import telegram_shop_bot as shop
+
+
+class FakeOutbox:
+    """Запам'ятовує запити замість надсилання."""
+
+    def __init__(self) -> None:
+        self.jobs = []
+
+    def submit(self, chat_id, func, args=(), kwargs=None, limited=True, callback=None, block=True):
+        self.jobs.append((chat_id, func, args, kwargs or {}))
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    fake = FakeOutbox()
+    monkeypatch.setattr(shop, "OUTBOX", fake)
+    return fake
+
+
+def sent_document(outbox):
+    assert len(outbox.jobs) == 1
+    chat_id, func, args, kwargs = outbox.jobs[0]
+    assert func == shop.bot.send_document
+    assert args[0] == chat_id
+    # Вміст – байти: запит виконається вже після закриття тимчасового файлу
+    assert isinstance(args[1], bytes)
+    return chat_id, args[1].decode("utf-8").splitlines(), kwargs
+
+
+def test_catalog_export_goes_through_outbox(monkeypatch, outbox):
+    items = [shop.CatalogItem(1, "Футболка", 500.0, "Чорна"), shop.CatalogItem(2, "Кружка", 250.5, "")]
+    monkeypatch.setattr(shop, "CATALOG", {item.item_id: item for item in items})
+    monkeypatch.setattr(shop, "_catalog_ids", [1, 2])
+
+    shop.export_catalog(42, "csv")
+
+    chat_id, lines, kwargs = sent_document(outbox)
+    assert chat_id == 42
+    assert lines == ["name;price;description", "Футболка;500.00;Чорна", "Кружка;250.50;"]
+    assert kwargs["visible_file_name"] == "catalog.csv"
+    assert kwargs["caption"] == "📤 Каталог: 2 товарів"
+
+
+def test_orders_export_goes_through_outbox(monkeypatch, outbox, make_order):
+    store = shop.OrderStore()
+    for order_id in (1, 2, 3):
+        store.add(make_order(order_id, user_id=order_id))
+    monkeypatch.setattr(shop, "ORDERS", store)
+    monkeypatch.setattr(shop, "ORDERS_EXPORT_CHUNK", 2)
+
+    shop.export_orders(42, shop.OrderFilter())
+
+    chat_id, lines, kwargs = sent_document(outbox)
+    assert chat_id == 42
+    assert [line.split(";")[0] for line in lines] == ["order_id", "1", "2", "3"]
+    assert kwargs["visible_file_name"] == "orders.csv"
+    assert kwargs["caption"].endswith(": 3")
@@ -0,0 +1,98 @@
+"""Вибір FAQ-відповіді за правилами IntentMatcher."""
+
+import json
+import os
+import time
+
+import pytest
+
+import telegram_shop_bot as shop
+
+
+def test_lower_priority_wins_regardless_of_rule_order():
+    matcher = shop.IntentMatcher([
+        {"intent": "general", "priority": 200, "contains": ["доставк"], "reply": "general"},
+        {"intent": "price", "priority": 10, "contains": ["ціна"], "reply": "price"},
+    ])
+
+    assert matcher.match("Яка ціна доставки?") == "price"
+    assert matcher.match("Як працює доставка?") == "general"
+
+
+def test_priority_applies_to_overlapping_phrases():
+    # "ка" – суфікс "доставка": правило знаходиться через fail-посилання
+    matcher = shop.IntentMatcher([
+        {"intent": "delivery", "priority": 50, "contains": ["доставка"], "reply": "delivery"},
+        {"intent": "suffix", "priority": 5, "contains": ["ка"], "reply": "suffix"},
+    ])
+
+    assert matcher.match("доставка") == "suffix"
+
+
+def test_exact_matches_whole_message_only():
+    matcher = shop.IntentMatcher([
+        {"intent": "hello", "exact": ["привіт"], "reply": "hello"},
+    ])
+
+    assert matcher.match("  ПРИВІТ ") == "hello"
+    assert matcher.match("привіт, а є знижки?") is None
+
+
+def test_exact_and_contains_compete_by_priority():
+    matcher = shop.IntentMatcher([
+        {"intent": "thanks", "priority": 100, "exact": ["дякую"], "reply": "thanks"},
+        {"intent": "contains", "priority": 50, "contains": ["дяку"], "reply": "contains"},
+        {"intent": "menu", "priority": 10, "exact": ["меню"], "reply": "menu"},
+        {"intent": "broad", "priority": 90, "contains": ["мен"], "reply": "broad"},
+    ])
+
+    assert matcher.match("дякую") == "contains"
+    assert matcher.match("меню") == "menu"
+    assert matcher.match("покажи меню") == "broad"
+
+
+def test_default_priority_and_no_match():
+    matcher = shop.IntentMatcher([
+        {"intent": "default", "contains": ["оплат"], "reply": "default"},
+        {"intent": "explicit", "priority": 100, "contains": ["карт"], "reply": "explicit"},
+    ])
+
+    # Однаковий priority – перемагає правило, що стоїть раніше
+    assert matcher.match("оплата карткою") == "default"
+    assert matcher.match("що нового?") is None
+
+
+@pytest.mark.parametrize("rule", [
+    {"intent": "no_phrases", "reply": "x"},
+    {"intent": "no_reply", "contains": ["x"]},
+])
+def test_invalid_rule_is_rejected(rule):
+    with pytest.raises(ValueError):
+        shop.IntentMatcher([rule])
+
+
+@pytest.mark.parametrize("rules", [
+    {"intent": "not_a_list", "contains": ["x"], "reply": "x"},
+    ["oops"],
+    [{"intent": "string_contains", "contains": "доставк", "reply": "x"}],
+    [{"intent": "string_exact", "exact": "привіт", "reply": "x"}],
+    [{"intent": "number_phrase", "contains": [5], "reply": "x"}],
+    [{"intent": "empty_phrase", "contains": [" "], "reply": "x"}],
+    [{"intent": "bad_priority", "priority": "high", "contains": ["x"], "reply": "x"}],
+])
+def test_malformed_rules_raise_value_error(rules):
+    with pytest.raises(ValueError):
+        shop.IntentMatcher(rules)
+
+
+def test_broken_file_keeps_previous_rules(tmp_path):
+    path = tmp_path / "faq.json"
+    path.write_text(json.dumps([{"intent": "a", "contains": ["доставк"], "reply": "доставка"}]), encoding="utf-8")
+    rules = shop.FaqRules(str(path), reload_interval=0)
+    assert rules.match("Яка доставка?") == "доставка"
+
+    for broken in ('[{"contains": [5], "reply": "x"}]', '["oops"]', "{не json"):
+        path.write_text(broken, encoding="utf-8")
+        os.utime(path, (time.time() + 1, time.time() + 1))
+        assert rules.match("Яка доставка?") == "доставка"
+        assert rules.match("привіт") is None
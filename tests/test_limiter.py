@@ -0,0 +1,145 @@
+"""Пріоритети оновлень і рішення UpdateLimiter під навантаженням."""
+
+import time
+
+import pytest
+
+import telegram_shop_bot as shop
+
+ADMIN_ID = next(iter(shop.ADMIN_IDS))
+
+
+class FakeOutbox:
+    """Запам'ятовує відповіді користувачам замість викликів Telegram API."""
+
+    def __init__(self) -> None:
+        self.sent = []
+        self.blocking = []
+
+    def submit(self, chat_id, func, args=(), kwargs=None, limited=True, callback=None, block=True):
+        kind = "answer" if func == shop.bot.answer_callback_query else "message"
+        self.sent.append((kind, args[1]))
+        self.blocking.append(block)
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    fake = FakeOutbox()
+    monkeypatch.setattr(shop, "OUTBOX", fake)
+    return fake
+
+
+@pytest.fixture
+def notices(outbox):
+    return outbox.sent
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    """Налаштувати ліміти до створення UpdateLimiter (відра читають їх при створенні)."""
+
+    def configure(rate: float = 0, burst: int = 10, shed: int = 0, global_rate: float = 0) -> shop.UpdateLimiter:
+        monkeypatch.setattr(shop, "USER_UPDATE_RATE", rate)
+        monkeypatch.setattr(shop, "USER_UPDATE_BURST", burst)
+        monkeypatch.setattr(shop, "SHED_BACKLOG", shed)
+        monkeypatch.setattr(shop, "GLOBAL_UPDATE_RATE", global_rate)
+        return shop.UpdateLimiter()
+
+    return configure
+
+
+def test_update_priority(message_update, callback_update):
+    assert shop.update_priority(callback_update(1, "confirm:5")) == shop.PRIORITY_HIGH
+    assert shop.update_priority(callback_update(1, "pay_ok:5")) == shop.PRIORITY_HIGH
+    assert shop.update_priority(callback_update(1, "buy:5")) == shop.PRIORITY_NORMAL
+    assert shop.update_priority(message_update(1, "/start")) == shop.PRIORITY_NORMAL
+    assert shop.update_priority(message_update(1, "коли доставка?")) == shop.PRIORITY_LOW
+
+
+def test_text_in_dialog_mode_is_normal(monkeypatch, message_update):
+    monkeypatch.setattr(shop, "USER_STATE", shop.UserStateStore(60, 100, lambda user_id: None))
+    shop.USER_STATE.get(5).mode = "feedback"
+
+    assert shop.update_priority(message_update(5, "все сподобалось")) == shop.PRIORITY_NORMAL
+
+
+def test_user_burst_then_throttled(limits, notices, callback_update):
+    limiter = limits(rate=0.001, burst=3)
+
+    assert [limiter.admit(callback_update(7, "buy:1"), 0) for _ in range(4)] == [True, True, True, False]
+    assert limiter.rejected == {("user_limit", shop.PRIORITY_NORMAL): 1}
+    assert notices == [("answer", shop.THROTTLE_TEXT)]
+    # Ліміт окремий для кожного користувача
+    assert limiter.admit(callback_update(8, "buy:1"), 0)
+
+
+def test_throttled_text_notice_is_sent_once(limits, notices, message_update):
+    limiter = limits(rate=0.001, burst=1)
+
+    results = [limiter.admit(message_update(7, "привіт"), 0) for _ in range(4)]
+
+    assert results == [True, False, False, False]
+    assert notices == [("message", shop.THROTTLE_TEXT)]
+    assert limiter.rejected == {("user_limit", shop.PRIORITY_LOW): 3}
+
+
+def test_high_priority_and_admins_skip_user_limit(limits, notices, callback_update):
+    limiter = limits(rate=0.001, burst=1)
+
+    assert all(limiter.admit(callback_update(7, f"pay_ok:{i}"), 0) for i in range(5))
+    assert all(limiter.admit(callback_update(ADMIN_ID, "buy:1"), 0) for _ in range(5))
+    assert limiter.rejected == {}
+    assert notices == []
+
+
+def test_overload_sheds_low_before_normal(limits, notices, message_update, callback_update):
+    limiter = limits(shed=10)
+
+    assert limiter.admit(message_update(7, "привіт"), 9)
+    assert not limiter.admit(message_update(7, "привіт"), 10)
+    assert limiter.admit(message_update(7, "/orders"), 10)
+    assert limiter.admit(message_update(7, "/orders"), 19)
+    assert not limiter.admit(message_update(7, "/orders"), 20)
+    assert not limiter.admit(callback_update(7, "buy:1"), 20)
+    assert limiter.admit(callback_update(7, "confirm:1"), 10_000)
+
+    assert limiter.rejected == {
+        ("overload", shop.PRIORITY_LOW): 1,
+        ("overload", shop.PRIORITY_NORMAL): 2,
+    }
+    # Про перевантаження повідомляємо лише на кнопки
+    assert notices == [("answer", shop.OVERLOAD_TEXT)]
+
+
+def test_global_bucket_keeps_reserve_for_normal(limits, notices, message_update):
+    limiter = limits(global_rate=4)  # запас 4 токени, низькому пріоритету – верхня половина
+
+    low = [limiter.admit(message_update(7, "привіт"), 0) for _ in range(3)]
+    normal = [limiter.admit(message_update(7, "/start"), 0) for _ in range(3)]
+
+    assert low == [True, True, False]
+    assert normal == [True, True, False]
+
+
+def test_notices_never_block_intake(limits, outbox, message_update, callback_update):
+    limiter = limits(rate=0.001, burst=1, shed=10)
+    limiter.admit(message_update(7, "привіт"), 0)
+
+    assert not limiter.admit(message_update(7, "привіт"), 0)
+    assert not limiter.admit(callback_update(8, "buy:1"), 100)
+    assert len(outbox.sent) == 2
+    assert outbox.blocking == [False, False]
+
+
+def test_full_outbox_drops_non_blocking_request_at_once(monkeypatch):
+    monkeypatch.setattr(shop, "OUTBOX_QUEUE_SIZE", 1)
+    monkeypatch.setattr(shop, "OUTBOX_PUT_TIMEOUT", 5)
+    monkeypatch.setattr(shop._OutboxWorker, "start", lambda self: None)  # черга ніким не розбирається
+    outbox = shop.Outbox(1)
+    outbox.submit(1, print, ("перший",))
+
+    started = time.monotonic()
+    outbox.submit(1, print, ("другий",), block=False)
+
+    assert time.monotonic() - started < 1
+    assert outbox.depth() == 1
@@ -0,0 +1,151 @@
+"""Статуси замовлень, повторні callback-и та вибірка замовлень для адміністратора."""
+
+import time
+
+import telegram_shop_bot as shop
+
+from conftest import BASE_TS
+
+
+# ---- Переходи статусів ----
+
+def test_confirm_twice_is_rejected(make_order):
+    store = shop.OrderStore()
+    order = make_order(1)
+    store.add(order)
+
+    assert store.transition(order, "confirm")
+    assert not store.transition(order, "confirm")
+    assert order.status == "waiting_payment"
+    assert order.version == 1
+
+
+def test_cancel_after_paid_is_rejected(make_order):
+    store = shop.OrderStore()
+    order = make_order(1)
+    store.add(order)
+    assert store.transition(order, "confirm")
+    assert store.transition(order, "pay_ok")
+
+    assert not store.transition(order, "cancel")
+    assert not store.transition(order, "pay_cancel")
+    assert order.status == "paid"
+    assert store.count_by_status() == {"paid": 1}
+
+
+def test_every_transition_requires_its_source_status(make_order):
+    for action, (source, target) in shop.ORDER_TRANSITIONS.items():
+        for status in shop.ORDER_STATUSES:
+            store = shop.OrderStore()
+            order = make_order(1, status=status)
+            store.add(order)
+            assert store.transition(order, action) == (status == source), (action, status)
+            assert order.status == (target if status == source else status)
+
+
+def test_transition_updates_status_index(make_order):
+    store = shop.OrderStore()
+    first, second = make_order(1), make_order(2)
+    store.add(first)
+    store.add(second)
+
+    store.transition(first, "cancel")
+
+    assert [o.order_id for o in store.with_status("pending")] == [2]
+    assert [o.order_id for o in store.with_status("cancelled")] == [1]
+
+
+# ---- Повторні callback-и ----
+
+def test_seen_callbacks_reports_repeated_id():
+    seen = shop.SeenCallbacks(ttl=60)
+
+    assert not seen.check_and_add("a")
+    assert seen.check_and_add("a")
+    assert not seen.check_and_add("b")
+
+
+def test_seen_callbacks_forgets_after_ttl():
+    seen = shop.SeenCallbacks(ttl=0.05)
+    seen.check_and_add("a")
+    time.sleep(0.1)
+
+    assert not seen.check_and_add("a")
+
+
+def test_route_callback_handles_repeated_delivery_once(monkeypatch, callback_update):
+    handled = []
+    monkeypatch.setitem(shop.CALLBACK_ROUTES, "probe", (lambda call, arg: handled.append(arg), None))
+    call = callback_update(7, "probe:42", call_id="dup-1").callback_query
+
+    shop.route_callback(call)
+    shop.route_callback(call)
+
+    assert handled == ["42"]
+
+
+# ---- Вибірка з курсорами та фільтрами ----
+
+def _store(make_order, count: int = 25) -> shop.OrderStore:
+    store = shop.OrderStore()
+    for order_id in range(1, count + 1):
+        store.add(make_order(order_id, user_id=100 + order_id % 2))
+    return store
+
+
+def _ids(orders):
+    return [o.order_id for o in orders]
+
+
+def test_select_pages_with_before_cursor(make_order):
+    store = _store(make_order)
+    flt = shop.OrderFilter()
+
+    page, more = store.select(flt, 10)
+    assert _ids(page) == list(range(25, 15, -1)) and more
+
+    page, more = store.select(flt, 10, before=page[-1].order_id)
+    assert _ids(page) == list(range(15, 5, -1)) and more
+
+    page, more = store.select(flt, 10, before=page[-1].order_id)
+    assert _ids(page) == list(range(5, 0, -1)) and not more
+
+
+def test_select_pages_back_with_after_cursor(make_order):
+    store = _store(make_order)
+    flt = shop.OrderFilter()
+
+    page, more = store.select(flt, 10, after=5)
+    assert _ids(page) == list(range(15, 5, -1)) and more
+
+    page, more = store.select(flt, 10, after=15)
+    assert _ids(page) == list(range(25, 15, -1)) and not more
+
+
+def test_select_date_range_is_half_open(make_order):
+    store = _store(make_order)
+    flt = shop.OrderFilter(since_ts=BASE_TS + 10 * 60, until_ts=BASE_TS + 20 * 60)
+
+    page, more = store.select(flt, 50)
+
+    assert _ids(page) == list(range(19, 9, -1)) and not more
+
+
+def test_select_combines_status_user_and_cursor(make_order):
+    store = _store(make_order)
+    for order_id in (4, 6, 7, 10, 12):
+        store.transition(store.get(order_id), "confirm")
+    flt = shop.OrderFilter(status="waiting_payment", user_id=100)
+
+    page, more = store.select(flt, 2)
+    assert _ids(page) == [12, 10] and more
+
+    page, more = store.select(flt, 2, before=10)
+    assert _ids(page) == [6, 4] and not more
+
+
+def test_select_empty_range(make_order):
+    store = _store(make_order)
+
+    assert store.select(shop.OrderFilter(since_ts=BASE_TS + 10_000), 10) == ([], False)
+    assert store.select(shop.OrderFilter(), 10, before=1) == ([], False)
@@ -0,0 +1,109 @@
+"""Ліміти черги вихідних повідомлень."""
+
+import asyncio
+import time
+
+import telegram_shop_bot as shop
+
+
+class GlobalLimit:
+    """Спільне відро Outbox без потоків-відправників."""
+
+    def __init__(self, rate: float) -> None:
+        self.bucket = shop.TokenBucket(rate, rate)
+        self.sent = []
+
+    def take_global(self, now: float) -> float:
+        return self.bucket.take(now)
+
+    def execute(self, job):
+        self.sent.append(job.args)
+        return None
+
+
+def test_waiting_chat_does_not_spend_global_tokens(monkeypatch):
+    monkeypatch.setattr(shop, "OUTBOX_CHAT_RATE", 0.001)
+    monkeypatch.setattr(shop, "OUTBOX_CHAT_BURST", 1)
+    outbox = GlobalLimit(rate=2)
+    worker = shop._OutboxWorker(outbox, 0)  # не запускаємо: кроки викликаються вручну
+    for n in range(5):
+        worker._accept(1, shop._OutboxJob(None, ("busy", n), {}, limited=True))
+    worker._accept(2, shop._OutboxJob(None, ("other", 0), {}, limited=True))
+
+    now = time.monotonic()
+    for _ in range(5):
+        worker._send_next(1, now)  # перший надсилається, решта чекає на ліміт чату
+    worker._send_next(2, now)
+
+    assert outbox.sent == [("busy", 0), ("other", 0)]
+
+
+def test_unlimited_jobs_skip_buckets(monkeypatch):
+    monkeypatch.setattr(shop, "OUTBOX_CHAT_BURST", 1)
+    outbox = GlobalLimit(rate=1)
+    worker = shop._OutboxWorker(outbox, 0)
+    for n in range(3):
+        worker._accept(1, shop._OutboxJob(None, ("inline", n), {}, limited=False))
+
+    now = time.monotonic()
+    for _ in range(3):
+        worker._send_next(1, now)
+
+    assert outbox.sent == [("inline", 0), ("inline", 1), ("inline", 2)]
+    assert outbox.bucket.tokens == 1
+
+
+def send_message(*args, **kwargs):
+    """Метод синхронного бота: AsyncOutbox викликає однойменний метод асинхронного."""
+
+
+class FakeAsyncBot:
+    def __init__(self) -> None:
+        self.sent = []
+        self.webhook_calls = 0
+        self.polled = asyncio.Event()
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+    async def delete_webhook(self, drop_pending_updates=False):
+        self.webhook_calls += 1
+        if self.webhook_calls == 1:
+            raise ConnectionError("мережа ще недоступна")
+
+    async def get_updates(self, **kwargs):
+        self.polled.set()
+        await asyncio.sleep(0.05)
+        return []
+
+
+def test_async_waiting_chat_does_not_spend_global_tokens(monkeypatch):
+    monkeypatch.setattr(shop, "OUTBOX_CHAT_RATE", 0.001)
+    monkeypatch.setattr(shop, "OUTBOX_CHAT_BURST", 1)
+    monkeypatch.setattr(shop, "OUTBOX_GLOBAL_RATE", 2)
+
+    async def run():
+        outbox = shop.AsyncOutbox()
+        async_bot = FakeAsyncBot()
+        outbox.start(asyncio.get_running_loop(), async_bot)
+        for n in range(3):
+            outbox.submit(1, send_message, (1, f"busy {n}"))
+        await asyncio.sleep(0.05)  # чат 1 уже чекає на свій ліміт
+        outbox.submit(2, send_message, (2, "other"))
+        await asyncio.sleep(0.05)
+        return async_bot.sent
+
+    assert asyncio.run(run()) == [(1, "busy 0"), (2, "other")]
+
+
+def test_async_polling_retries_webhook_removal():
+    async def run():
+        async_bot = FakeAsyncBot()
+        poller = asyncio.ensure_future(shop._poll_updates(async_bot))
+        try:
+            await asyncio.wait_for(async_bot.polled.wait(), timeout=5)
+        finally:
+            poller.cancel()
+        return async_bot.webhook_calls
+
+    assert asyncio.run(run()) == 2
@@ -0,0 +1,108 @@
+"""Автоматичне скасування замовлень, що чекають підтвердження або оплати."""
+
+import threading
+import time
+
+import pytest
+
+import telegram_shop_bot as shop
+
+TTL = 0.05
+
+
+class FakeOutbox:
+    """Запам'ятовує редагування повідомлень замість викликів Telegram API."""
+
+    def __init__(self) -> None:
+        self.edits = []
+
+    def submit(self, chat_id, func, args=(), kwargs=None, limited=True, callback=None, block=True):
+        self.edits.append((chat_id, kwargs["message_id"], args[0]))
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    """Короткі терміни, порожні замовлення і завантажені дані."""
+    fake = FakeOutbox()
+    monkeypatch.setattr(shop, "OUTBOX", fake)
+    monkeypatch.setattr(shop, "ORDERS", shop.OrderStore())
+    monkeypatch.setattr(shop, "ORDER_EXPIRY", {
+        "pending": ("cancel", TTL, "час на підтвердження"),
+        "waiting_payment": ("pay_cancel", 2 * TTL, "час на оплату"),
+    })
+    loaded = threading.Event()
+    loaded.set()
+    monkeypatch.setattr(shop, "DATA_LOADED", loaded)
+    return fake
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_pending_order_expires_and_buttons_are_removed(outbox, make_order):
+    reaper = shop.OrderReaper()
+    order = make_order(1, user_id=7)
+    shop.ORDERS.add(order)
+    reaper.schedule(order, chat_id=7, message_id=70)
+
+    # Лічильник зростає раніше, ніж редагування стає в чергу
+    assert wait_for(lambda: outbox.edits)
+    assert reaper.expired == 1
+    assert order.status == "cancelled"
+    assert len(outbox.edits) == 1
+    chat_id, message_id, text = outbox.edits[0]
+    assert (chat_id, message_id) == (7, 70)
+    assert "час на підтвердження" in text
+
+
+def test_confirmed_order_gets_payment_deadline(outbox, make_order):
+    reaper = shop.OrderReaper()
+    order = make_order(1)
+    shop.ORDERS.add(order)
+    reaper.schedule(order)
+    assert shop.apply_order_action(order, "confirm")
+    reaper.schedule(order)
+
+    # Запис для pending застарів разом зі статусом, замовлення чекає оплати
+    time.sleep(TTL * 1.5)
+    assert order.status == "waiting_payment"
+    assert reaper.expired == 0
+
+    assert wait_for(lambda: reaper.expired == 1)
+    assert order.status == "cancelled"
+    assert order.confirmed
+    assert outbox.edits == []
+
+
+def test_order_advanced_before_deadline_is_kept(outbox, make_order):
+    reaper = shop.OrderReaper()
+    paid = make_order(1)
+    cancelled = make_order(2)
+    for order in (paid, cancelled):
+        shop.ORDERS.add(order)
+        reaper.schedule(order)
+    assert shop.apply_order_action(paid, "confirm")
+    assert shop.apply_order_action(paid, "pay_ok")
+    assert shop.apply_order_action(cancelled, "cancel")
+
+    time.sleep(TTL * 3)
+    assert reaper.expired == 0
+    assert (paid.status, cancelled.status) == ("paid", "cancelled")
+
+
+def test_loaded_orders_expire_from_creation_time(outbox, make_order):
+    # Створене давно чекає підтвердження, щойно створене – ще ні
+    old = make_order(1)
+    fresh = make_order(2, created_ts=int(time.time()) + 60)
+    for order in (old, fresh):
+        shop.ORDERS.add(order)
+
+    reaper = shop.OrderReaper()
+    assert wait_for(lambda: reaper.expired == 1)
+    assert (old.status, fresh.status) == ("cancelled", "pending")
@@ -0,0 +1,78 @@
+"""Пошук товарів: сторінки індексу, /search та inline-запити."""
+
+import telebot
+import pytest
+
+import telegram_shop_bot as shop
+
+
+class FakeOutbox:
+    """Запам'ятовує запити замість надсилання."""
+
+    def __init__(self) -> None:
+        self.jobs = []
+
+    def submit(self, chat_id, func, args=(), kwargs=None, limited=True, callback=None):
+        self.jobs.append((chat_id, func, args, kwargs or {}))
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    """Каталог із 12 товарів у свіжих структурах."""
+    monkeypatch.setattr(shop, "CATALOG", {})
+    monkeypatch.setattr(shop, "_catalog_ids", [])
+    monkeypatch.setattr(shop, "_catalog_pages", {})
+    monkeypatch.setattr(shop, "_item_versions", {})
+    monkeypatch.setattr(shop, "SEARCH_INDEX", shop.SearchIndex())
+    monkeypatch.setattr(shop, "STORAGE", shop.StorageBackend())
+    for item_id in range(12, 0, -1):
+        name = "Футболка" if item_id % 2 else "Кружка"
+        shop.add_catalog_item(shop.CatalogItem(item_id, f"{name} {item_id}", 100.0, "Бавовна"))
+
+
+def test_search_pages_stop_after_last_match(catalog):
+    index = shop.SEARCH_INDEX
+
+    assert index.search("футб", 0, 4) == ([1, 3, 5, 7], True)
+    assert index.search("футб", 4, 4) == ([9, 11], False)
+    assert index.search("футболк бавовн", 0, 10) == ([1, 3, 5, 7, 9, 11], False)
+    assert index.search("футболка кружка", 0, 10) == ([], False)
+    assert index.search("", 0, 10) == ([], False)
+
+
+def test_search_follows_catalog_changes(catalog):
+    shop.remove_catalog_item(3)
+    shop.add_catalog_item(shop.CatalogItem(5, "Шапка", 100.0, ""))
+
+    assert shop.SEARCH_INDEX.search("футболка", 0, 10) == ([1, 7, 9, 11], False)
+    assert shop.SEARCH_INDEX.search("шапка", 0, 10) == ([5], False)
+
+
+def test_search_query_is_escaped_for_html(monkeypatch, catalog):
+    sent = []
+    monkeypatch.setattr(shop, "send_message", lambda chat_id, text, **kwargs: sent.append(text))
+
+    shop.show_search_results(1, shop.UserState(), "<b a&b")
+    shop.show_search_results(1, shop.UserState(), "кружка <i>")
+
+    assert "«&lt;b a&amp;b»" in sent[0]
+    assert "«кружка &lt;i&gt;»" in sent[1]
+
+
+def test_empty_inline_query_pages_catalog_in_id_order(monkeypatch, catalog):
+    outbox = FakeOutbox()
+    monkeypatch.setattr(shop, "OUTBOX", outbox)
+    monkeypatch.setattr(shop, "bot_username", lambda: "shop_bot")
+    monkeypatch.setattr(shop, "INLINE_PAGE_SIZE", 5)
+
+    def ask(offset: str):
+        query = telebot.types.InlineQuery.de_json({
+            "id": "q", "from": {"id": 7, "is_bot": False, "first_name": "U"}, "query": "", "offset": offset,
+        })
+        shop.handle_inline_query(query)
+        (query_id, results), kwargs = outbox.jobs[-1][2], outbox.jobs[-1][3]
+        return [int(result.id) for result in results], kwargs["next_offset"]
+
+    assert ask("") == ([1, 2, 3, 4, 5], "5")
+    assert ask("5") == ([6, 7, 8, 9, 10], "10")
+    assert ask("10") == ([11, 12], "")
@@ -0,0 +1,36 @@
+"""Спільне SQLite-сховище кількох процесів: видача ID і часу створення."""
+
+import pytest
+
+import telegram_shop_bot as shop
+
+
+@pytest.fixture
+def processes(tmp_path):
+    """Два екземпляри сховища над однією базою, як у двох процесах."""
+    path = str(tmp_path / "shop.db")
+    storages = [shop.SharedSQLiteStorage(path, 0.01, 100) for _ in range(2)]
+    yield storages
+    for storage in storages:
+        storage.close()
+
+
+def test_order_stamps_increase_across_processes(processes):
+    first, second = processes
+    # Годинник другого процесу відстає: час усе одно не зменшується
+    stamps = [
+        first.next_order_stamp(1000),
+        second.next_order_stamp(990),
+        first.next_order_stamp(1005),
+        second.next_order_stamp(1010),
+    ]
+    assert [order_id for order_id, _ in stamps] == [1, 2, 3, 4]
+    assert [created_ts for _, created_ts in stamps] == [1000, 1000, 1005, 1010]
+    assert [first.next_id("next_item_id"), second.next_id("next_item_id")] == [1, 2]
+
+
+def test_id_commits_skip_fsync(processes):
+    storage = processes[0]
+    # 1 – NORMAL (без fsync на коміт), 2 – FULL
+    assert storage._read_conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert storage._conn.execute("PRAGMA synchronous").fetchone()[0] == 2
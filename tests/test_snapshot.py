@@ -0,0 +1,52 @@
+"""Запис і читання бінарного знімка стану."""
+
+import dataclasses
+
+import telegram_shop_bot as shop
+
+
+def test_snapshot_round_trip(tmp_path, make_order):
+    items = [
+        shop.CatalogItem(3, "Кружка", 250.0, "Кераміка, 350 мл"),
+        shop.CatalogItem(1, "Футболка", 500.5, ""),
+    ]
+    orders = [make_order(2, user_id=7, status="paid"), make_order(1, user_id=8)]
+    orders[1].username = None
+    states = [(7, "feedback"), (9, "admin_add_item")]
+    path = str(tmp_path / "state.snapshot")
+
+    shop.Snapshot.write(path, 42, list(items), list(orders), states)
+    snap = shop.Snapshot(path)
+    try:
+        assert snap.change_seq == 42
+        assert (snap.item_count, snap.order_count, snap.state_count) == (2, 2, 2)
+
+        assert [snap.item(i) for i in range(snap.item_count)] == sorted(items, key=lambda i: i.item_id)
+        for i, expected in enumerate(sorted(orders, key=lambda o: o.order_id)):
+            loaded = snap.order(i)
+            assert loaded.status == expected.status
+            assert loaded == dataclasses.replace(expected, version=0)
+
+        assert snap.find_item(3).name == "Кружка"
+        assert snap.find_item(2) is None
+        assert snap.find_order(2).status == "paid"
+        assert snap.find_order(1).username is None
+        assert snap.find_order(99) is None
+        assert list(snap.states()) == states
+    finally:
+        snap.close()
+
+
+def test_snapshot_replaces_previous_file(tmp_path):
+    path = str(tmp_path / "state.snapshot")
+    shop.Snapshot.write(path, 1, [shop.CatalogItem(1, "Стара", 1.0, "")], [], [])
+    shop.Snapshot.write(path, 2, [], [], [])
+
+    snap = shop.Snapshot(path)
+    try:
+        assert snap.change_seq == 2
+        assert snap.item_count == 0
+        assert snap.find_item(1) is None
+    finally:
+        snap.close()
+    assert [p.name for p in tmp_path.iterdir()] == ["state.snapshot"]
@@ -0,0 +1,88 @@
+"""Підсумки продажів: оновлення разом із замовленнями і відновлення після перезапуску."""
+
+import sqlite3
+
+import pytest
+
+import telegram_shop_bot as shop
+
+
+@pytest.fixture
+def orders(make_order):
+    """Замовлення в усіх кінцевих станах, зокрема скасоване після підтвердження."""
+    store = shop.OrderStore()
+    placed = [make_order(order_id, user_id=order_id) for order_id in range(1, 5)]
+    for order in placed:
+        order.item_id = order.order_id
+        order.price = 100.0 * order.order_id
+        store.add(order)
+    assert store.transition(placed[0], "confirm") and store.transition(placed[0], "pay_ok")
+    assert store.transition(placed[1], "confirm") and store.transition(placed[1], "pay_cancel")
+    assert store.transition(placed[2], "cancel")
+    return store
+
+
+def totals(store: shop.OrderStore):
+    stats = store.stats
+    return stats.created, stats.confirmed, stats.paid, stats.revenue, stats.top
+
+
+def rebuild(orders) -> shop.OrderStore:
+    store = shop.OrderStore()
+    for order in orders:
+        store.add(order)
+    return store
+
+
+def test_counters_follow_transitions(orders):
+    assert totals(orders) == (4, 2, 1, 100.0, [1])
+    assert [o.confirmed for o in sorted(orders.all(), key=lambda o: o.order_id)] == [True, True, False, False]
+
+
+def test_rebuild_from_sqlite_is_exact(tmp_path, orders):
+    storage = shop.SQLiteStorage(str(tmp_path / "shop.db"), 0.01, 100)
+    try:
+        for order in orders.all():
+            storage.save_order(order)
+        _, loaded, _, _ = storage.load()
+    finally:
+        storage.close()
+
+    assert totals(rebuild(loaded)) == totals(orders)
+
+
+def test_rebuild_from_snapshot_is_exact(tmp_path, orders):
+    path = str(tmp_path / "state.snapshot")
+    shop.Snapshot.write(path, 1, [], orders.all(), [])
+    snap = shop.Snapshot(path)
+    try:
+        loaded = [snap.order(i) for i in range(snap.order_count)]
+    finally:
+        snap.close()
+
+    assert totals(rebuild(loaded)) == totals(orders)
+
+
+def test_old_database_gets_confirmed_column(tmp_path):
+    path = str(tmp_path / "shop.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE orders (order_id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, username TEXT, "
+        "full_name TEXT NOT NULL, item_id INTEGER NOT NULL, item_name TEXT NOT NULL, "
+        "item_price REAL NOT NULL, created_at INTEGER NOT NULL, status TEXT NOT NULL)"
+    )
+    for order_id, status in enumerate(("pending", "waiting_payment", "paid", "cancelled"), 1):
+        conn.execute(
+            "INSERT INTO orders VALUES (?, 1, NULL, 'Покупець', 1, 'Товар', 10.0, 0, ?)", (order_id, status)
+        )
+    conn.commit()
+    conn.close()
+
+    storage = shop.SQLiteStorage(path, 0.01, 100)
+    try:
+        _, loaded, _, _ = storage.load()
+    finally:
+        storage.close()
+
+    assert [o.confirmed for o in loaded] == [False, True, True, False]
+    assert totals(rebuild(loaded))[:3] == (4, 2, 1)
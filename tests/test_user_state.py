@@ -0,0 +1,87 @@
+"""Обмеження станів користувачів за часом простою (TTL) і кількістю (LRU)."""
+
+import time
+
+import telegram_shop_bot as shop
+
+
+def _store(ttl: float = 60, max_users: int = 100):
+    forgotten = []
+    return shop.UserStateStore(ttl, max_users, forgotten.append), forgotten
+
+
+def test_state_is_kept_within_ttl():
+    store, forgotten = _store()
+    store.get(1).mode = "feedback"
+
+    assert store.get(1).mode == "feedback"
+    assert forgotten == []
+
+
+def test_idle_state_expires_and_reports_mode():
+    store, forgotten = _store(ttl=0.05)
+    store.get(1).mode = "feedback"
+    time.sleep(0.1)
+
+    state = store.get(1)
+
+    assert state.mode is None
+    assert state.expired == "feedback"
+    assert forgotten == [1]
+
+
+def test_idle_states_of_other_users_are_pruned():
+    store, forgotten = _store(ttl=0.05)
+    for user_id in (1, 2, 3):
+        store.get(user_id).mode = "feedback"
+    time.sleep(0.1)
+
+    store.get(4)
+
+    assert len(store) == 1
+    assert sorted(forgotten) == [1, 2, 3]
+    assert store.get(2).expired == "feedback"
+
+
+def test_state_without_mode_expires_silently():
+    store, forgotten = _store(ttl=0.05)
+    store.get(1)
+    time.sleep(0.1)
+
+    assert store.get(1).expired is None
+    assert forgotten == []
+
+
+def test_least_recently_used_is_evicted():
+    store, forgotten = _store(max_users=2)
+    store.get(1).mode = "feedback"
+    store.get(2).mode = "feedback"
+    store.get(1)  # 2 тепер найдавніший
+
+    store.get(3)
+
+    assert len(store) == 2
+    assert forgotten == [2]
+    assert store.peek_mode(1) == "feedback"
+    assert store.peek_mode(2) is None
+
+
+def test_restore_respects_max_users():
+    store, forgotten = _store(max_users=2)
+    for user_id in (1, 2, 3):
+        store.restore(user_id, "feedback")
+
+    assert len(store) == 2
+    assert sorted(user_id for user_id, _ in store.modes()) == [2, 3]
+    assert forgotten == [1]
+
+
+def test_discard_expired_drops_notice():
+    store, _ = _store(ttl=0.05)
+    store.get(1).mode = "feedback"
+    time.sleep(0.1)
+    store.get(2)  # прибирає простояний запис користувача 1
+
+    store.discard_expired(1)
+
+    assert store.get(1).expired is None
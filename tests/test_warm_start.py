@@ -0,0 +1,119 @@
+"""Старт зі знімка: зміни після знімка, фонове довантаження і порядок каталогу."""
+
+import threading
+import time
+
+import pytest
+
+import telegram_shop_bot as shop
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    """SQLite-сховище з журналом змін і порожні кеші в пам'яті, як після запуску."""
+    store = shop.SQLiteStorage(str(tmp_path / "shop.db"), 0.01, 100, log_changes=True)
+    monkeypatch.setattr(shop, "STORAGE", store)
+    monkeypatch.setattr(shop, "SNAPSHOT_PATH", str(tmp_path / "state.snapshot"))
+    monkeypatch.setattr(shop, "SNAPSHOT_LOAD_CHUNK", 3)
+    restart(monkeypatch)
+    yield store
+    shop.DATA_LOADED.wait(5)
+    store.close()
+
+
+def restart(monkeypatch) -> None:
+    """Скинути стан процесу в пам'яті; сховище й файл знімка лишаються."""
+    monkeypatch.setattr(shop, "CATALOG", {})
+    monkeypatch.setattr(shop, "_catalog_ids", [])
+    monkeypatch.setattr(shop, "_catalog_pages", {})
+    monkeypatch.setattr(shop, "_item_versions", {})
+    monkeypatch.setattr(shop, "SEARCH_INDEX", shop.SearchIndex())
+    monkeypatch.setattr(shop, "ORDERS", shop.OrderStore())
+    monkeypatch.setattr(shop, "USER_STATE", shop.UserStateStore(60, 100, lambda user_id: None))
+    monkeypatch.setattr(shop, "_loading_snapshot", None)
+    monkeypatch.setattr(shop, "_snapshot_skip_items", set())
+    monkeypatch.setattr(shop, "DATA_LOADED", threading.Event())
+
+
+def paused_hydration(monkeypatch) -> threading.Event:
+    """Притримати фонове довантаження знімка до встановлення події."""
+    release = threading.Event()
+    hydrate = shop._hydrate_from_snapshot
+
+    def delayed(snapshot):
+        release.wait(5)
+        hydrate(snapshot)
+
+    monkeypatch.setattr(shop, "_hydrate_from_snapshot", delayed)
+    return release
+
+
+def item(item_id: int, name: str = "") -> shop.CatalogItem:
+    return shop.CatalogItem(item_id, name or f"Товар {item_id}", float(100 + item_id), "")
+
+
+def test_tail_changes_are_replayed_over_snapshot(monkeypatch, storage, make_order):
+    shop.add_catalog_items([item(i) for i in range(1, 6)])
+    for order_id in (1, 2):
+        shop.add_order(make_order(order_id, user_id=10))
+    storage.flush()
+    shop.write_snapshot()
+
+    # Зміни після знімка: лише в журналі changes
+    shop.add_catalog_item(item(6))
+    shop.add_catalog_item(item(2, "Нова назва"))
+    shop.remove_catalog_item(4)
+    shop.apply_order_action(shop.ORDERS.get(1), "confirm")
+    shop.add_order(make_order(3, user_id=11))
+    storage.flush()
+
+    restart(monkeypatch)
+    counters = shop.load_snapshot_async()
+    assert counters is not None
+    assert shop.DATA_LOADED.wait(5)
+
+    assert shop._catalog_ids == [1, 2, 3, 5, 6]
+    assert sorted(shop.CATALOG) == [1, 2, 3, 5, 6]
+    assert shop.find_item(2).name == "Нова назва"
+    assert shop.find_item(4) is None
+    assert shop.SEARCH_INDEX.search("нова", 0, 10) == ([2], False)
+    assert {o.order_id: o.status for o in shop.ORDERS.all()} == {1: "waiting_payment", 2: "pending", 3: "pending"}
+
+
+def test_lookups_during_hydration_keep_catalog_order(monkeypatch, storage):
+    shop.add_catalog_items([item(i) for i in range(1, 11)])
+    storage.flush()
+    shop.write_snapshot()
+    shop.add_catalog_item(item(11))
+    storage.flush()
+
+    restart(monkeypatch)
+    release = paused_hydration(monkeypatch)
+    assert shop.load_snapshot_async() is not None
+
+    # Поки знімок довантажується, товар береться прямо з нього
+    assert not shop.DATA_LOADED.is_set()
+    assert shop.find_item(9).name == "Товар 9"
+    assert shop.remove_catalog_item(3) is not None
+    release.set()
+    assert shop.DATA_LOADED.wait(5)
+
+    assert shop._catalog_ids == [1, 2, 4, 5, 6, 7, 8, 9, 10, 11]
+    assert list(shop._catalog_ids) == sorted(shop.CATALOG)
+
+
+def test_export_waits_for_hydration(monkeypatch, storage, message_update):
+    sent = []
+    monkeypatch.setattr(shop, "send_message", lambda chat_id, text, **kwargs: sent.append(text))
+    monkeypatch.setattr(shop, "export_catalog", lambda chat_id, fmt: sent.append(("export", fmt)))
+    admin_id = next(iter(shop.ADMIN_IDS))
+
+    shop.cmd_export_items(message_update(admin_id, "/export_items csv").message)
+    assert len(sent) == 1 and "завантажується" in sent[0]
+
+    shop.DATA_LOADED.set()
+    shop.cmd_export_items(message_update(admin_id, "/export_items csv").message)
+    deadline = time.monotonic() + 5
+    while len(sent) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sent[1:] == [("export", "csv")]